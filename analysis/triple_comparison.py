@@ -4,19 +4,36 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+# Per-run regimes written by: python experiments/regimes.py --out results/regimes.csv
+REGIMES_CSV = 'results/regimes.csv'
+
 def load_data(path, model_name, condition):
     if not os.path.exists(path): return pd.DataFrame()
     with open(path, 'r') as f:
         data = json.load(f)
     df = pd.DataFrame(data)
-    df['model_label'] = model_name
+    df['model_label'] = f"{model_name} ({regime_label(os.path.splitext(os.path.basename(path))[0], df)})"
     df['unique_ratio'] = df['text'].apply(lambda x: len(set(x.lower().split())) / len(x.lower().split()) if x.lower().split() else 0)
     return df
 
+def regime_label(stem, df):
+    # Majority regime of the closed-loop runs, as classified by experiments/regimes.py
+    if not os.path.exists(REGIMES_CSV):
+        print(f"⚠️  {REGIMES_CSV} missing, run: python experiments/regimes.py --out {REGIMES_CSV}")
+        return 'regime n/a'
+    regimes = pd.read_csv(REGIMES_CSV)
+    runs = regimes[(regimes['file'] == stem) & (regimes['condition'] == 'closed_loop')]
+    if len(runs):
+        return runs['regime'].mode()[0].capitalize()
+    # regimes.py skips runs shorter than its MIN_POINTS; say so instead of guessing
+    longest = df.groupby('seed').size().max() if 'seed' in df else len(df)
+    print(f"⚠️  {stem}: runs too short to classify (longest has {longest} iterations)")
+    return f'too short to classify, ≤{longest} iterations'
+
 # Load all 3 datasets
-grok_df = load_data('results/grok_extended_validation.json', 'Grok-4-1 (Explosion)', 'closed_loop')
-v3_df = load_data('results/deepseek_deepseek_chat_validation.json', 'DeepSeek-V3 (Attractor)', 'closed_loop')
-r1_df = load_data('results/deepseek_r1_reasoner_validation.json', 'DeepSeek-R1 (Implosion)', 'closed_loop')
+grok_df = load_data('results/grok_extended_validation.json', 'Grok-4-1', 'closed_loop')
+v3_df = load_data('results/deepseek_deepseek_chat_validation.json', 'DeepSeek-V3', 'closed_loop')
+r1_df = load_data('results/deepseek_r1_reasoner_validation.json', 'DeepSeek-R1', 'closed_loop')
 
 # Combine and Filter only closed-loop
 full_df = pd.concat([grok_df, v3_df, r1_df])
@@ -0,0 +1,289 @@
+"""
+ANN Index - approximate nearest neighbours over every generated output
+
+Random-hyperplane LSH (SimHash) over the local embeddings of
+semantic_drift_analyzer.LocalEmbedder, computed from the rows of the shared
+tfidf_corpus.TfidfCorpus (texts are tokenized once, by the corpus):
+
+    - n_tables hash tables, each keyed by n_bits hyperplane sign bits
+    - each table is a sorted code array, so a bucket is a searchsorted range
+      and a batch of queries looks up all tables at once
+    - candidates from any table are re-ranked by exact cosine
+
+The defaults (12 tables x 12 bits) are tuned for near-duplicates: on the
+current corpus they recall ~99% of neighbours with cosine >= 0.8 while
+scoring ~2% of the rows; loosely related neighbours (cosine ~0.3) need
+fewer bits and more tables.
+
+Outputs can be inserted as runs complete; the index (vectors, codes, row
+metadata and the embedder's IDF) is saved as .npy files and reloaded
+memory-mapped. Hyperplanes are regenerated from the stored seed. The IDF
+is fitted when the index is first built and then frozen, so vectors added
+later stay comparable with the stored ones; pass --rebuild to refit it on
+the current corpus and re-embed everything.
+
+attractors() asks the attractor-basin question directly: which chains, from
+different seeds or models, end up emitting nearly the same text? Each
+run's tail outputs are matched through the index instead of an all-pairs
+scan, and matched runs are merged into basins with union-find.
+
+Usage:
+    python experiments/ann_index.py                         # build/update results/ann/, list basins
+    python experiments/ann_index.py --query "the recursive nature of" --k 5
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from results_index import KEY_COLUMNS, RESULTS_DIR
+from semantic_drift_analyzer import EMBED_DIM, LocalEmbedder
+from tfidf_corpus import CORPUS_DIR, ROW_KEYS, sync_corpus
+
+ANN_DIR = RESULTS_DIR / "ann"
+RUN_KEYS = KEY_COLUMNS + ['seed']
+N_TABLES = 12
+N_BITS = 12
+TAIL = 5
+THRESHOLD = 0.9
+
+
+class ANNIndex:
+    """Random-hyperplane LSH over unit float32 vectors"""
+
+    def __init__(self, dim=EMBED_DIM, n_tables=N_TABLES, n_bits=N_BITS, seed=0):
+        self.dim, self.n_tables, self.n_bits, self.seed = dim, n_tables, n_bits, seed
+        rng = np.random.default_rng(seed)
+        self.hyperplanes = rng.standard_normal((n_tables * n_bits, dim), dtype=np.float32)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.codes = np.zeros((0, n_tables), dtype=np.int64)
+        self.meta = {}
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def hash(self, vectors):
+        """(n, dim) -> (n, n_tables) integer bucket codes"""
+        bits = (np.asarray(vectors, dtype=np.float32) @ self.hyperplanes.T) > 0
+        bits = bits.reshape(len(bits), self.n_tables, self.n_bits)
+        return bits.astype(np.int64) @ (np.int64(1) << np.arange(self.n_bits, dtype=np.int64))
+
+    def add(self, vectors, meta=None):
+        """Insert vectors (and optional metadata columns of the same length)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        start = len(self)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.codes = np.concatenate([self.codes, self.hash(vectors)])
+        for name, values in (meta or {}).items():
+            old = self.meta.get(name, np.array([], dtype=np.asarray(values).dtype))
+            self.meta[name] = np.concatenate([old, np.asarray(values)])
+        self._sorted = None
+        return np.arange(start, len(self))
+
+    def _tables(self):
+        if self._sorted is None:
+            order = np.argsort(self.codes, axis=0, kind='stable')
+            self._sorted = (order, np.take_along_axis(self.codes, order, axis=0))
+        return self._sorted
+
+    def candidates(self, query_codes):
+        """Candidate row ids per query (union of its buckets over all tables)"""
+        order, sorted_codes = self._tables()
+        lo = np.stack([np.searchsorted(sorted_codes[:, t], query_codes[:, t], 'left')
+                       for t in range(self.n_tables)], axis=1)
+        hi = np.stack([np.searchsorted(sorted_codes[:, t], query_codes[:, t], 'right')
+                       for t in range(self.n_tables)], axis=1)
+        return [np.unique(np.concatenate([order[lo[q, t]:hi[q, t], t] for t in range(self.n_tables)]))
+                for q in range(len(query_codes))]
+
+    def query(self, vectors, k=10, exclude=None):
+        """
+        Batched approximate k-NN by cosine similarity
+
+        Args:
+            vectors: (n_queries, dim) unit vectors
+            exclude: optional fn(query_index, candidate_ids) -> bool mask of
+                     candidates to drop (e.g. rows from the same run)
+
+        Returns:
+            ids (n_queries, k) with -1 padding, sims (n_queries, k) with NaN
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = np.full((len(vectors), k), -1, dtype=np.int64)
+        sims = np.full((len(vectors), k), np.nan, dtype=np.float32)
+        for q, cand in enumerate(self.candidates(self.hash(vectors))):
+            if exclude is not None and len(cand):
+                cand = cand[~exclude(q, cand)]
+            if not len(cand):
+                continue
+            scores = self.vectors[cand] @ vectors[q]
+            top = np.argsort(-scores, kind='stable')[:k]
+            ids[q, :len(top)] = cand[top]
+            sims[q, :len(top)] = scores[top]
+        return ids, sims
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, out_dir=ANN_DIR, idf=None):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.save(out_dir / "vectors.npy", self.vectors)
+        np.save(out_dir / "codes.npy", self.codes)
+        if idf is not None:
+            np.save(out_dir / "idf.npy", idf)
+        schema = {'dim': self.dim, 'n_tables': self.n_tables, 'n_bits': self.n_bits,
+                  'seed': self.seed, 'categorical': {}, 'numeric': []}
+        for name, values in self.meta.items():
+            if values.dtype == object:
+                categories, codes = np.unique(values.astype(str), return_inverse=True)
+                np.save(out_dir / f"meta_{name}.npy", codes.astype(np.int32))
+                schema['categorical'][name] = categories.tolist()
+            else:
+                np.save(out_dir / f"meta_{name}.npy", values)
+                schema['numeric'].append(name)
+        with open(out_dir / "schema.json", 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    @classmethod
+    def load(cls, in_dir=ANN_DIR, mmap_mode='r'):
+        in_dir = Path(in_dir)
+        with open(in_dir / "schema.json", 'r') as f:
+            schema = json.load(f)
+        index = cls(schema['dim'], schema['n_tables'], schema['n_bits'], schema['seed'])
+        index.vectors = np.load(in_dir / "vectors.npy", mmap_mode=mmap_mode)
+        index.codes = np.load(in_dir / "codes.npy", mmap_mode=mmap_mode)
+        for name, categories in schema['categorical'].items():
+            codes = np.load(in_dir / f"meta_{name}.npy")
+            index.meta[name] = np.array(categories, dtype=object)[codes] if len(categories) \
+                else np.array([], dtype=object)
+        for name in schema['numeric']:
+            index.meta[name] = np.load(in_dir / f"meta_{name}.npy")
+        return index
+
+
+def load_embedder(in_dir=ANN_DIR, dim=EMBED_DIM):
+    """Embedder with the IDF stored next to an index (unfitted if absent)"""
+    embedder = LocalEmbedder(dim=dim)
+    path = Path(in_dir) / "idf.npy"
+    if path.exists():
+        embedder.idf = np.load(path)
+    return embedder
+
+
+def update_from_corpus(ann, corpus, embedder):
+    """Insert TfidfCorpus rows whose key is not indexed yet"""
+    known = set(zip(*(ann.meta[c].tolist() for c in ROW_KEYS))) if len(ann) else set()
+    rows = [i for i, key in enumerate(zip(*(corpus.meta[c].tolist() for c in ROW_KEYS)))
+            if key not in known]
+    if rows:
+        ann.add(embedder.embed_counts(corpus.counts[rows]),
+                {c: corpus.meta[c][rows] for c in ROW_KEYS})
+    return len(rows)
+
+
+# ----------------------------------------------------------------------
+# Attractor basins across seeds
+# ----------------------------------------------------------------------
+
+def _run_ids(meta):
+    keys = [meta[c].astype(str) for c in RUN_KEYS]
+    return pd.factorize(pd.MultiIndex.from_arrays(keys))
+
+
+def attractors(ann, tail=TAIL, threshold=THRESHOLD, k=10):
+    """
+    Group runs whose tail outputs are near-duplicates across seeds/models
+
+    Returns:
+        DataFrame with one row per run in a basin of size >= 2: basin id,
+        run keys, and the best cross-run cosine that linked it
+    """
+    run_codes, runs = _run_ids(ann.meta)
+    iteration = np.asarray(ann.meta['iteration'])
+    last = pd.Series(iteration).groupby(run_codes).transform('max').to_numpy()
+    tail_rows = np.flatnonzero(iteration > last - tail)
+
+    ids, sims = ann.query(ann.vectors[tail_rows], k=k,
+                          exclude=lambda q, cand: (run_codes[cand] == run_codes[tail_rows[q]])
+                          | (iteration[cand] <= last[cand] - tail))
+
+    parent = np.arange(len(runs))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    best = np.full(len(runs), np.nan)
+    for q, row in enumerate(tail_rows):
+        for cand, sim in zip(ids[q], sims[q]):
+            if cand < 0 or sim < threshold:
+                continue
+            a, b = run_codes[row], run_codes[cand]
+            parent[find(a)] = find(b)
+            best[a] = np.fmax(best[a], sim)
+            best[b] = np.fmax(best[b], sim)
+
+    roots = np.array([find(r) for r in range(len(runs))])
+    sizes = np.bincount(roots, minlength=len(runs))
+    members = np.flatnonzero(sizes[roots] >= 2)
+    table = pd.DataFrame(list(runs[members]), columns=RUN_KEYS)
+    table.insert(0, 'basin', pd.factorize(roots[members])[0])
+    table['basin_size'] = sizes[roots[members]]
+    table['link_cosine'] = best[members]
+    return table.sort_values(['basin', 'model', 'seed']).reset_index(drop=True)
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="LSH nearest-neighbour index over generated outputs")
+    parser.add_argument('--dir', default=str(ANN_DIR))
+    parser.add_argument('--corpus', default=str(CORPUS_DIR), help="Shared TfidfCorpus directory")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Refit the IDF on the current corpus and re-embed every output")
+    parser.add_argument('--query', default=None, help="Find outputs closest to this text")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    ann_dir = Path(args.dir)
+    corpus, _ = sync_corpus(load_index(), args.corpus)
+    if ann_dir.joinpath("schema.json").exists() and not args.rebuild:
+        ann = ANNIndex.load(ann_dir, mmap_mode=None)
+        embedder = load_embedder(ann_dir, ann.dim)
+    else:
+        ann = ANNIndex()
+        embedder = LocalEmbedder().fit_corpus(corpus)
+    added = update_from_corpus(ann, corpus, embedder)
+    if added or args.rebuild:
+        ann.save(ann_dir, idf=embedder.idf)
+    print(f"✓ {len(ann)} outputs indexed ({added} new) → {ann_dir}")
+    if len(ann) == 0:
+        return
+
+    if args.query:
+        ids, sims = ann.query(embedder.transform([args.query]), k=args.k)
+        for row, sim in zip(ids[0], sims[0]):
+            if row >= 0:
+                key = ", ".join(f"{c}={ann.meta[c][row]}" for c in ROW_KEYS)
+                print(f"  {sim:.3f}  {key}")
+        return
+
+    basins = attractors(ann, threshold=args.threshold, k=args.k)
+    if basins.empty:
+        print(f"No cross-run attractors at cosine ≥ {args.threshold}.")
+        return
+    print(f"\n{basins['basin'].nunique()} attractor basins shared by ≥2 runs:")
+    print(basins.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == '__main__':
+    main()
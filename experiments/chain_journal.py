@@ -0,0 +1,321 @@
+"""
+Chain Journal - persistent closed-loop chains with forkable state
+
+Every chain (one seed prompt run under one set of conditions) is stored as
+an append-only journal:
+
+    results/journal/<chain_id>/meta.json    configuration + parent pointer
+    results/journal/<chain_id>/steps.jsonl  one record per iteration
+
+Each step record keeps the generated text *and* the chain state needed to
+continue from that point (the next prompt). A fork creates a child chain
+that points at (parent_chain, iteration) and only stores its own divergent
+suffix, so a fork tree shares its prefix on disk.
+
+Typical use (recovery experiment, EXTENSIONS_IDEAS.md 1.4):
+
+    journal = ChainJournal()
+    journal.create_chain("sonnet_s0", SEED_PROMPTS[0], condition="closed_loop")
+    run_chain(journal, "sonnet_s0", generate, iterations=50)
+    journal.fork("sonnet_s0", 49, "sonnet_s0_recovery", condition="exogenous")
+    run_chain(journal, "sonnet_s0_recovery", generate, iterations=100)
+"""
+
+import json
+import time
+from pathlib import Path
+
+from exogenous_corpus import open_corpus
+from rng_streams import chain_streams
+
+JOURNAL_DIR = Path("results") / "journal"
+CONTEXT_CHARS = 500
+
+
+class ChainJournal:
+    """Append-only on-disk store of chain states with fork support"""
+
+    def __init__(self, root=JOURNAL_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._meta_cache = {}
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+
+    def _chain_dir(self, chain_id):
+        return self.root / chain_id
+
+    def _steps_path(self, chain_id):
+        return self._chain_dir(chain_id) / "steps.jsonl"
+
+    def exists(self, chain_id):
+        return (self._chain_dir(chain_id) / "meta.json").exists()
+
+    def chains(self):
+        """List every chain id stored in the journal"""
+        return sorted(p.parent.name for p in self.root.glob("*/meta.json"))
+
+    def meta(self, chain_id):
+        if chain_id not in self._meta_cache:
+            path = self._chain_dir(chain_id) / "meta.json"
+            if not path.exists():
+                raise KeyError(f"Unknown chain: {chain_id}")
+            with open(path, 'r') as f:
+                self._meta_cache[chain_id] = json.load(f)
+        return self._meta_cache[chain_id]
+
+    def config(self, chain_id):
+        return dict(self.meta(chain_id)['config'])
+
+    def _write_meta(self, chain_id, meta):
+        chain_dir = self._chain_dir(chain_id)
+        chain_dir.mkdir(parents=True, exist_ok=True)
+        with open(chain_dir / "meta.json", 'w') as f:
+            json.dump(meta, f, indent=2)
+        self._steps_path(chain_id).touch()
+        self._meta_cache[chain_id] = meta
+
+    # ------------------------------------------------------------------
+    # Creation
+    # ------------------------------------------------------------------
+
+    def create_chain(self, chain_id, seed_prompt, **config):
+        """
+        Register a new root chain
+
+        Args:
+            chain_id: Unique identifier (used as directory name)
+            seed_prompt: Prompt for iteration 0
+            **config: Run conditions (model, condition, temperature, ...)
+        """
+        if self.exists(chain_id):
+            raise ValueError(f"Chain already exists: {chain_id}")
+        config.setdefault('condition', 'closed_loop')
+        meta = {
+            'chain_id': chain_id,
+            'parent': None,
+            'fork_iteration': -1,
+            'config': config,
+            'initial_state': {'next_prompt': seed_prompt},
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self._write_meta(chain_id, meta)
+        return chain_id
+
+    def fork(self, parent_id, iteration, child_id=None, **overrides):
+        """
+        Spawn a child chain continuing from the parent's state after `iteration`
+
+        The child inherits the parent configuration updated with `overrides`
+        (e.g. condition='exogenous', temperature=1.3). Iterations up to and
+        including `iteration` are read from the parent, never copied.
+
+        Returns:
+            The child chain id
+        """
+        last = self.last_iteration(parent_id)
+        if iteration > last:
+            raise ValueError(
+                f"Cannot fork {parent_id} at iteration {iteration}: "
+                f"journal only reaches iteration {last}")
+        if child_id is None:
+            child_id = f"{parent_id}.f{iteration}.{len(self.children(parent_id))}"
+        if self.exists(child_id):
+            raise ValueError(f"Chain already exists: {child_id}")
+
+        config = self.config(parent_id)
+        config.update(overrides)
+        meta = {
+            'chain_id': child_id,
+            'parent': parent_id,
+            'fork_iteration': iteration,
+            'config': config,
+            'initial_state': self.state_at(parent_id, iteration),
+            'overrides': overrides,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self._write_meta(child_id, meta)
+        return child_id
+
+    def children(self, chain_id):
+        """Direct children of a chain"""
+        return [c for c in self.chains() if self.meta(c)['parent'] == chain_id]
+
+    # ------------------------------------------------------------------
+    # Steps
+    # ------------------------------------------------------------------
+
+    def append(self, chain_id, record):
+        """Append one iteration record (must contain 'iteration' and 'state')"""
+        expected = self.last_iteration(chain_id) + 1
+        if record['iteration'] != expected:
+            raise ValueError(
+                f"{chain_id}: expected iteration {expected}, got {record['iteration']}")
+        with open(self._steps_path(chain_id), 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+    def own_steps(self, chain_id):
+        """Records stored in this chain's own suffix"""
+        path = self._steps_path(chain_id)
+        if not path.exists():
+            return []
+        with open(path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def history(self, chain_id, upto=None):
+        """
+        Full trajectory of a chain, resolving the shared prefix through parents
+
+        Args:
+            upto: Last iteration to include (default: everything)
+        """
+        meta = self.meta(chain_id)
+        prefix = []
+        if meta['parent'] is not None:
+            prefix = self.history(meta['parent'], upto=meta['fork_iteration'])
+        steps = prefix + self.own_steps(chain_id)
+        if upto is not None:
+            steps = [s for s in steps if s['iteration'] <= upto]
+        return steps
+
+    def last_iteration(self, chain_id):
+        own = self.own_steps(chain_id)
+        if own:
+            return own[-1]['iteration']
+        return self.meta(chain_id)['fork_iteration']
+
+    def state_at(self, chain_id, iteration):
+        """Chain state after `iteration` (-1 or fork point = initial state)"""
+        meta = self.meta(chain_id)
+        if iteration == meta['fork_iteration']:
+            return dict(meta['initial_state'])
+        if iteration < meta['fork_iteration']:
+            return self.state_at(meta['parent'], iteration)
+        for step in self.own_steps(chain_id):
+            if step['iteration'] == iteration:
+                return dict(step['state'])
+        raise KeyError(f"{chain_id} has no iteration {iteration}")
+
+    def lineage(self, chain_id):
+        """Chain ids from the root down to `chain_id`"""
+        parent = self.meta(chain_id)['parent']
+        return (self.lineage(parent) if parent is not None else []) + [chain_id]
+
+
+def exogenous_passages(config, iteration):
+    """
+    Endless sequence of exogenous passages drawn at `iteration` for a chain
+
+    Passages come from config['exogenous_corpus'] (a built ExogenousCorpus
+    directory) when set, otherwise from the inline config['exogenous_texts']
+    list. Both draw from the chain's counter-based 'exogenous' stream, keyed
+    by (run_id, seed, iteration): the first passage is the one
+    exogenous_passage() injects, later ones continue the same stream.
+    """
+    run_id, seed = config.get('run_id', 'default'), config.get('seed', 0)
+    rng = chain_streams(run_id, seed).generator('exogenous', iteration)
+    if config.get('exogenous_corpus'):
+        corpus = open_corpus(config['exogenous_corpus'])
+        domain, bucket = config.get('exogenous_domain'), config.get('exogenous_bucket')
+        while True:
+            yield corpus.passage(corpus.sample_row(rng, domain, bucket))
+    texts = config['exogenous_texts']
+    while True:
+        yield texts[int(rng.integers(len(texts)))]
+
+
+def exogenous_passage(config, iteration, max_chars=None):
+    """Exogenous text injected at `iteration` for a chain (first of exogenous_passages)"""
+    exo_text = next(exogenous_passages(config, iteration))
+    return exo_text[:max_chars] if max_chars else exo_text
+
+
+def closed_loop_prompt(response, config, state, iteration):
+    """Default prompt update: pure self-reference, or 50/50 exogenous mix"""
+    context = config.get('context_chars', CONTEXT_CHARS)
+    if config.get('condition', 'closed_loop') == 'closed_loop':
+        return response[:context]
+    half = context // 2
+    exo_text = exogenous_passage(config, iteration, max_chars=half)
+    return f"{response[:half]}\n\n{exo_text}"
+
+
+def chain_key(record):
+    """
+    Chain a record belongs to, as keyed by the online monitors
+
+    Journaled records carry their chain_id; flat records from the
+    experiment scripts fall back to (model, condition, seed).
+    """
+    if record.get('chain_id') is not None:
+        return record['chain_id']
+    return (record.get('model'), record.get('condition'), record.get('seed'))
+
+
+def fan_out(*hooks):
+    """One on_step callback forwarding each record to every hook (None entries skipped)"""
+    hooks = [hook for hook in hooks if hook is not None]
+
+    def on_step(record):
+        for hook in hooks:
+            hook(record)
+    return on_step
+
+
+def run_chain(journal, chain_id, generate, iterations,
+              next_prompt=closed_loop_prompt, metrics_fn=None, on_step=None):
+    """
+    Run (or resume) a chain until it reaches `iterations` total iterations
+
+    Iteration numbering is global: a child forked at iteration 49 and run
+    with iterations=100 generates iterations 50..99 only.
+
+    Args:
+        journal: ChainJournal
+        chain_id: Chain to advance
+        generate: Callable (prompt, config) -> text, or None on failure
+        iterations: Total trajectory length (prefix included)
+        next_prompt: Callable (response, config, state, iteration) -> prompt
+        metrics_fn: Optional callable text -> dict stored with each step
+        on_step: Optional callback receiving each new record (several
+            monitors can share it through fan_out)
+
+    Returns:
+        The new records generated in this call
+    """
+    config = journal.config(chain_id)
+    start = journal.last_iteration(chain_id) + 1
+    state = journal.state_at(chain_id, start - 1)
+    new_records = []
+
+    for iteration in range(start, iterations):
+        prompt = state['next_prompt']
+        response = generate(prompt, config)
+        if not response:
+            print(f"    ⚠️ {chain_id}: empty response at iteration {iteration}, stopping")
+            break
+
+        state = dict(state)
+        state['next_prompt'] = next_prompt(response, config, state, iteration)
+        record = {
+            'iteration': iteration,
+            'chain_id': chain_id,
+            'condition': config.get('condition'),
+            'prompt': prompt,
+            'text': response,
+            'state': state,
+        }
+        if metrics_fn is not None:
+            record.update(metrics_fn(response))
+
+        journal.append(chain_id, record)
+        new_records.append(record)
+        if on_step is not None:
+            on_step(record)
+
+        if (iteration + 1) % 10 == 0:
+            print(f"    {chain_id}: iteration {iteration + 1}/{iterations}")
+
+    return new_records
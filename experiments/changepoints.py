@@ -0,0 +1,318 @@
+"""
+Changepoints - batched PELT / binary segmentation for the t* hypothesis
+
+MATHEMATICAL_MODEL.md §7 proposes a transient phase followed by an
+attractor phase, with a breakpoint t* ≈ 10-20 iterations. This module
+locates breakpoints in every (group, seed, metric) trajectory at once.
+
+Segment costs are Gaussian negative log-likelihoods evaluated in O(1) from
+cumulative sums of x, x² and the count of observed points (NaN = missing):
+
+    cost='mean'     Σ(x - μ)²              (series scaled to unit noise)
+    cost='meanvar'  n · log σ̂²             (shift in mean and/or variance)
+
+Both searches are vectorized across the whole batch of trajectories:
+
+    pelt    exact optimal partition with pruning; loops over time only
+    binseg  greedy binary segmentation; each step splits, per series, the
+            segment whose best split gains the most
+
+t* for a trajectory is its first detected changepoint (the first iteration
+of the new regime).
+
+Usage:
+    python experiments/changepoints.py --method pelt --cost meanvar --out results/changepoints.csv
+"""
+
+import argparse
+import warnings
+
+import numpy as np
+
+COSTS = ('mean', 'meanvar')
+MIN_SIZE = 3
+VAR_FLOOR = 1e-8
+
+
+def _standardize(y):
+    """Center on the median and scale by the MAD of first differences"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        center = np.nanmedian(y, axis=-1, keepdims=True)
+        diffs = np.abs(np.diff(y, axis=-1))
+        scale = np.nanmedian(diffs, axis=-1, keepdims=True) / (0.6745 * np.sqrt(2))
+    scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+    center = np.where(np.isfinite(center), center, 0.0)
+    return (y - center) / scale
+
+
+def _cumulative(y):
+    """(B, T+1) cumulative sums of x, x² and observed counts"""
+    mask = ~np.isnan(y)
+    x = np.where(mask, y, 0.0)
+    pad = [(0, 0)] * (y.ndim - 1) + [(1, 0)]
+    return (np.pad(np.cumsum(x, axis=-1), pad),
+            np.pad(np.cumsum(x * x, axis=-1), pad),
+            np.pad(np.cumsum(mask, axis=-1), pad).astype(float))
+
+
+def _segment_cost(cum, a, b, cost, min_size):
+    """Cost of segments [a, b) for index arrays a, b of shape (B, K)"""
+    c1, c2, cn = cum
+    shape = np.broadcast_shapes(a.shape, b.shape)
+    a, b = np.broadcast_to(a, shape), np.broadcast_to(b, shape)
+
+    def take(c, idx):
+        return np.take_along_axis(c, idx, axis=-1)
+
+    n = take(cn, b) - take(cn, a)
+    s1 = take(c1, b) - take(c1, a)
+    s2 = take(c2, b) - take(c2, a)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if cost == 'mean':
+            value = s2 - s1 * s1 / n
+        else:
+            var = np.maximum(s2 / n - (s1 / n) ** 2, VAR_FLOOR)
+            value = n * np.log(var)
+    return np.where(n >= min_size, value, np.inf)
+
+
+def default_penalty(cost, n_points):
+    """BIC: log(n) per extra parameter (location + mean, or + variance)"""
+    params = 2 if cost == 'mean' else 3
+    return params * np.log(max(n_points, 2))
+
+
+def pelt(y, cost='meanvar', penalty=None, min_size=MIN_SIZE):
+    """
+    Optimal partitioning with PELT pruning, batched over leading axes
+
+    Args:
+        y: (..., T) trajectories, NaN = missing
+        penalty: Cost per changepoint (default: BIC)
+
+    Returns:
+        (..., T) bool mask, True at the first index of every new segment
+    """
+    y = np.asarray(y, dtype=float)
+    lead, n_steps = y.shape[:-1], y.shape[-1]
+    y = _standardize(y.reshape(-1, n_steps))
+    batch = len(y)
+    penalty = default_penalty(cost, n_steps) if penalty is None else penalty
+    cum = _cumulative(y)
+
+    best = np.full((batch, n_steps + 1), np.inf)
+    best[:, 0] = -penalty
+    last = np.zeros((batch, n_steps + 1), dtype=np.int64)
+    alive = np.zeros((batch, n_steps + 1), dtype=bool)
+    alive[:, 0] = True
+    rows = np.arange(batch)
+
+    for t in range(1, n_steps + 1):
+        starts = np.arange(t)[None, :]
+        seg = _segment_cost(cum, starts, np.full((batch, 1), t), cost, min_size)
+        cand = np.where(alive[:, :t], best[:, :t] + seg + penalty, np.inf)
+        arg = np.argmin(cand, axis=1)
+        best[:, t] = cand[rows, arg]
+        last[:, t] = arg
+        # prune starts that can never be optimal again; keep starts whose
+        # segment is still too short to be scored
+        keep = (best[:, :t] + seg <= best[:, t:t + 1]) | ~np.isfinite(seg)
+        alive[:, :t] &= keep
+        alive[:, t] = True
+
+    # Series with fewer than min_size points have no finite partition
+    mask = np.zeros((batch, n_steps), dtype=bool)
+    pos = np.where(np.isfinite(best[:, n_steps]), n_steps, 0)
+    while (pos > 0).any():
+        prev = np.where(pos > 0, last[rows, pos], 0)
+        hit = prev > 0
+        mask[rows[hit], prev[hit]] = True
+        pos = prev
+    return mask.reshape(lead + (n_steps,))
+
+
+def binseg(y, cost='meanvar', penalty=None, min_size=MIN_SIZE, max_changepoints=5):
+    """
+    Binary segmentation, batched over leading axes
+
+    Each round evaluates every candidate split of every current segment in
+    one vectorized pass and accepts, per series, the best split if its cost
+    reduction exceeds the penalty. max_changepoints=1 gives the single
+    most likely breakpoint (at-most-one-change).
+
+    Returns:
+        (..., T) bool mask, True at the first index of every new segment
+    """
+    y = np.asarray(y, dtype=float)
+    lead, n_steps = y.shape[:-1], y.shape[-1]
+    y = _standardize(y.reshape(-1, n_steps))
+    batch = len(y)
+    penalty = default_penalty(cost, n_steps) if penalty is None else penalty
+    cum = _cumulative(y)
+
+    idx = np.arange(n_steps + 1)
+    bounds = np.zeros((batch, n_steps + 1), dtype=bool)
+    bounds[:, [0, n_steps]] = True
+    rows = np.arange(batch)
+    active = np.ones(batch, dtype=bool)
+
+    for _ in range(max_changepoints):
+        start = np.maximum.accumulate(np.where(bounds, idx, 0), axis=1)
+        nxt = np.minimum.accumulate(np.where(bounds, idx, n_steps)[:, ::-1], axis=1)[:, ::-1]
+        end = np.concatenate([nxt[:, 1:], np.full((batch, 1), n_steps)], axis=1)
+        tau = np.broadcast_to(idx, (batch, n_steps + 1))
+
+        with np.errstate(invalid='ignore'):
+            gain = (_segment_cost(cum, start, end, cost, min_size)
+                    - _segment_cost(cum, start, tau, cost, min_size)
+                    - _segment_cost(cum, tau, end, cost, min_size))
+        gain = np.where(bounds | ~np.isfinite(gain), -np.inf, gain)
+        arg = np.argmax(gain, axis=1)
+        accept = active & (gain[rows, arg] > penalty)
+        if not accept.any():
+            break
+        bounds[rows[accept], arg[accept]] = True
+        active = accept
+
+    bounds[:, 0] = False
+    return bounds[:, :n_steps].reshape(lead + (n_steps,))
+
+
+def detect(y, method='pelt', **kwargs):
+    """Dispatch to pelt() or binseg(); returns a (..., T) changepoint mask"""
+    if method == 'pelt':
+        return pelt(y, **kwargs)
+    if method == 'binseg':
+        return binseg(y, **kwargs)
+    raise ValueError(f"Unknown method: {method}")
+
+
+def first_changepoint(mask, iterations):
+    """Iteration of the first changepoint along the last axis (NaN if none)"""
+    has = mask.any(axis=-1)
+    first = np.argmax(mask, axis=-1)
+    return np.where(has, np.asarray(iterations, dtype=float)[first], np.nan)
+
+
+def phase_transitions(tensor, method='pelt', cost='meanvar', **kwargs):
+    """
+    Changepoints for every (group, seed, metric) trajectory of a ResultsTensor
+
+    Returns:
+        dict: mask (group, seed, metric, iteration), t_star and
+        n_changepoints (group, seed, metric)
+    """
+    y = np.moveaxis(tensor.values, 2, -1)
+    mask = detect(y, method=method, cost=cost, **kwargs)
+    observed = (~np.isnan(y)).sum(axis=-1) >= 2 * kwargs.get('min_size', MIN_SIZE)
+    t_star = np.where(observed, first_changepoint(mask, tensor.iterations), np.nan)
+    return {'mask': mask, 't_star': t_star,
+            'n_changepoints': np.where(observed, mask.sum(axis=-1), -1)}
+
+
+def metric_agreement(t_star, tolerance=5):
+    """
+    Cross-metric agreement of t* per trajectory
+
+    Args:
+        t_star: (..., metric) first-changepoint iterations, NaN = none
+
+    Returns:
+        dict of (...)-shaped arrays: spread (max - min t*), agreement
+        (share of metric pairs with |Δt*| <= tolerance), n_metrics
+    """
+    valid = ~np.isnan(t_star)
+    diff = np.abs(t_star[..., :, None] - t_star[..., None, :])
+    iu = np.triu_indices(t_star.shape[-1], k=1)
+    pair_ok = valid[..., :, None] & valid[..., None, :]
+    close = (diff <= tolerance) & pair_ok
+    with np.errstate(invalid='ignore', divide='ignore'):
+        agreement = close[..., iu[0], iu[1]].sum(axis=-1) / pair_ok[..., iu[0], iu[1]].sum(axis=-1)
+        spread = np.where(valid.any(axis=-1),
+                          np.nanmax(np.where(valid, t_star, -np.inf), axis=-1)
+                          - np.nanmin(np.where(valid, t_star, np.inf), axis=-1), np.nan)
+    return {'spread': spread, 'agreement': agreement, 'n_metrics': valid.sum(axis=-1)}
+
+
+def summarize(tensor, result, tolerance=5):
+    """
+    Per-seed table plus cross-seed and cross-metric summaries
+
+    Returns:
+        (per_seed, distribution, agreement) DataFrames
+    """
+    from trend_fits import _group_frame
+
+    t_star = result['t_star']
+    n_groups, n_seeds, n_metrics = t_star.shape
+    g, s, m = np.meshgrid(np.arange(n_groups), np.arange(n_seeds), np.arange(n_metrics),
+                          indexing='ij')
+    per_seed = _group_frame(tensor, g.ravel(), s.ravel())
+    per_seed['metric'] = np.array(tensor.metrics)[m.ravel()]
+    per_seed['t_star'] = t_star.ravel()
+    per_seed['n_changepoints'] = result['n_changepoints'].ravel()
+    per_seed = per_seed[per_seed['n_changepoints'] >= 0].reset_index(drop=True)
+
+    keys = list(tensor.group_by) + ['metric']
+    distribution = per_seed.groupby(keys).agg(
+        n_seeds=('t_star', 'size'),
+        n_detected=('t_star', 'count'),
+        t_star_median=('t_star', 'median'),
+        t_star_q25=('t_star', lambda v: v.quantile(0.25)),
+        t_star_q75=('t_star', lambda v: v.quantile(0.75)),
+        t_star_mean=('t_star', 'mean'),
+        t_star_std=('t_star', 'std'),
+    ).reset_index()
+
+    agree = metric_agreement(t_star, tolerance)
+    g, s = np.meshgrid(np.arange(n_groups), np.arange(n_seeds), indexing='ij')
+    per_traj = _group_frame(tensor, g.ravel(), s.ravel())
+    for key in ('spread', 'agreement', 'n_metrics'):
+        per_traj[key] = agree[key].ravel()
+    per_traj = per_traj[per_traj['n_metrics'] >= 2]
+    agreement = per_traj.groupby(list(tensor.group_by)).agg(
+        n_seeds=('seed', 'size'),
+        spread_median=('spread', 'median'),
+        agreement_mean=('agreement', 'mean'),
+    ).reset_index()
+    return per_seed, distribution, agreement
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Batched changepoint detection (t*)")
+    parser.add_argument('--method', choices=['pelt', 'binseg'], default='pelt')
+    parser.add_argument('--cost', choices=COSTS, default='meanvar')
+    parser.add_argument('--penalty', type=float, default=None)
+    parser.add_argument('--min-size', type=int, default=MIN_SIZE)
+    parser.add_argument('--tolerance', type=int, default=5,
+                        help="Iterations within which metrics agree on t*")
+    parser.add_argument('--group-by', nargs='+', default=['model', 'condition'])
+    parser.add_argument('--metrics', nargs='+',
+                        default=['lz_complexity', 'shannon_entropy', 'trigram_diversity',
+                                 'unique_words_ratio'])
+    parser.add_argument('--out', default=None, help="CSV of per-seed t*")
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=args.group_by)
+    result = phase_transitions(tensor, method=args.method, cost=args.cost,
+                               penalty=args.penalty, min_size=args.min_size)
+    per_seed, distribution, agreement = summarize(tensor, result, args.tolerance)
+
+    fmt = lambda v: f"{v:.4g}"
+    print("t* distribution across seeds")
+    print(distribution.to_string(index=False, float_format=fmt))
+    print(f"\nCross-metric agreement (|Δt*| <= {args.tolerance})")
+    print(agreement.to_string(index=False, float_format=fmt))
+    if args.out:
+        per_seed.to_csv(args.out, index=False)
+        print(f"\n✓ {len(per_seed)} trajectories saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
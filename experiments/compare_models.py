@@ -2,7 +2,6 @@ import json
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-import zlib
 from collections import Counter
 
 def shannon_entropy(text):
@@ -0,0 +1,188 @@
+"""
+Compression Metrics - multi-compressor Kolmogorov-complexity proxies
+
+lz_complexity is a pure-Python LZ76 phrase count. Here every text also gets
+compressed-size ratios (compressed bytes / raw UTF-8 bytes, lower = more
+redundant) from several real compressors:
+
+    cr_zlib1, cr_zlib6, cr_zlib9   deflate at three levels
+    cr_bz2                         Burrows-Wheeler (block size 900k)
+    cr_lzma                        LZMA2 preset 6, raw stream (no container
+                                   header, so short texts are not dominated
+                                   by fixed overhead)
+    cr_zstd_dict                   zstd with a trained dictionary (only when
+                                   `zstandard` is installed)
+
+The zstd dictionary is cross-fitted so no text is scored with a dictionary
+that has seen it: runs are split into DICT_FOLDS folds, and each fold is
+compressed with a dictionary trained on the other folds. Whole runs go to
+one fold, so recycled phrases within a chain cannot leak into its own
+dictionary. Fold assignment and training samples come from RunStreams.
+
+Texts are split into chunks compressed on a thread pool; zlib, bz2 and lzma
+release the GIL while compressing, so the suite scales with cores without
+process start-up or pickling costs.
+
+Usage:
+    python experiments/compression_metrics.py                 # summary per model/condition
+    python experiments/results_index.py --with-compression    # store in the index
+"""
+
+import argparse
+import bz2
+import lzma
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rng_streams import RunStreams
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB_LEVELS = (1, 6, 9)
+LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': 6}]
+ZSTD_LEVEL = 19
+DICT_SIZE = 64 * 1024
+DICT_SAMPLES = 2000
+DICT_FOLDS = 2
+CHUNK = 64
+
+COMPRESSORS = {f"cr_zlib{level}": (lambda data, level=level: zlib.compress(data, level))
+               for level in ZLIB_LEVELS}
+COMPRESSORS['cr_bz2'] = lambda data: bz2.compress(data, 9)
+COMPRESSORS['cr_lzma'] = lambda data: lzma.compress(data, format=lzma.FORMAT_RAW,
+                                                    filters=LZMA_FILTERS)
+
+
+def train_zstd_dictionary(encoded, size=DICT_SIZE, n_samples=DICT_SAMPLES, rng=None):
+    """zstd dictionary trained on a random sample of texts (None if unavailable)"""
+    if zstandard is None:
+        return None
+    candidates = [e for e in encoded if e]
+    if len(candidates) < 8:
+        return None
+    rng = rng or RunStreams().chain('compression').generator('sampling', 1)
+    sample = [candidates[i] for i in rng.permutation(len(candidates))[:n_samples]]
+    try:
+        return zstandard.train_dictionary(size, sample)
+    except zstandard.ZstdError:
+        return None
+
+
+def compressors(dictionary=None):
+    """Name -> compress(bytes) for every available backend"""
+    suite = dict(COMPRESSORS)
+    if dictionary is not None:
+        # ZstdCompressor is not thread-safe: one context per worker thread
+        local = threading.local()
+
+        def zstd_dict(data):
+            if not hasattr(local, 'cctx'):
+                local.cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+            return local.cctx.compress(data)
+
+        suite['cr_zstd_dict'] = zstd_dict
+    return suite
+
+
+def _ratios_chunk(encoded, suite):
+    out = np.full((len(encoded), len(suite)), np.nan)
+    for row, data in enumerate(encoded):
+        if data:
+            for col, compress in enumerate(suite.values()):
+                out[row, col] = len(compress(data)) / len(data)
+    return out
+
+
+def _ratios(encoded, suite, workers):
+    chunks = [encoded[k:k + CHUNK] for k in range(0, len(encoded), CHUNK)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(lambda chunk: _ratios_chunk(chunk, suite), chunks))
+    return np.concatenate(parts, axis=0) if parts else np.zeros((0, len(suite)))
+
+
+def dictionary_folds(groups, n_folds=DICT_FOLDS, rng=None):
+    """Fold per text; every group (run) lands in one fold, folds drawn at random"""
+    codes, uniques = pd.factorize(pd.Series(groups, dtype=object))
+    rng = rng or RunStreams().chain('compression').generator('sampling')
+    return rng.permutation(len(uniques))[codes] % n_folds
+
+
+def compression_ratios(texts, workers=None, use_dictionary=True, groups=None, n_folds=DICT_FOLDS):
+    """
+    Compressed-size ratios for every text and compressor
+
+    Args:
+        groups: Run label per text for the dictionary folds (default: every
+                text is its own run)
+
+    Returns:
+        names: list of column names
+        ratios: (n_texts, n_compressors) float array, NaN for empty texts
+    """
+    encoded = [t.encode('utf-8') if t else b"" for t in texts]
+    workers = workers or os.cpu_count()
+    names, ratios = list(COMPRESSORS), _ratios(encoded, COMPRESSORS, workers)
+    if not use_dictionary or zstandard is None:
+        return names, ratios
+
+    folds = dictionary_folds(np.arange(len(encoded)) if groups is None else groups, n_folds)
+    held_out = np.full((len(encoded), 1), np.nan)
+    streams = RunStreams().chain('compression')
+    for k in range(n_folds):
+        rows = np.flatnonzero(folds == k)
+        train = [encoded[i] for i in np.flatnonzero(folds != k)]
+        dictionary = train_zstd_dictionary(train, rng=streams.generator('sampling', 1 + k))
+        if dictionary is None or not len(rows):
+            continue
+        suite = {'cr_zstd_dict': compressors(dictionary)['cr_zstd_dict']}
+        held_out[rows] = _ratios([encoded[i] for i in rows], suite, workers)
+    return names + ['cr_zstd_dict'], np.concatenate([ratios, held_out], axis=1)
+
+
+def add_compression_metrics(index, workers=None, use_dictionary=True):
+    """Store every ratio as a metric column of a ResultsIndex"""
+    runs = ["|".join(map(str, key)) for key in
+            zip(*(index[c].tolist() for c in ('file', 'model', 'condition', 'category', 'seed')))]
+    names, ratios = compression_ratios(index.texts, workers, use_dictionary, groups=runs)
+    for col, name in enumerate(names):
+        index.add_column(name, ratios[:, col])
+    return names
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="Multi-compressor compressibility ratios")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-dictionary', action='store_true', help="Skip the trained zstd dictionary")
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    index = load_index()
+    names = add_compression_metrics(index, args.workers, not args.no_dictionary)
+    table = pd.DataFrame({c: index[c] for c in ['model', 'condition', 'iteration'] + names})
+    table = table.dropna(subset=names, how='all')
+    if table.empty:
+        print("No texts to compress.")
+        return
+
+    print(table.groupby(['model', 'condition'])[names].mean().to_string(float_format=lambda v: f"{v:.3f}"))
+    print("\nRank agreement with cr_zlib9 (Spearman):")
+    ranks = table[names].rank()
+    for name in names:
+        print(f"  {name}: {ranks[name].corr(ranks['cr_zlib9']):.3f}")
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} rows saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+"""
+Exogenous Dose-Response Sweep (EXTENSIONS_IDEAS.md 1.2)
+
+Mixing operator:
+    α = endogenous weight (1.0 = pure closed loop, 0.0 = pure exogenous)
+    The next prompt takes a fraction α of a unit budget from the model's own
+    response and the rest from an exogenous passage. Units are characters
+    (the original 250 + 250 mix is α=0.5, budget=500), whitespace tokens or
+    sentences. Fractional unit counts are rounded stochastically from the
+    chain's 'mixing' stream. The exogenous share is filled by joining
+    further draws from the chain's 'exogenous' stream until it reaches its
+    budget; a response shorter than its share is not padded, so the achieved
+    endogenous share is recorded per step (state['endogenous_share']).
+
+Sweep driver:
+    For each seed, one closed-loop prefix is generated and journaled; every
+    α level is forked from it and all (seed, α) chains run concurrently.
+    Each record is scored as it arrives and streamed into a monitor that
+    re-estimates the critical α* (with a seed-level bootstrap CI) as soon as
+    every level has enough seeds.
+
+Critical α*:
+    protection(α) = (m(α) - m(α_max)) / (m(α_min) - m(α_max))
+    where m is the steady-state mean of a metric. α* is the largest α at which
+    protection reaches 1/2, linearly interpolated between levels.
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from chain_journal import exogenous_passages, run_chain
+from rng_streams import RunStreams, chain_streams
+from text_metrics import compute_all_metrics
+
+ALPHAS = [1.0, 0.9, 0.75, 0.5, 0.25, 0.1, 0.0]
+UNIT_BUDGETS = {'char': 500, 'token': 90, 'sentence': 6}
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+N_BOOTSTRAP = 2000
+
+
+# ----------------------------------------------------------------------
+# Mixing operator
+# ----------------------------------------------------------------------
+
+def _units(text, unit):
+    if unit == 'char':
+        return list(text)
+    if unit == 'token':
+        return text.split()
+    if unit == 'sentence':
+        return [s for s in SENTENCE_RE.split(text.strip()) if s]
+    raise ValueError(f"Unknown mixing unit: {unit}")
+
+
+def _join(units, unit):
+    return "".join(units) if unit == 'char' else " ".join(units)
+
+
+def _take(passages, n, unit):
+    """
+    First `n` units of consecutive passages
+
+    Every non-empty passage adds at least one unit, so at most `n` passages
+    are drawn; a finite source shorter than `n` units is used whole.
+    """
+    taken = []
+    for passage in islice(passages, n):
+        if len(taken) >= n:
+            break
+        if unit == 'char' and taken and passage:
+            taken.append(" ")
+        taken.extend(_units(passage, unit))
+    return taken[:n]
+
+
+def mix_parts(endogenous, exogenous, alpha, unit='char', budget=None, rng=None):
+    """
+    Endogenous and exogenous parts of a mixed prompt with endogenous weight `alpha`
+
+    Args:
+        endogenous: The model's previous response
+        exogenous: External passage, or an iterable of passages joined
+            until the exogenous share of the budget is filled
+        alpha: Endogenous weight in [0, 1]
+        unit: 'char', 'token' or 'sentence'
+        budget: Total units in the prompt (default UNIT_BUDGETS[unit])
+        rng: Generator for stochastic rounding (None = round to nearest)
+
+    Returns:
+        (endogenous part, exogenous part)
+    """
+    if not 0.0 <= alpha <= 1.0:
+        raise ValueError(f"alpha must be in [0, 1], got {alpha}")
+    budget = budget or UNIT_BUDGETS[unit]
+    exact = alpha * budget
+    n_endo = int(np.floor(exact))
+    frac = exact - n_endo
+    if rng is not None:
+        n_endo += int(rng.random() < frac)
+    else:
+        n_endo += int(frac >= 0.5)
+    n_exo = budget - n_endo
+
+    passages = [exogenous] if isinstance(exogenous, str) else exogenous
+    return (_join(_units(endogenous, unit)[:n_endo], unit),
+            _join(_take(passages, n_exo, unit) if n_exo else [], unit))
+
+
+def mix_prompt(endogenous, exogenous, alpha, unit='char', budget=None, rng=None):
+    """Mix endogenous and exogenous text with endogenous weight `alpha` (see mix_parts)"""
+    parts = mix_parts(endogenous, exogenous, alpha, unit, budget, rng)
+    return "\n\n".join(p for p in parts if p)
+
+
+def mixing_prompt(response, config, state, iteration):
+    """
+    run_chain prompt update for a chain configured with 'alpha'
+
+    Stores the achieved endogenous share (in mixing units) in the step state.
+    """
+    alpha = config['alpha']
+    unit = config.get('mix_unit', 'char')
+    passages = exogenous_passages(config, iteration) if alpha < 1.0 else ""
+    rng = chain_streams(config.get('run_id', 'default'), config.get('seed', 0)) \
+        .generator('mixing', iteration)
+    parts = mix_parts(response, passages, alpha, unit=unit, budget=config.get('mix_budget'), rng=rng)
+    n_endo, n_exo = (len(_units(p, unit)) for p in parts)
+    state['endogenous_share'] = n_endo / (n_endo + n_exo) if n_endo + n_exo else float('nan')
+    return "\n\n".join(p for p in parts if p)
+
+
+# ----------------------------------------------------------------------
+# Critical α* estimation
+# ----------------------------------------------------------------------
+
+def critical_alpha(levels, curves, protection=0.5):
+    """
+    Vectorized α* over a batch of dose-response curves
+
+    Args:
+        levels: (n_alpha,) α values sorted in descending order
+        curves: (n_alpha, B) steady-state metric means, one column per curve
+
+    Returns:
+        (B,) α* values (NaN where the curve is flat or never crosses)
+    """
+    levels = np.asarray(levels, dtype=float)
+    m_closed, m_exo = curves[0], curves[-1]
+    span = m_exo - m_closed
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = (curves - m_closed) / np.where(span == 0, np.nan, span)
+
+    crossed = p >= protection
+    k = np.argmax(crossed, axis=0)
+    valid = crossed.any(axis=0) & (k > 0) & np.isfinite(span) & (span != 0)
+    k = np.clip(k, 1, len(levels) - 1)
+    cols = np.arange(curves.shape[1])
+    p_hi, p_lo = p[k - 1, cols], p[k, cols]
+    a_hi, a_lo = levels[k - 1], levels[k]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha_star = a_hi + (protection - p_hi) * (a_lo - a_hi) / (p_lo - p_hi)
+    return np.where(valid, alpha_star, np.nan)
+
+
+class DoseResponseMonitor:
+    """
+    Streaming accumulator of steady-state metric values per (α, seed)
+
+    Call update() for every scored record; estimate() bootstraps α* over
+    seeds once every α level has at least `min_seeds` seeds with
+    `min_points` steady-state observations.
+    """
+
+    def __init__(self, alphas=ALPHAS, metric='shannon_entropy', steady_from=10,
+                 min_seeds=3, min_points=5, every=25, n_boot=N_BOOTSTRAP, run_id='dose'):
+        self.alphas = sorted(alphas, reverse=True)
+        self.metric = metric
+        self.steady_from = steady_from
+        self.min_seeds = min_seeds
+        self.min_points = min_points
+        self.every = every
+        self.n_boot = n_boot
+        self.run_id = run_id
+        self.values = {}
+        self.n_updates = 0
+        self.latest = None
+        self._lock = threading.Lock()
+
+    def update(self, alpha, seed, record):
+        with self._lock:
+            if record['iteration'] >= self.steady_from and self.metric in record:
+                self.values.setdefault((alpha, seed), []).append(record[self.metric])
+            self.n_updates += 1
+            if self.n_updates % self.every == 0 and self.ready():
+                self.latest = self.estimate()
+                print(f"    α* ≈ {self.latest['alpha_star']:.3f} "
+                      f"[{self.latest['ci_low']:.3f}, {self.latest['ci_high']:.3f}] "
+                      f"(n_seeds={self.latest['n_seeds']})")
+
+    def _common_seeds(self):
+        per_alpha = [{s for (a, s), v in self.values.items()
+                      if a == alpha and len(v) >= self.min_points} for alpha in self.alphas]
+        return sorted(set.intersection(*per_alpha)) if per_alpha else []
+
+    def ready(self):
+        return len(self._common_seeds()) >= self.min_seeds
+
+    def estimate(self, ci=0.95):
+        """α* with percentile bootstrap CI over seeds (seeds paired across levels)"""
+        seeds = self._common_seeds()
+        means = np.array([[np.mean(self.values[(alpha, s)]) for s in seeds]
+                          for alpha in self.alphas])
+
+        point = critical_alpha(self.alphas, means.mean(axis=1, keepdims=True))[0]
+
+        rng = RunStreams(self.run_id).chain('analysis').generator('sampling', self.n_updates)
+        idx = rng.integers(len(seeds), size=(self.n_boot, len(seeds)))
+        boot_curves = means[:, idx].mean(axis=2)
+        boot = critical_alpha(self.alphas, boot_curves)
+        boot = boot[np.isfinite(boot)]
+        tail = (1.0 - ci) / 2 * 100
+        ci_low, ci_high = (np.percentile(boot, [tail, 100 - tail]) if len(boot)
+                           else (np.nan, np.nan))
+
+        return {
+            'metric': self.metric,
+            'alpha_star': float(point),
+            'ci_low': float(ci_low),
+            'ci_high': float(ci_high),
+            'n_seeds': len(seeds),
+            'curve': {alpha: float(m) for alpha, m in zip(self.alphas, means.mean(axis=1))},
+        }
+
+
+# ----------------------------------------------------------------------
+# Sweep driver
+# ----------------------------------------------------------------------
+
+def run_sweep(journal, generate, seed_prompts, alphas=ALPHAS, iterations=100,
+              prefix_iterations=0, run_id='dose', metric='shannon_entropy',
+              max_workers=8, monitor=None, sink=None, on_step=None, **config):
+    """
+    Run every (seed, α) chain of a dose-response sweep
+
+    Args:
+        journal: ChainJournal
+        generate: Callable (prompt, config) -> text
+        seed_prompts: Seed prompt per seed index
+        alphas: Endogenous weights to sweep
+        iterations: Total iterations per chain (prefix included)
+        prefix_iterations: Shared closed-loop iterations before the levels fork
+        run_id: Run identifier (chain ids and RNG streams derive from it)
+        metric: Metric used for α* estimation
+        max_workers: Concurrent chains
+        monitor: Optional DoseResponseMonitor (created if None)
+        sink: Optional callback (alpha, seed, record) for every scored record
+        on_step: Optional record hook for the online monitors (e.g.
+            chain_journal.fan_out(cycles.update, regimes.update)). Each level
+            chain is fed its full trajectory, shared prefix included, with
+            every record keyed to the level's chain_id
+        **config: Extra chain config (model, exogenous_corpus, mix_unit, ...)
+
+    Returns:
+        The monitor, holding the latest α* estimate
+    """
+    if monitor is None:
+        monitor = DoseResponseMonitor(alphas, metric=metric,
+                                      steady_from=max(prefix_iterations, 10), run_id=run_id)
+
+    roots = []
+    for seed_idx, seed_prompt in enumerate(seed_prompts):
+        root_id = f"{run_id}_s{seed_idx}"
+        if not journal.exists(root_id):
+            journal.create_chain(root_id, seed_prompt, run_id=run_id, seed=seed_idx,
+                                 condition='closed_loop', alpha=1.0, **config)
+        roots.append(root_id)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Phase 1: one shared closed-loop prefix per seed
+        if prefix_iterations > 0:
+            list(pool.map(lambda r: run_chain(journal, r, generate, prefix_iterations,
+                                              metrics_fn=compute_all_metrics), roots))
+
+        # Phase 2: every (seed, α) level forks from the prefix
+        def run_level(seed_idx, alpha):
+            level_id = f"{roots[seed_idx]}_a{alpha:g}"
+            if not journal.exists(level_id):
+                journal.fork(roots[seed_idx], prefix_iterations - 1, level_id,
+                             condition='dose', alpha=alpha)
+
+            def on_level_step(record):
+                monitor.update(alpha, seed_idx, record)
+                if sink is not None:
+                    sink(alpha, seed_idx, record)
+                if on_step is not None:
+                    on_step(record)
+
+            if on_step is not None:
+                for record in journal.history(level_id, upto=prefix_iterations - 1):
+                    on_step({**record, 'chain_id': level_id})
+            for record in journal.own_steps(level_id):
+                on_level_step(record)
+            run_chain(journal, level_id, generate, iterations, next_prompt=mixing_prompt,
+                      metrics_fn=compute_all_metrics, on_step=on_level_step)
+
+        futures = [pool.submit(run_level, s, a)
+                   for s in RunStreams(run_id).seed_order(len(seed_prompts)) for a in alphas]
+        for future in futures:
+            future.result()
+
+    if monitor.ready():
+        monitor.latest = monitor.estimate()
+    return monitor
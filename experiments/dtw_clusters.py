@@ -0,0 +1,365 @@
+"""
+DTW Clusters - k-medoids over metric trajectories with lower-bound pruning
+
+Clusters every run (one (group, seed) trajectory of the results tensor) by
+dynamic time warping distance, to see whether seeds and models converge to
+the same dynamics.
+
+Keeping the all-pairs problem tractable:
+
+    batched DTW      the DP loops over (i, j) cells of the Sakoe-Chiba band
+                     in Python but every cell is one vector op over all
+                     pairs of a batch
+    early abandoning a pair is dropped from its batch as soon as its row
+                     minimum exceeds its threshold (best distance so far)
+    LB_Kim / Keogh   cheap lower bounds skip pairs that cannot beat the
+                     current best, both when assigning runs to medoids and
+                     when searching for a better medoid within a cluster
+
+Trajectories are taken on a common iteration horizon; runs covering less
+than `min_coverage` of it are excluded and small gaps are filled from the
+neighbouring observation.
+
+Usage:
+    python experiments/dtw_clusters.py --k 4 --metrics char_length --out results/dtw_clusters.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from rng_streams import RunStreams
+
+BATCH = 20000
+HORIZON = 50
+BAND = 5
+
+
+# ----------------------------------------------------------------------
+# Trajectory preparation
+# ----------------------------------------------------------------------
+
+def _fill_gaps(x):
+    """Forward- then backward-fill NaNs along axis 1 of (N, T, M)"""
+    n_steps = x.shape[1]
+    idx = np.arange(n_steps)[None, :, None]
+    mask = ~np.isnan(x)
+    last = np.maximum.accumulate(np.where(mask, idx, 0), axis=1)
+    filled = np.take_along_axis(np.where(mask, x, 0.0), last, axis=1)
+    filled = np.where(np.take_along_axis(mask, last, axis=1), filled, np.nan)
+    nxt = np.minimum.accumulate(np.where(mask, idx, n_steps - 1)[:, ::-1], axis=1)[:, ::-1]
+    back = np.take_along_axis(np.where(mask, x, 0.0), nxt, axis=1)
+    return np.where(np.isnan(filled), back, filled)
+
+
+def prepare_trajectories(tensor, horizon=HORIZON, min_coverage=0.8, normalize='series'):
+    """
+    (run, iteration, metric) matrix of comparable trajectories
+
+    Args:
+        horizon: Number of leading iterations kept
+        min_coverage: Minimum share of the horizon a run must cover
+        normalize: 'series' (z-score each run: shape only), 'global'
+                   (z-score each metric over all runs: shape and level) or None
+
+    Returns:
+        X (N, T, M) float array, keys DataFrame (group columns, seed)
+    """
+    from trend_fits import _group_frame
+
+    n_groups, n_seeds = tensor.values.shape[:2]
+    x = tensor.values[:, :, :horizon].reshape(n_groups * n_seeds, -1, len(tensor.metrics))
+    coverage = (~np.isnan(x)).all(axis=2).mean(axis=1)
+    keep = coverage >= min_coverage
+    x = _fill_gaps(x[keep])
+
+    if normalize == 'series':
+        mean, std = x.mean(axis=1, keepdims=True), x.std(axis=1, keepdims=True)
+        x = (x - mean) / np.where(std > 0, std, 1.0)
+    elif normalize == 'global':
+        mean, std = x.mean(axis=(0, 1), keepdims=True), x.std(axis=(0, 1), keepdims=True)
+        x = (x - mean) / np.where(std > 0, std, 1.0)
+
+    g, s = np.divmod(np.flatnonzero(keep), n_seeds)
+    keys = _group_frame(tensor, g, s)
+    return x, keys
+
+
+# ----------------------------------------------------------------------
+# Distances and lower bounds
+# ----------------------------------------------------------------------
+
+class DTWEngine:
+    """
+    Banded DTW over a fixed set of trajectories, with lower bounds and a
+    cache of exact distances. All distances are sqrt of the summed squared
+    Euclidean cost along the warping path.
+    """
+
+    def __init__(self, x, band=BAND):
+        self.x = np.ascontiguousarray(x, dtype=float)
+        self.band = band
+        self.cache = {}
+        self.n_exact = 0
+        self.n_abandoned = 0
+        self.n_pruned = 0
+
+        pad = np.full((len(x), band, x.shape[2]), np.nan)
+        padded = np.concatenate([pad, self.x, pad], axis=1)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * band + 1, axis=1)
+        self.upper = np.nanmax(windows, axis=-1)
+        self.lower = np.nanmin(windows, axis=-1)
+
+    # Lower bounds (squared) -------------------------------------------
+
+    def lb_kim(self, ia, ib):
+        """First and last points lie on every warping path"""
+        a, b = self.x[ia], self.x[ib]
+        return (((a[:, 0] - b[:, 0]) ** 2).sum(axis=-1)
+                + ((a[:, -1] - b[:, -1]) ** 2).sum(axis=-1))
+
+    def lb_keogh(self, ia, ib):
+        """Distance of a to the band envelope of b"""
+        a = self.x[ia]
+        above = np.maximum(a - self.upper[ib], 0.0)
+        below = np.maximum(self.lower[ib] - a, 0.0)
+        return (above ** 2 + below ** 2).sum(axis=(1, 2))
+
+    def lower_bound(self, ia, ib):
+        ia, ib = np.asarray(ia), np.asarray(ib)
+        out = np.empty(len(ia))
+        for lo in range(0, len(ia), BATCH):
+            a, b = ia[lo:lo + BATCH], ib[lo:lo + BATCH]
+            out[lo:lo + BATCH] = np.maximum.reduce([self.lb_kim(a, b), self.lb_keogh(a, b),
+                                                    self.lb_keogh(b, a)])
+        return np.sqrt(out)
+
+    # Exact distances ----------------------------------------------------
+
+    def _dtw_batch(self, ia, ib, limit):
+        """Squared DTW for one batch; inf where abandoned above `limit`"""
+        n_steps, band = self.x.shape[1], self.band
+        result = np.full(len(ia), np.inf)
+        active = np.arange(len(ia))
+        a, b, limit = self.x[ia], self.x[ib], limit.copy()
+        prev = np.full((len(ia), n_steps + 1), np.inf)
+        prev[:, 0] = 0.0
+
+        for i in range(1, n_steps + 1):
+            lo, hi = max(1, i - band), min(n_steps, i + band)
+            cost = ((a[:, i - 1, None, :] - b[:, lo - 1:hi, :]) ** 2).sum(axis=-1)
+            cur = np.full_like(prev, np.inf)
+            diag_up = np.minimum(prev[:, lo - 1:hi], prev[:, lo:hi + 1])
+            left = cur[:, lo - 1]
+            for k in range(hi - lo + 1):
+                left = cost[:, k] + np.minimum(diag_up[:, k], left)
+                cur[:, lo + k] = left
+
+            alive = cur[:, lo:hi + 1].min(axis=1) <= limit
+            if not alive.all():
+                self.n_abandoned += int((~alive).sum())
+                active, a, b, limit, cur = (active[alive], a[alive], b[alive],
+                                            limit[alive], cur[alive])
+                if not len(active):
+                    return result
+            prev = cur
+
+        result[active] = prev[:, n_steps]
+        return result
+
+    def distances(self, ia, ib, thresholds=None):
+        """
+        DTW distances for pairs (ia[k], ib[k])
+
+        Pairs whose distance would exceed thresholds[k] may be abandoned and
+        returned as inf. Exact results are cached symmetrically.
+        """
+        ia, ib = np.asarray(ia), np.asarray(ib)
+        out = np.full(len(ia), np.inf)
+        todo = []
+        for k, (i, j) in enumerate(zip(ia.tolist(), ib.tolist())):
+            key = (i, j) if i <= j else (j, i)
+            if i == j:
+                out[k] = 0.0
+            elif key in self.cache:
+                out[k] = self.cache[key]
+            else:
+                todo.append(k)
+        if not todo:
+            return out
+
+        todo = np.array(todo)
+        limit = np.full(len(todo), np.inf) if thresholds is None \
+            else np.asarray(thresholds, dtype=float)[todo] ** 2
+        for lo in range(0, len(todo), BATCH):
+            sel = todo[lo:lo + BATCH]
+            d2 = self._dtw_batch(ia[sel], ib[sel], limit[lo:lo + BATCH])
+            self.n_exact += len(sel)
+            out[sel] = np.sqrt(d2)
+            for k in sel[np.isfinite(d2)].tolist():
+                i, j = int(ia[k]), int(ib[k])
+                self.cache[(i, j) if i <= j else (j, i)] = out[k]
+        return out
+
+    def nearest(self, queries, targets):
+        """
+        Nearest target for every query, visiting targets in lower-bound order
+
+        Returns:
+            index into `targets` (N,), distance (N,)
+        """
+        queries, targets = np.asarray(queries), np.asarray(targets)
+        qi = np.repeat(queries, len(targets))
+        ti = np.tile(targets, len(queries))
+        lb = self.lower_bound(qi, ti).reshape(len(queries), len(targets))
+        order = np.argsort(lb, axis=1)
+
+        best = np.full(len(queries), np.inf)
+        best_idx = np.zeros(len(queries), dtype=np.int64)
+        rows = np.arange(len(queries))
+        for r in range(len(targets)):
+            cand = order[:, r]
+            need = lb[rows, cand] < best
+            self.n_pruned += int((~need).sum())
+            if not need.any():
+                continue
+            d = self.distances(queries[need], targets[cand[need]], best[need])
+            better = d < best[need]
+            upd = rows[need][better]
+            best[upd] = d[better]
+            best_idx[upd] = cand[need][better]
+        return best_idx, best
+
+
+# ----------------------------------------------------------------------
+# k-medoids
+# ----------------------------------------------------------------------
+
+def _init_medoids(engine, k, rng):
+    """k-medoids++ seeding (distance updates use early abandoning)"""
+    n = len(engine.x)
+    everyone = np.arange(n)
+    medoids = [int(rng.integers(n))]
+    dist = engine.distances(everyone, np.full(n, medoids[0]))
+    while len(medoids) < k:
+        weights = np.where(np.isfinite(dist), dist ** 2, 0.0)
+        if weights.sum() == 0:
+            break
+        new = int(rng.choice(n, p=weights / weights.sum()))
+        medoids.append(new)
+        dist = np.minimum(dist, engine.distances(everyone, np.full(n, new), dist))
+    return np.array(medoids)
+
+
+def _update_medoid(engine, members, current, current_cost, chunk=256):
+    """
+    Best medoid of one cluster
+
+    Candidates are visited by increasing lower-bound sum and stop once that
+    sum reaches the best cost. A candidate is abandoned as soon as its
+    exact partial sum plus the lower bounds of the remaining members does.
+    """
+    lbs = np.stack([engine.lower_bound(np.full(len(members), c), members) for c in members])
+    lb_sum = lbs.sum(axis=1)
+    best, best_cost = current, current_cost
+    for pos in np.argsort(lb_sum):
+        c = members[pos]
+        if lb_sum[pos] >= best_cost:
+            break
+        if c == best:
+            continue
+        remaining = lb_sum[pos]
+        cost = 0.0
+        for lo in range(0, len(members), chunk):
+            part = members[lo:lo + chunk]
+            cost += engine.distances(np.full(len(part), c), part).sum()
+            remaining -= lbs[pos, lo:lo + chunk].sum()
+            if cost + remaining >= best_cost:
+                break
+        else:
+            if cost < best_cost:
+                best, best_cost = c, cost
+    return best, best_cost
+
+
+def kmedoids(x, k, band=BAND, max_iter=20, rng=None):
+    """
+    k-medoids (alternating assignment / medoid update) under banded DTW
+
+    Returns:
+        dict: labels (N,), distance (N,) to own medoid, medoids (k,) run
+        indices, engine (with pruning counters and distance cache)
+    """
+    rng = rng or RunStreams().chain('dtw').generator('sampling')
+    engine = DTWEngine(x, band)
+    medoids = _init_medoids(engine, k, rng)
+    everyone = np.arange(len(x))
+    labels = None
+
+    for _ in range(max_iter):
+        new_labels, dist = engine.nearest(everyone, medoids)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(len(medoids)):
+            members = everyone[labels == c]
+            if len(members) > 1:
+                medoids[c], _ = _update_medoid(engine, members, medoids[c], dist[members].sum())
+
+    labels, dist = engine.nearest(everyone, medoids)
+    return {'labels': labels, 'distance': dist, 'medoids': medoids, 'engine': engine}
+
+
+def cluster_runs(tensor, k=4, horizon=HORIZON, band=BAND, min_coverage=0.8,
+                 normalize='series', rng=None):
+    """
+    Cluster every run of a ResultsTensor; the table joins back on the
+    tensor's group columns and seed
+
+    Returns:
+        (assignments DataFrame, kmedoids result dict)
+    """
+    x, keys = prepare_trajectories(tensor, horizon, min_coverage, normalize)
+    if len(x) < k:
+        raise ValueError(f"Only {len(x)} runs cover the horizon; need at least k={k}")
+    result = kmedoids(x, k, band=band, rng=rng)
+    keys['cluster'] = result['labels']
+    keys['distance'] = result['distance']
+    keys['medoid'] = False
+    keys.loc[result['medoids'], 'medoid'] = True
+    return keys, result
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="DTW k-medoids clustering of trajectories")
+    parser.add_argument('--group-by', nargs='+', default=['file', 'model', 'category', 'condition'])
+    parser.add_argument('--metrics', nargs='+', default=['char_length'])
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--band', type=int, default=BAND, help="Sakoe-Chiba half-width")
+    parser.add_argument('--normalize', choices=['series', 'global', 'none'], default='series')
+    parser.add_argument('--out', default=None, help="CSV of cluster assignments")
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=args.group_by)
+    table, result = cluster_runs(tensor, k=args.k, horizon=args.horizon, band=args.band,
+                                 normalize=None if args.normalize == 'none' else args.normalize)
+
+    engine = result['engine']
+    n = len(table)
+    print(f"{n} runs, {n * (n - 1) // 2} possible pairs: {engine.n_exact} DTW computed, "
+          f"{engine.n_abandoned} abandoned early, {engine.n_pruned} pruned by lower bounds\n")
+    print(pd.crosstab([table[c] for c in ('model', 'condition') if c in table], table['cluster']))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {n} assignments saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
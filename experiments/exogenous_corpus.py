@@ -0,0 +1,250 @@
+"""
+Exogenous Corpus - memory-mapped passage store with reproducible sampling
+
+Replaces the 10-item EXOGENOUS_TEXTS list for large injection studies.
+On-disk layout (results/exogenous_corpus/ by default):
+
+    texts.bin     UTF-8 passages concatenated back to back
+    index.npy     one row per passage: offset, n_bytes, n_chars, domain, bucket
+                  (rows sorted by (domain, bucket) so each group is contiguous)
+    groups.npy    one row per (domain, bucket): start row, count
+    meta.json     domain names and length-bucket edges
+
+Nothing is loaded into RAM beyond the group table: texts.bin and index.npy
+are memory-mapped, and a draw touches one index row and one byte range.
+Sampling is a pure function of (run, seed, iteration), so parallel workers
+and resumed runs inject exactly the same passages.
+
+Usage:
+    python experiments/exogenous_corpus.py build --src data/gutenberg/ --out results/exogenous_corpus
+    python experiments/exogenous_corpus.py sample --run dose01 --seed 3 --iteration 42
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from rng_streams import chain_streams
+
+CORPUS_DIR = Path("results") / "exogenous_corpus"
+BUCKET_EDGES = [0, 128, 256, 512, 1024, 2048]  # lower edges, in characters
+MIN_PASSAGE_CHARS = 40
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('n_bytes', '<u4'),
+    ('n_chars', '<u4'),
+    ('domain', '<u2'),
+    ('bucket', '<u1'),
+])
+GROUP_DTYPE = np.dtype([
+    ('domain', '<u2'),
+    ('bucket', '<u1'),
+    ('start', '<u8'),
+    ('count', '<u8'),
+])
+
+
+def length_bucket(n_chars, edges=BUCKET_EDGES):
+    """Index of the length bucket containing n_chars"""
+    return int(np.searchsorted(edges, n_chars, side='right') - 1)
+
+
+# ----------------------------------------------------------------------
+# Building
+# ----------------------------------------------------------------------
+
+def build_corpus(passages, out_dir=CORPUS_DIR, bucket_edges=BUCKET_EDGES,
+                 min_chars=MIN_PASSAGE_CHARS):
+    """
+    Write a corpus from an iterable of (text, domain) pairs
+
+    Texts are streamed straight to texts.bin; only the fixed-size index
+    rows are held in memory while building.
+
+    Returns:
+        Number of passages written
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    domains = {}
+    rows = []
+    offset = 0
+    with open(out_dir / "texts.bin", 'wb') as f:
+        for text, domain in passages:
+            text = " ".join(text.split())
+            if len(text) < min_chars:
+                continue
+            data = text.encode('utf-8')
+            domain_id = domains.setdefault(domain, len(domains))
+            rows.append((offset, len(data), len(text), domain_id,
+                         length_bucket(len(text), bucket_edges)))
+            f.write(data)
+            offset += len(data)
+
+    index = np.array(rows, dtype=INDEX_DTYPE)
+    index = index[np.lexsort((index['bucket'], index['domain']))]
+
+    keys = index['domain'].astype(np.int64) * 256 + index['bucket']
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], int)
+    counts = np.diff(np.r_[starts, len(keys)])
+    groups = np.zeros(len(starts), dtype=GROUP_DTYPE)
+    groups['domain'] = index['domain'][starts]
+    groups['bucket'] = index['bucket'][starts]
+    groups['start'] = starts
+    groups['count'] = counts
+
+    np.save(out_dir / "index.npy", index)
+    np.save(out_dir / "groups.npy", groups)
+    with open(out_dir / "meta.json", 'w') as f:
+        json.dump({'domains': sorted(domains, key=domains.get),
+                   'bucket_edges': list(bucket_edges),
+                   'n_passages': int(len(index)),
+                   'n_bytes': int(offset)}, f, indent=2)
+    return len(index)
+
+
+def iter_source_passages(src):
+    """
+    Yield (text, domain) from a file or directory
+
+    .txt files are split on blank lines, the domain being the parent
+    directory name; .jsonl files must hold {"text": ..., "domain": ...}.
+    """
+    src = Path(src)
+    files = sorted(src.rglob("*")) if src.is_dir() else [src]
+    for path in files:
+        if path.suffix == '.txt':
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                block = []
+                for line in f:
+                    if line.strip():
+                        block.append(line)
+                    elif block:
+                        yield "".join(block), path.parent.name
+                        block = []
+                if block:
+                    yield "".join(block), path.parent.name
+        elif path.suffix == '.jsonl':
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        yield item['text'], item.get('domain', path.stem)
+
+
+# ----------------------------------------------------------------------
+# Sampling
+# ----------------------------------------------------------------------
+
+class ExogenousCorpus:
+    """Read-only memory-mapped view over a built corpus"""
+
+    def __init__(self, path=CORPUS_DIR):
+        self.path = Path(path)
+        with open(self.path / "meta.json", 'r') as f:
+            meta = json.load(f)
+        self.domains = meta['domains']
+        self.bucket_edges = meta['bucket_edges']
+        self.index = np.load(self.path / "index.npy", mmap_mode='r')
+        self.groups = np.load(self.path / "groups.npy")
+        self.texts = np.memmap(self.path / "texts.bin", dtype=np.uint8, mode='r') \
+            if meta['n_bytes'] else np.zeros(0, dtype=np.uint8)
+        self._selections = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def passage(self, row):
+        """Decode passage at index row"""
+        entry = self.index[row]
+        start = int(entry['offset'])
+        return bytes(self.texts[start:start + int(entry['n_bytes'])]).decode('utf-8')
+
+    def _selection(self, domain, bucket):
+        """Cumulative group counts matching a (domain, bucket) filter"""
+        key = (domain if domain is None or isinstance(domain, str) else tuple(domain),
+               bucket if bucket is None or np.isscalar(bucket) else tuple(bucket))
+        if key not in self._selections:
+            mask = np.ones(len(self.groups), dtype=bool)
+            if domain is not None:
+                domain_ids = [domain] if isinstance(domain, str) else list(domain)
+                ids = [self.domains.index(d) for d in domain_ids]
+                mask &= np.isin(self.groups['domain'], ids)
+            if bucket is not None:
+                buckets = [bucket] if np.isscalar(bucket) else list(bucket)
+                mask &= np.isin(self.groups['bucket'], buckets)
+            selected = self.groups[mask]
+            if len(selected) == 0:
+                raise ValueError(f"No passages match domain={domain}, bucket={bucket}")
+            self._selections[key] = (selected['start'].astype(np.int64),
+                                     np.cumsum(selected['count'].astype(np.int64)))
+        return self._selections[key]
+
+    def sample_row(self, rng, domain=None, bucket=None):
+        """Draw one index row uniformly among passages matching the filter"""
+        starts, cum_counts = self._selection(domain, bucket)
+        k = int(rng.integers(cum_counts[-1]))
+        g = int(np.searchsorted(cum_counts, k, side='right'))
+        within = k - (cum_counts[g - 1] if g else 0)
+        return int(starts[g] + within)
+
+    def sample(self, run, seed, iteration, domain=None, bucket=None, max_chars=250):
+        """
+        Deterministic passage for (run, seed, iteration)
+
+        Args:
+            run: Run identifier (str or int)
+            seed: Seed index of the chain
+            iteration: Iteration being injected
+            domain: Optional domain name (or list of names)
+            bucket: Optional length bucket index (or list)
+            max_chars: Truncation length (None keeps the full passage)
+        """
+        rng = chain_streams(run, seed).generator('exogenous', iteration)
+        text = self.passage(self.sample_row(rng, domain, bucket))
+        return text[:max_chars] if max_chars else text
+
+
+_OPEN_CORPORA = {}
+
+
+def open_corpus(path=CORPUS_DIR):
+    """Process-wide cache so runner steps do not re-open the memory maps"""
+    key = str(Path(path).resolve())
+    if key not in _OPEN_CORPORA:
+        _OPEN_CORPORA[key] = ExogenousCorpus(path)
+    return _OPEN_CORPORA[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or sample the exogenous corpus")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Build corpus from .txt/.jsonl sources")
+    build.add_argument('--src', required=True)
+    build.add_argument('--out', default=str(CORPUS_DIR))
+
+    sample = sub.add_parser('sample', help="Show the passage drawn for (run, seed, iteration)")
+    sample.add_argument('--corpus', default=str(CORPUS_DIR))
+    sample.add_argument('--run', default='default')
+    sample.add_argument('--seed', type=int, default=0)
+    sample.add_argument('--iteration', type=int, default=0)
+    sample.add_argument('--domain', default=None)
+    sample.add_argument('--bucket', type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        n = build_corpus(iter_source_passages(args.src), args.out)
+        print(f"✓ {n} passages written to {args.out}")
+    else:
+        corpus = ExogenousCorpus(args.corpus)
+        print(corpus.sample(args.run, args.seed, args.iteration,
+                            domain=args.domain, bucket=args.bucket, max_chars=None))
+
+
+if __name__ == '__main__':
+    main()
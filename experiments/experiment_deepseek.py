@@ -3,11 +3,14 @@ import json
 import time
 import requests
 
+from logprob_entropy import from_response_json, request_kwargs
+
 # 1. Configuration
 API_KEY = os.environ.get("DEEPSEEK_API_KEY", "").strip()
 ENDPOINT = "https://api.deepseek.com/v1/chat/completions" # Adjust if using a provider
 MODEL_NAME = "deepseek-chat" 
 OUTPUT_PATH = "results/deepseek_validation.json"
+LOGPROBS_TOP_K = int(os.environ.get("LOGPROBS_TOP_K", "0"))  # >0: store per-token model entropy
 
 def call_deepseek(prompt):
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {API_KEY}"}
@@ -16,15 +19,19 @@ def call_deepseek(prompt):
         "messages": [{"role": "user", "content": prompt}], 
         "temperature": 0.8
     }
+    if LOGPROBS_TOP_K:
+        payload.update(request_kwargs(LOGPROBS_TOP_K))
     for attempt in range(3):
         try:
             response = requests.post(ENDPOINT, headers=headers, json=payload, timeout=60)
             if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
+                data = response.json()
+                logprob_fields = from_response_json(data).fields() if LOGPROBS_TOP_K else {}
+                return data['choices'][0]['message']['content'], logprob_fields
             time.sleep(2)
         except:
             time.sleep(5)
-    return None
+    return None, {}
 
 def run_experiment():
     if not API_KEY:
@@ -51,9 +58,10 @@ def run_experiment():
         print(f"🔵 Seed {s_idx+1}/10...")
         current_text = seed
         for i in range(50): # Let's start with 50 iterations
-            output = call_deepseek(f"Expand: {current_text}")
+            output, logprob_fields = call_deepseek(f"Expand: {current_text}")
             if output:
-                results.append({"iteration": i, "seed": s_idx, "condition": "closed_loop", "text": output})
+                results.append({"iteration": i, "seed": s_idx, "condition": "closed_loop", "text": output,
+                                **logprob_fields})
                 current_text = output
                 with open(OUTPUT_PATH, 'w') as f:
                     json.dump(results, f, indent=2)
@@ -0,0 +1,115 @@
+"""
+Exogenous Dose-Response Experiment (EXTENSIONS_IDEAS.md 1.2)
+
+α ∈ {1.0, 0.9, 0.75, 0.5, 0.25, 0.1, 0.0} (endogenous weight)
+Seeds: 5, Iterations: 100, shared closed-loop prefix: 10 iterations
+
+All α levels of a seed fork from the same journaled prefix and run
+concurrently; α* is re-estimated with a bootstrap CI as records arrive.
+Every level chain is also followed online by the cycle, regime and
+steady-state monitors.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import anthropic
+
+from chain_journal import ChainJournal, fan_out
+from dose_response import ALPHAS, run_sweep
+from minhash_cycles import CycleMonitor
+from regimes import RegimeMonitor
+from steady_state import SteadyStateTracker
+
+MODEL = "claude-sonnet-4-20250514"
+RUN_ID = "dose_response_v1"
+ITERATIONS = 100
+PREFIX_ITERATIONS = 10
+NUM_SEEDS = 5
+TEMPERATURE = 0.8
+TOP_P = 0.9
+MAX_TOKENS = 500
+MIX_UNIT = 'char'  # 'char', 'token' or 'sentence'
+EXOGENOUS_CORPUS = None  # Path to a built exogenous corpus, or None for EXOGENOUS_TEXTS
+STEADY_METRICS = ['shannon_entropy', 'lz_complexity']
+
+SEED_PROMPTS = [
+    "Describe the relationship between memory and identity.",
+    "Explain how cities evolve over time.",
+    "What makes a system resilient?",
+    "Describe the nature of emergent behavior.",
+    "How do languages change across generations?",
+]
+
+EXOGENOUS_TEXTS = [
+    "The ship wherein Theseus and the youth of Athens returned had thirty oars, and was preserved by the Athenians down even to the time of Demetrius Phalereus, for they took away the old planks as they decayed, putting in new and stronger timber in their place.",
+    "In the beginning was the Word, and the Word was with God, and the Word was God. The same was in the beginning with God. All things were made by him; and without him was not any thing made that was made.",
+    "We hold these truths to be self-evident, that all men are created equal, that they are endowed by their Creator with certain unalienable Rights, that among these are Life, Liberty and the pursuit of Happiness.",
+    "It was the best of times, it was the worst of times, it was the age of wisdom, it was the age of foolishness, it was the epoch of belief, it was the epoch of incredulity.",
+    "In the province of the mind, what one believes to be true either is true or becomes true within certain limits to be found experientially and experimentally.",
+    "Not all those who wander are lost. The old that is strong does not wither, deep roots are not reached by the frost.",
+    "In wildness is the preservation of the world. I wish to speak a word for Nature, for absolute freedom and wildness.",
+    "We are what we repeatedly do. Excellence, then, is not an act, but a habit."
+]
+
+OUTPUT_PATH = Path("results") / f"{RUN_ID}_alpha_star.json"
+
+client = anthropic.Anthropic()  # Uses ANTHROPIC_API_KEY env var
+
+
+def generate(prompt, config):
+    """Single Claude call using the chain's own sampling parameters"""
+    for attempt in range(3):
+        try:
+            message = client.messages.create(
+                model=config['model'],
+                max_tokens=config.get('max_tokens', MAX_TOKENS),
+                temperature=config.get('temperature', TEMPERATURE),
+                top_p=config.get('top_p', TOP_P),
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return message.content[0].text
+        except Exception as e:
+            print(f"API Error: {e}")
+            time.sleep(5)
+    return None
+
+
+def main():
+    journal = ChainJournal()
+    print(f"🚀 Dose-response sweep | {MODEL} | α={ALPHAS} | {NUM_SEEDS} seeds × {ITERATIONS} iters")
+
+    cycles, regimes = CycleMonitor(), RegimeMonitor(metric_keys=STEADY_METRICS)
+    steady = SteadyStateTracker(STEADY_METRICS)
+    monitor = run_sweep(journal, generate, SEED_PROMPTS[:NUM_SEEDS], alphas=ALPHAS,
+                        iterations=ITERATIONS, prefix_iterations=PREFIX_ITERATIONS,
+                        run_id=RUN_ID, model=MODEL, temperature=TEMPERATURE,
+                        mix_unit=MIX_UNIT, exogenous_corpus=EXOGENOUS_CORPUS,
+                        exogenous_texts=EXOGENOUS_TEXTS,
+                        on_step=fan_out(cycles.update, regimes.update, steady.update))
+
+    print("\nOnline monitors per level chain:")
+    for chain_id in sorted(steady.moments):
+        label, confidence = regimes.latest.get(chain_id, ('n/a', float('nan')))
+        found = cycles.detectors[chain_id].detected if chain_id in cycles.detectors else None
+        cycle = f"period {found['period']} from iter {found['onset']}" if found else "none"
+        moments = steady.moments[chain_id]
+        means = ", ".join(f"{m}={v:.3f}" for m, v in zip(STEADY_METRICS, moments.mean)) \
+            if moments.n.any() else "no steady data"
+        print(f"  {chain_id}: regime={label} ({confidence:.2f}) | cycle={cycle} | {means}")
+
+    if monitor.latest is None:
+        print("⚠️ Not enough completed seeds to estimate α*")
+        return
+
+    est = monitor.latest
+    print(f"\n🏁 α* = {est['alpha_star']:.3f} (95% CI {est['ci_low']:.3f}–{est['ci_high']:.3f}, "
+          f"{est['metric']}, n={est['n_seeds']} seeds)")
+    with open(OUTPUT_PATH, 'w') as f:
+        json.dump(est, f, indent=2)
+    print(f"✓ Estimate saved to {OUTPUT_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -14,19 +14,23 @@ import anthropic
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from collections import Counter
 import json
 import time
 from pathlib import Path
-from scipy import stats
 from datetime import datetime
 
+from results_tensor import ResultsTensor
+from trend_fits import batched_ols
+from rng_streams import RunStreams
+from text_metrics import compute_all_metrics
+
 # Configuration - REDUCED for free tier
 ITERATIONS = 20  # Reduced from 100
 NUM_SEEDS = 3    # Reduced from 10
 TEMPERATURE = 0.8
 TOP_P = 0.9
 MAX_TOKENS = 500
+RUN_SEED = 20260214  # Root of all per-chain RNG streams (see rng_streams.py)
 API_KEY = "YOUR_API_KEY_HERE"  # Will use environment variable
 
 # Seed prompts (using first 3)
@@ -48,68 +52,6 @@ client = anthropic.Anthropic(api_key="API KEY ")
 
 
 
-def lempel_ziv_complexity(s):
-    """Compute normalized Lempel-Ziv complexity"""
-    if not s:
-        return 0
-    i, c = 0, 1
-    u, v, w = 0, 1, 1
-    s_len = len(s)
-    
-    while u + v <= s_len:
-        if s[i + v - 1] == s[u + v - 1]:
-            v += 1
-        else:
-            c += 1
-            i = 0
-            u += w
-            v = 1
-            w = u
-    
-    if v != 1:
-        c += 1
-    
-    return c / (len(s) / np.log2(len(s)))
-
-
-def shannon_entropy(s):
-    """Compute Shannon entropy in bits per character"""
-    if not s:
-        return 0
-    counts = Counter(s)
-    probs = [count / len(s) for count in counts.values()]
-    return -sum(p * np.log2(p) for p in probs)
-
-
-def trigram_diversity(s):
-    """Compute type-token ratio for trigrams"""
-    words = s.lower().split()
-    if len(words) < 3:
-        return 1.0
-    trigrams = [tuple(words[i:i+3]) for i in range(len(words) - 2)]
-    if not trigrams:
-        return 1.0
-    return len(set(trigrams)) / len(trigrams)
-
-
-def unique_words_ratio(s):
-    """Compute ratio of unique words to total words"""
-    words = s.lower().split()
-    if not words:
-        return 0
-    return len(set(words)) / len(words)
-
-
-def compute_all_metrics(text):
-    """Compute all complexity metrics for a text"""
-    return {
-        'lz_complexity': lempel_ziv_complexity(text),
-        'shannon_entropy': shannon_entropy(text),
-        'trigram_diversity': trigram_diversity(text),
-        'unique_words_ratio': unique_words_ratio(text)
-    }
-
-
 def generate_response(prompt, system_prompt="You are a helpful assistant."):
     """Generate response using Claude API with rate limiting"""
     try:
@@ -143,6 +85,7 @@ def run_single_experiment(seed_idx, condition):
     print(f"  Running {condition} condition for seed {seed_idx}...")
     
     prompt = SEED_PROMPTS[seed_idx]
+    streams = RunStreams(RUN_SEED).chain(seed_idx)
     results = []
     
     for iteration in range(ITERATIONS):
@@ -162,7 +105,9 @@ def run_single_experiment(seed_idx, condition):
             prompt = response[:500]
         else:  # exogenous
             # 50/50 mix with random exogenous text
-            exo_text = np.random.choice(EXOGENOUS_TEXTS)
+            # (counter-based stream: independent of scheduling and resumes)
+            rng = streams.generator('exogenous', iteration)
+            exo_text = EXOGENOUS_TEXTS[rng.integers(len(EXOGENOUS_TEXTS))]
             prompt = f"{response[:250]}\n\n{exo_text[:250]}"
         
         if (iteration + 1) % 5 == 0:
@@ -182,8 +127,10 @@ def run_full_experiment():
     all_results = []
     start_time = time.time()
     
-    for seed_idx in range(NUM_SEEDS):
-        print(f"\n=== Seed {seed_idx + 1}/{NUM_SEEDS} ===")
+    # Seeds run in a reproducible shuffled order, so drift over wall-clock
+    # time (rate limits, model updates) does not line up with seed index
+    for n, seed_idx in enumerate(RunStreams(RUN_SEED).seed_order(NUM_SEEDS)):
+        print(f"\n=== Seed {seed_idx} ({n + 1}/{NUM_SEEDS}) ===")
         
         # Run both conditions for this seed
         closed_results = run_single_experiment(seed_idx, 'closed_loop')
@@ -221,32 +168,32 @@ def analyze_results(results):
     print("STATISTICAL ANALYSIS")
     print("="*60)
     
-    # Convert to numpy arrays for analysis
-    closed_data = [r for r in results if r['condition'] == 'closed_loop']
-    exogenous_data = [r for r in results if r['condition'] == 'exogenous']
-    
     metrics = ['lz_complexity', 'shannon_entropy', 'trigram_diversity', 'unique_words_ratio']
     
+    # Dense (condition, seed, iteration, metric) tensor: every statistic below is an array reduction
+    tensor = ResultsTensor.from_records(results, metrics=metrics)
+    closed = tensor.groups.index('closed_loop')
+    exo = tensor.groups.index('exogenous')
+    desc = tensor.describe()
+    
     print("\n1. DESCRIPTIVE STATISTICS")
     print("-" * 60)
     
-    for metric in metrics:
-        closed_vals = [r[metric] for r in closed_data]
-        exo_vals = [r[metric] for r in exogenous_data]
+    for m, metric in enumerate(metrics):
+        closed_mean, exo_mean = desc['mean'][closed, m], desc['mean'][exo, m]
         
         print(f"\n{metric.replace('_', ' ').title()}:")
-        print(f"  Closed-loop:  {np.mean(closed_vals):.4f} ± {np.std(closed_vals):.4f}")
-        print(f"  Exogenous:    {np.mean(exo_vals):.4f} ± {np.std(exo_vals):.4f}")
-        print(f"  Difference:   {np.mean(exo_vals) - np.mean(closed_vals):.4f} ({((np.mean(exo_vals) - np.mean(closed_vals))/np.mean(closed_vals)*100):.1f}%)")
+        print(f"  Closed-loop:  {closed_mean:.4f} ± {desc['std'][closed, m]:.4f}")
+        print(f"  Exogenous:    {exo_mean:.4f} ± {desc['std'][exo, m]:.4f}")
+        print(f"  Difference:   {exo_mean - closed_mean:.4f} ({((exo_mean - closed_mean)/closed_mean*100):.1f}%)")
     
     print("\n2. MANN-WHITNEY U TESTS (Non-parametric)")
     print("-" * 60)
     
-    for metric in metrics:
-        closed_vals = [r[metric] for r in closed_data]
-        exo_vals = [r[metric] for r in exogenous_data]
-        
-        statistic, p_value = stats.mannwhitneyu(exo_vals, closed_vals, alternative='greater')
+    mwu = tensor.rank_test('exogenous', 'closed_loop', alternative='greater')
+    
+    for m, metric in enumerate(metrics):
+        statistic, p_value = mwu['statistic'][m], mwu['p'][m]
         
         significance = "***" if p_value < 0.001 else "**" if p_value < 0.01 else "*" if p_value < 0.05 else "ns"
         
@@ -257,16 +204,11 @@ def analyze_results(results):
     print("\n3. TREND ANALYSIS (Linear Regression)")
     print("-" * 60)
     
-    for metric in metrics:
-        # Closed-loop trend
-        closed_vals = [r[metric] for r in closed_data]
-        iterations = [r['iteration'] for r in closed_data]
-        closed_slope, closed_intercept, closed_r, closed_p, _ = stats.linregress(iterations, closed_vals)
-        
-        # Exogenous trend
-        exo_vals = [r[metric] for r in exogenous_data]
-        exo_iterations = [r['iteration'] for r in exogenous_data]
-        exo_slope, exo_intercept, exo_r, exo_p, _ = stats.linregress(exo_iterations, exo_vals)
+    trend = tensor.trend()
+    
+    for m, metric in enumerate(metrics):
+        closed_slope, closed_r, closed_p = trend['slope'][closed, m], trend['r'][closed, m], trend['p'][closed, m]
+        exo_slope, exo_r, exo_p = trend['slope'][exo, m], trend['r'][exo, m], trend['p'][exo, m]
         
         print(f"\n{metric.replace('_', ' ').title()}:")
         print(f"  Closed-loop:  slope={closed_slope:.6f}, R²={closed_r**2:.4f}, p={closed_p:.6f}")
@@ -296,34 +238,22 @@ def plot_results(results):
         ('unique_words_ratio', 'Unique Words Ratio', 'Higher = less repetitive vocabulary')
     ]
     
+    # Per-iteration mean/SD across seeds for every condition and metric in one reduction
+    tensor = ResultsTensor.from_records(results, metrics=[m[0] for m in metrics])
+    it_stats = tensor.iteration_stats()
+    closed = tensor.groups.index('closed_loop')
+    exo = tensor.groups.index('exogenous')
+    iterations = tensor.iterations
+    # Trend lines through the mean curves: all conditions × metrics in one batched fit
+    mean_fits = batched_ols(iterations, np.moveaxis(it_stats['mean'], 1, -1))
+    
     for idx, (metric, title, subtitle) in enumerate(metrics):
         ax = axes[idx // 2, idx % 2]
         
-        # Separate data by condition
-        closed_data = [r for r in results if r['condition'] == 'closed_loop']
-        exo_data = [r for r in results if r['condition'] == 'exogenous']
-        
-        # Aggregate by iteration (mean across seeds)
-        iterations = range(ITERATIONS)
-        
-        closed_means = []
-        closed_stds = []
-        exo_means = []
-        exo_stds = []
-        
-        for i in iterations:
-            closed_vals = [r[metric] for r in closed_data if r['iteration'] == i]
-            exo_vals = [r[metric] for r in exo_data if r['iteration'] == i]
-            
-            closed_means.append(np.mean(closed_vals))
-            closed_stds.append(np.std(closed_vals))
-            exo_means.append(np.mean(exo_vals))
-            exo_stds.append(np.std(exo_vals))
-        
-        closed_means = np.array(closed_means)
-        closed_stds = np.array(closed_stds)
-        exo_means = np.array(exo_means)
-        exo_stds = np.array(exo_stds)
+        closed_means = it_stats['mean'][closed, :, idx]
+        closed_stds = it_stats['std'][closed, :, idx]
+        exo_means = it_stats['mean'][exo, :, idx]
+        exo_stds = it_stats['std'][exo, :, idx]
         
         # Plot mean lines
         ax.plot(iterations, closed_means, 'o-', color='#d62728', label='A: Closed-loop', 
@@ -338,13 +268,11 @@ def plot_results(results):
                         color='#2ca02c', alpha=0.2)
         
         # Trend lines
-        closed_z = np.polyfit(iterations, closed_means, 1)
-        closed_p = np.poly1d(closed_z)
-        exo_z = np.polyfit(iterations, exo_means, 1)
-        exo_p = np.poly1d(exo_z)
+        closed_fit = lambda x: mean_fits['intercept'][closed, idx] + mean_fits['slope'][closed, idx] * x
+        exo_fit = lambda x: mean_fits['intercept'][exo, idx] + mean_fits['slope'][exo, idx] * x
         
-        ax.plot(iterations, closed_p(iterations), '--', color='#8b0000', alpha=0.6, linewidth=1)
-        ax.plot(iterations, exo_p(iterations), '--', color='#006400', alpha=0.6, linewidth=1)
+        ax.plot(iterations, closed_fit(iterations), '--', color='#8b0000', alpha=0.6, linewidth=1)
+        ax.plot(iterations, exo_fit(iterations), '--', color='#006400', alpha=0.6, linewidth=1)
         
         # Formatting
         ax.set_title(f"{title}\n({subtitle})", fontsize=11)
@@ -405,20 +333,20 @@ Despite the reduced sample size, the results show clear statistical patterns con
 """
     
     # Calculate statistics
-    closed_data = [r for r in results if r['condition'] == 'closed_loop']
-    exogenous_data = [r for r in results if r['condition'] == 'exogenous']
-    
     metrics = ['lz_complexity', 'shannon_entropy', 'trigram_diversity', 'unique_words_ratio']
     
+    tensor = ResultsTensor.from_records(results, metrics=metrics)
+    closed = tensor.groups.index('closed_loop')
+    exo = tensor.groups.index('exogenous')
+    desc = tensor.describe()
+    mwu = tensor.rank_test('exogenous', 'closed_loop', alternative='greater')
+    
     report += "| Metric | Closed-loop | Exogenous | Difference | % Change |\n"
     report += "|--------|-------------|-----------|------------|----------|\n"
     
-    for metric in metrics:
-        closed_vals = [r[metric] for r in closed_data]
-        exo_vals = [r[metric] for r in exogenous_data]
-        
-        closed_mean = np.mean(closed_vals)
-        exo_mean = np.mean(exo_vals)
+    for m, metric in enumerate(metrics):
+        closed_mean = desc['mean'][closed, m]
+        exo_mean = desc['mean'][exo, m]
         diff = exo_mean - closed_mean
         pct = (diff / closed_mean) * 100
         
@@ -428,11 +356,8 @@ Despite the reduced sample size, the results show clear statistical patterns con
     report += "| Metric | U-statistic | p-value | Significance |\n"
     report += "|--------|-------------|---------|-------------|\n"
     
-    for metric in metrics:
-        closed_vals = [r[metric] for r in closed_data]
-        exo_vals = [r[metric] for r in exogenous_data]
-        
-        statistic, p_value = stats.mannwhitneyu(exo_vals, closed_vals, alternative='greater')
+    for m, metric in enumerate(metrics):
+        statistic, p_value = mwu['statistic'][m], mwu['p'][m]
         sig = "***" if p_value < 0.001 else "**" if p_value < 0.01 else "*" if p_value < 0.05 else "ns"
         
         report += f"| {metric.replace('_', ' ').title()} | {statistic:.2f} | {p_value:.6f} | {sig} |\n"
@@ -4,6 +4,8 @@ import time
 import numpy as np
 from openai import OpenAI
 
+from logprob_entropy import complete_with_logprobs
+
 # 1. Configuration
 api_key = os.environ.get("OPENAI_API_KEY", "").strip()
 if not api_key:
@@ -15,6 +17,7 @@ client = OpenAI(api_key=api_key)
 # The Matrix: Large Dense vs Small Dense
 MODELS = ["gpt-4o", "gpt-4o-mini"]
 OUTPUT_PATH = "results/openai_dual_validation.json"
+LOGPROBS_TOP_K = int(os.environ.get("LOGPROBS_TOP_K", "0"))  # >0: store per-token model entropy
 
 SEEDS = [
     "The recursive nature of AI leads to...",
@@ -45,7 +48,7 @@ def run_openai_forge():
 
             for i in range(50):
                 try:
-                    response = client.chat.completions.create(
+                    request = dict(
                         model=model_id,
                         messages=[
                             {"role": "system", "content": SYSTEM_PROMPT},
@@ -55,10 +58,15 @@ def run_openai_forge():
                         top_p=0.9,
                         max_tokens=500
                     )
-                    
-                    choice = response.choices[0]
-                    output = choice.message.content
-                    finish_reason = choice.finish_reason  # The crucial addition!
+                    logprob_fields = {}
+                    if LOGPROBS_TOP_K:
+                        output, finish_reason, entropy = complete_with_logprobs(client, LOGPROBS_TOP_K, **request)
+                        logprob_fields = entropy.fields()
+                    else:
+                        response = client.chat.completions.create(**request)
+                        choice = response.choices[0]
+                        output = choice.message.content
+                        finish_reason = choice.finish_reason  # The crucial addition!
                     
                     if not output:
                         print(f"    ⚠️ Empty output at Iter {i}. Reason: {finish_reason}")
@@ -78,7 +86,8 @@ def run_openai_forge():
                         "char_length": curr_len,
                         "finish_reason": finish_reason,
                         "flag_explosion": is_exploding,
-                        "flag_gel": is_gel
+                        "flag_gel": is_gel,
+                        **logprob_fields
                     })
                     
                     current_text = output
@@ -0,0 +1,97 @@
+"""
+Recovery Experiment (EXTENSIONS_IDEAS.md 1.4)
+
+Phase 1 (iter 0-49):  pure closed-loop, stored in the chain journal
+Phase 2 (iter 50-99): forked children switch to exogenous injection,
+                      plus a closed-loop control fork for comparison
+
+The closed-loop prefix is generated once per seed; every fork reads it
+from the journal and only pays for its own suffix.
+"""
+
+import time
+
+import anthropic
+
+from chain_journal import ChainJournal, run_chain
+
+MODEL = "claude-sonnet-4-20250514"
+ITERATIONS = 100
+SWITCH_ITERATION = 49
+NUM_SEEDS = 5
+TEMPERATURE = 0.8
+TOP_P = 0.9
+MAX_TOKENS = 500
+PREFIX_ATTEMPTS = 3  # run_chain resumes, so each attempt only retries the missing iterations
+
+SEED_PROMPTS = [
+    "Describe the relationship between memory and identity.",
+    "Explain how cities evolve over time.",
+    "What makes a system resilient?",
+    "Describe the nature of emergent behavior.",
+    "How do languages change across generations?",
+]
+
+EXOGENOUS_TEXTS = [
+    "The ship wherein Theseus and the youth of Athens returned had thirty oars, and was preserved by the Athenians down even to the time of Demetrius Phalereus, for they took away the old planks as they decayed, putting in new and stronger timber in their place.",
+    "It was the best of times, it was the worst of times, it was the age of wisdom, it was the age of foolishness, it was the epoch of belief, it was the epoch of incredulity.",
+    "Not all those who wander are lost. The old that is strong does not wither, deep roots are not reached by the frost.",
+    "In wildness is the preservation of the world. I wish to speak a word for Nature, for absolute freedom and wildness.",
+    "We are what we repeatedly do. Excellence, then, is not an act, but a habit."
+]
+
+client = anthropic.Anthropic()  # Uses ANTHROPIC_API_KEY env var
+
+
+def generate(prompt, config):
+    """Single Claude call using the chain's own sampling parameters"""
+    for attempt in range(3):
+        try:
+            message = client.messages.create(
+                model=config['model'],
+                max_tokens=config.get('max_tokens', MAX_TOKENS),
+                temperature=config.get('temperature', TEMPERATURE),
+                top_p=config.get('top_p', TOP_P),
+                messages=[{"role": "user", "content": prompt}]
+            )
+            time.sleep(1)
+            return message.content[0].text
+        except Exception as e:
+            print(f"API Error: {e}")
+            time.sleep(5)
+    return None
+
+
+def run_recovery():
+    journal = ChainJournal()
+
+    for seed_idx, seed_prompt in enumerate(SEED_PROMPTS[:NUM_SEEDS]):
+        print(f"\n=== Seed {seed_idx + 1}/{NUM_SEEDS} ===")
+        root_id = f"recovery_s{seed_idx}"
+        if not journal.exists(root_id):
+            journal.create_chain(root_id, seed_prompt, model=MODEL, seed=seed_idx,
+                                 condition='closed_loop', temperature=TEMPERATURE,
+                                 exogenous_texts=EXOGENOUS_TEXTS)
+
+        # Phase 1: shared closed-loop prefix (resumes if already journaled)
+        for attempt in range(PREFIX_ATTEMPTS):
+            if journal.last_iteration(root_id) >= SWITCH_ITERATION:
+                break
+            run_chain(journal, root_id, generate, iterations=SWITCH_ITERATION + 1)
+        if journal.last_iteration(root_id) < SWITCH_ITERATION:
+            print(f"  ⚠️ {root_id}: prefix stopped at iteration {journal.last_iteration(root_id)} "
+                  f"after {PREFIX_ATTEMPTS} attempts, skipping seed")
+            continue
+
+        # Phase 2: divergent suffixes
+        for suffix, condition in (("exo", "exogenous"), ("ctrl", "closed_loop")):
+            child_id = f"{root_id}_{suffix}"
+            if not journal.exists(child_id):
+                journal.fork(root_id, SWITCH_ITERATION, child_id, condition=condition)
+            run_chain(journal, child_id, generate, iterations=ITERATIONS)
+
+    print(f"\n🏁 Recovery experiment complete. Journal: {journal.root}")
+
+
+if __name__ == '__main__':
+    run_recovery()
@@ -1,10 +1,12 @@
 import os
 import json
 import time
-import numpy as np
 import openai
 from datetime import datetime
 
+from logprob_entropy import complete_with_logprobs
+from steady_state import BURN_IN, RunningMoments
+
 # 1. Configuration
 api_key = os.environ.get("OPENAI_API_KEY", "").strip()
 client = openai.OpenAI(api_key=api_key)
@@ -13,6 +15,7 @@ client = openai.OpenAI(api_key=api_key)
 MODELS = ["gpt-5-mini", "gpt-5"] # Le duel final
 ITERATIONS = 50 # Suffisant pour établir le point fixe
 SEEDS_PER_CONFIG = 10 # Rigueur statistique (n=10)
+LOGPROBS_TOP_K = int(os.environ.get("LOGPROBS_TOP_K", "0"))  # >0: store per-token model entropy
 
 # Les 5 Piliers Sémantiques
 PROMPT_CLASSES = {
@@ -49,13 +52,14 @@ def run_grid():
                 run_start = time.time()
                 
                 history_len = []
+                steady = RunningMoments()
                 current_text = seed_prompt
                 trajectory = []
 
                 # Boucle de récursion
                 for i in range(ITERATIONS):
                     try:
-                        response = client.chat.completions.create(
+                        request = dict(
                             model=model,
                             messages=[
                                 {"role": "system", "content": "You are a recursive research engine. Expand the concept logically."},
@@ -64,14 +68,22 @@ def run_grid():
                             max_completion_tokens=16000, # Large buffer
                             temperature=1.0 # Forcé par l'API
                         )
-                        
-                        output = response.choices[0].message.content
+                        logprob_fields = {}
+                        if LOGPROBS_TOP_K:
+                            output, _, entropy = complete_with_logprobs(client, LOGPROBS_TOP_K, **request)
+                            logprob_fields = entropy.fields()
+                        else:
+                            response = client.chat.completions.create(**request)
+                            output = response.choices[0].message.content
                         char_len = len(output)
                         history_len.append(char_len)
+                        if len(history_len) > BURN_IN:
+                            steady.update(char_len)
                         
                         trajectory.append({
                             "iter": i,
-                            "len": char_len
+                            "len": char_len,
+                            **logprob_fields
                         })
                         
                         current_text = output 
@@ -86,8 +98,8 @@ def run_grid():
                 duration = time.time() - run_start
                 if history_len:
                     final_len = history_len[-1]
-                    mean_len = np.mean(history_len[10:]) if len(history_len) > 10 else 0
-                    std_dev = np.std(history_len[10:]) if len(history_len) > 10 else 0
+                    mean_len = float(steady.mean) if steady.n else 0
+                    std_dev = float(steady.std()) if steady.n else 0
                     
                     print(f"  Run {current_run}/{total_runs} (Seed {seed_idx+1}): Final={final_len} | Avg={mean_len:.0f} | σ={std_dev:.0f} | {duration:.1f}s")
                 else:
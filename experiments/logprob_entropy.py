@@ -0,0 +1,178 @@
+"""
+Logprob Entropy - per-token model entropy from provider logprobs
+
+shannon_entropy() measures the characters of the output, a proxy for the
+model's own uncertainty. OpenAI-compatible chat APIs can return, for every
+generated token, its logprob and the top-k alternatives, so the model's
+predictive entropy comes for free with each call:
+
+    surprisal_t = -log2 p(token_t)
+    H_t         = -sum_k p_k log2 p_k - r log2 r,   r = 1 - sum_k p_k
+
+H_t is computed from the top-k alternatives with the remaining mass r
+lumped into one outcome, i.e. a lower bound on the full-vocabulary entropy
+that is tight when k covers most of the mass.
+
+StreamingEntropy consumes logprob chunks as they arrive (streamed SDK
+responses, non-streamed responses or raw JSON from requests-based
+runners) and keeps the per-token series as float16. Records carry the
+series as lists; results_index stores them as ragged float16 columns.
+
+Usage:
+    LOGPROBS_TOP_K=5 python experiments/experiment_openai_dual.py
+    python experiments/logprob_entropy.py       # summary of stored series
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from results_index import ARRAY_COLUMNS
+
+TOP_K = 5
+LOG2E = 1.0 / np.log(2.0)
+
+
+def request_kwargs(top_k=TOP_K):
+    """Extra chat.completions parameters asking for top-k logprobs"""
+    return {'logprobs': True, 'top_logprobs': top_k}
+
+
+def _field(item, name):
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def token_entropy(top_logprobs):
+    """
+    Truncated entropy (bits) per token
+
+    Args:
+        top_logprobs: (n_tokens, k) natural-log probabilities, -inf padded
+    """
+    lp = np.asarray(top_logprobs, dtype=np.float64)
+    p = np.exp(lp)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        head = -np.sum(np.where(p > 0, p * lp, 0.0), axis=-1)
+        rest = np.clip(1.0 - p.sum(axis=-1), 0.0, 1.0)
+        tail = -np.where(rest > 0, rest * np.log(rest), 0.0)
+    return (head + tail) * LOG2E
+
+
+class StreamingEntropy:
+    """Accumulates per-token entropy and surprisal across response chunks"""
+
+    def __init__(self):
+        self._entropy = []
+        self._surprisal = []
+
+    def __len__(self):
+        return sum(len(c) for c in self._entropy)
+
+    def update(self, content):
+        """
+        Add one chunk of logprob items
+
+        Args:
+            content: list of items with `logprob` and `top_logprobs`
+                     (SDK objects or dicts from raw JSON); None is ignored
+        """
+        if not content:
+            return
+        chosen = np.array([_field(item, 'logprob') for item in content], dtype=np.float64)
+        alternatives = [[_field(alt, 'logprob') for alt in (_field(item, 'top_logprobs') or [])]
+                        for item in content]
+        width = max((len(a) for a in alternatives), default=0)
+        top = np.full((len(content), max(width, 1)), -np.inf)
+        for row, alts in enumerate(alternatives):
+            top[row, :len(alts)] = alts
+        empty = np.array([not a for a in alternatives])
+        top[empty, 0] = chosen[empty]
+        self._entropy.append(token_entropy(top).astype(np.float16))
+        self._surprisal.append((-chosen * LOG2E).astype(np.float16))
+
+    @property
+    def entropy(self):
+        return np.concatenate(self._entropy) if self._entropy else np.zeros(0, dtype=np.float16)
+
+    @property
+    def surprisal(self):
+        return np.concatenate(self._surprisal) if self._surprisal else np.zeros(0, dtype=np.float16)
+
+    def fields(self):
+        """Record fields: summary scalars plus the per-token series"""
+        entropy = self.entropy.astype(np.float64)
+        surprisal = self.surprisal.astype(np.float64)
+        if not len(entropy):
+            return {}
+        return {
+            'n_tokens': len(entropy),
+            'model_entropy_mean': float(entropy.mean()),
+            'model_surprisal_mean': float(surprisal.mean()),
+            'token_entropy': np.round(entropy, 3).tolist(),
+            'token_surprisal': np.round(surprisal, 3).tolist(),
+        }
+
+
+def complete_with_logprobs(client, top_k=TOP_K, stream=True, **kwargs):
+    """
+    chat.completions call that also returns a StreamingEntropy
+
+    Returns:
+        (text, finish_reason, StreamingEntropy)
+    """
+    tracker = StreamingEntropy()
+    params = {**kwargs, **request_kwargs(top_k)}
+    if not stream:
+        choice = client.chat.completions.create(**params).choices[0]
+        tracker.update(choice.logprobs.content if choice.logprobs else None)
+        return choice.message.content, choice.finish_reason, tracker
+
+    parts, finish_reason = [], None
+    for chunk in client.chat.completions.create(stream=True, **params):
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        if choice.delta and choice.delta.content:
+            parts.append(choice.delta.content)
+        if choice.logprobs:
+            tracker.update(choice.logprobs.content)
+        finish_reason = choice.finish_reason or finish_reason
+    return "".join(parts), finish_reason, tracker
+
+
+def from_response_json(data):
+    """StreamingEntropy from a raw (requests) chat.completions JSON body"""
+    tracker = StreamingEntropy()
+    logprobs = data['choices'][0].get('logprobs') or {}
+    tracker.update(logprobs.get('content'))
+    return tracker
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="Model entropy from stored token logprobs")
+    parser.add_argument('--bucket', type=int, default=10)
+    args = parser.parse_args()
+
+    index = load_index()
+    if 'model_entropy_mean' not in index.columns:
+        print("No logprob series stored yet (run a runner with LOGPROBS_TOP_K set).")
+        return
+
+    table = pd.DataFrame({c: index[c] for c in ('model', 'condition', 'iteration',
+                                                'model_entropy_mean', 'model_surprisal_mean')})
+    table = table.dropna(subset=['model_entropy_mean'])
+    table['bucket'] = table['iteration'] // args.bucket * args.bucket
+    summary = table.groupby(['model', 'condition', 'bucket'])['model_entropy_mean'].mean().unstack('bucket')
+    print("Mean per-token model entropy (bits) by iteration bucket:")
+    print(summary.to_string(float_format=lambda v: f"{v:.3f}"))
+    for name in ARRAY_COLUMNS:
+        if name in index.arrays:
+            values, offsets = index.arrays[name]
+            print(f"\n{name}: {len(values)} values stored as {values.dtype} ({values.nbytes / 1e3:.1f} kB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Mass Univariate Testing - batched rank tests with FDR control
+
+Answers "which model collapses on which metric, and from which iteration"
+with one rank test per (model, metric, iteration window) cell:
+
+    condition map:  closed-loop vs exogenous seeds in the same window
+                    (models that ran both conditions)
+    baseline map:   each window vs the model's own first iterations
+                    (works for closed-loop-only models)
+
+All cells are ranked at once (scipy.stats.rankdata along the last axis of a
+(cell, sample) matrix), Mann-Whitney U is computed with tie correction and
+the normal approximation, and p-values are corrected jointly with
+Benjamini-Hochberg. The result is a compact signed significance map plus
+the onset window per (model, metric).
+
+Usage:
+    python experiments/mass_testing.py --mode baseline --window 5 --q 0.05
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def batched_mannwhitney(x, y):
+    """
+    Two-sided Mann-Whitney U along the last axis, for every leading cell
+
+    Args:
+        x: (..., n1) samples, NaN = missing
+        y: (..., n2) samples, broadcastable to x on the leading axes
+
+    Returns:
+        dict of (...)-shaped arrays: u (for x), z, p, effect (rank-biserial,
+        positive when x tends to exceed y), n1, n2
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    lead = np.broadcast_shapes(x.shape[:-1], y.shape[:-1])
+    x = np.broadcast_to(x, lead + x.shape[-1:])
+    y = np.broadcast_to(y, lead + y.shape[-1:])
+    combined = np.concatenate([x, y], axis=-1)
+
+    n1 = (~np.isnan(x)).sum(axis=-1).astype(float)
+    n2 = (~np.isnan(y)).sum(axis=-1).astype(float)
+    n = n1 + n2
+
+    ranks = stats.rankdata(combined, axis=-1, nan_policy='omit')
+    r1 = np.nansum(ranks[..., :x.shape[-1]], axis=-1)
+    u1 = r1 - n1 * (n1 + 1) / 2
+
+    # Tie term Σ(t³ - t): every element of a tie group of size t adds t² - 1
+    t = stats.rankdata(combined, method='max', axis=-1, nan_policy='omit') \
+        - stats.rankdata(combined, method='min', axis=-1, nan_policy='omit') + 1
+    tie_term = np.nansum(t ** 2 - 1, axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mu = n1 * n2 / 2
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+        z = (u1 - mu - 0.5 * np.sign(u1 - mu)) / sigma
+        p = 2 * stats.norm.sf(np.abs(z))
+        effect = 2 * u1 / (n1 * n2) - 1
+    invalid = (n1 < 2) | (n2 < 2) | ~(sigma > 0)
+    p = np.where(invalid, np.nan, p)
+    return {'u': u1, 'z': z, 'p': p, 'effect': effect, 'n1': n1, 'n2': n2}
+
+
+def benjamini_hochberg(p):
+    """
+    BH-adjusted q-values for an array of p-values (NaN entries ignored)
+
+    Returns:
+        Array of q-values with the shape of p
+    """
+    p = np.asarray(p, dtype=float)
+    flat = p.ravel()
+    valid = np.flatnonzero(~np.isnan(flat))
+    q = np.full(flat.shape, np.nan)
+    if len(valid):
+        order = valid[np.argsort(flat[valid])]
+        m = len(order)
+        scaled = flat[order] * m / np.arange(1, m + 1)
+        q[order] = np.minimum(1.0, np.minimum.accumulate(scaled[::-1])[::-1])
+    return q.reshape(p.shape)
+
+
+def _windowed(values, width):
+    """
+    (group, seed, iteration, metric) -> (group, window, metric, seed*width)
+
+    The iteration axis is padded with NaN to a multiple of `width`.
+    """
+    g, s, i, m = values.shape
+    n_windows = -(-i // width)
+    padded = np.full((g, s, n_windows * width, m), np.nan)
+    padded[:, :, :i] = values
+    blocks = padded.reshape(g, s, n_windows, width, m)
+    return blocks.transpose(0, 2, 4, 1, 3).reshape(g, n_windows, m, s * width)
+
+
+def _tidy(strata, group_by, iterations, width, metrics, res, q):
+    n_strata, n_windows, n_metrics = res['p'].shape
+    s, w, m = np.meshgrid(np.arange(n_strata), np.arange(n_windows), np.arange(n_metrics),
+                          indexing='ij')
+    labels = [strata[k].split("|") for k in s.ravel()]
+    table = pd.DataFrame(labels, columns=list(group_by)[:len(labels[0])] if labels else None)
+    table['metric'] = np.array(metrics)[m.ravel()]
+    table['window_start'] = iterations[0] + w.ravel() * width
+    table['window_end'] = table['window_start'] + width
+    for key in ('effect', 'z', 'p', 'n1', 'n2'):
+        table[key] = res[key].ravel()
+    table['q'] = q.ravel()
+    return table.dropna(subset=['p']).reset_index(drop=True)
+
+
+def condition_map(tensor, width=1, group_a='closed_loop', group_b='exogenous'):
+    """
+    Closed-loop vs exogenous rank test per (stratum, metric, window)
+
+    The tensor's last group_by column must be 'condition'. Effect > 0 means
+    closed-loop values exceed exogenous ones.
+
+    Returns:
+        Tidy DataFrame with p and BH q-values (corrected over all cells)
+    """
+    strata, idx_a, idx_b = [], [], []
+    for label in tensor.groups:
+        parts = label.split("|")
+        if parts[-1] != group_a:
+            continue
+        other = "|".join(parts[:-1] + [group_b])
+        if other in tensor.groups:
+            strata.append("|".join(parts[:-1]) or 'all')
+            idx_a.append(tensor.groups.index(label))
+            idx_b.append(tensor.groups.index(other))
+    if not strata:
+        return pd.DataFrame()
+
+    windows = _windowed(tensor.values, width)
+    res = batched_mannwhitney(windows[idx_a], windows[idx_b])
+    q = benjamini_hochberg(res['p'])
+    group_by = tensor.group_by[:-1] or ('stratum',)
+    return _tidy(strata, group_by, tensor.iterations, width, tensor.metrics, res, q)
+
+
+def baseline_map(tensor, width=5, baseline=5):
+    """
+    Each window vs the first `baseline` iterations of the same group
+
+    Effect > 0 means the window's values exceed the baseline.
+
+    Returns:
+        Tidy DataFrame with p and BH q-values (corrected over all cells)
+    """
+    windows = _windowed(tensor.values[:, :, baseline:], width)
+    base = _windowed(tensor.values[:, :, :baseline], baseline)
+    res = batched_mannwhitney(windows, base)
+    q = benjamini_hochberg(res['p'])
+    return _tidy(list(tensor.groups), tensor.group_by, tensor.iterations[baseline:], width,
+                 tensor.metrics, res, q)
+
+
+def significance_map(table, q=0.05):
+    """
+    Compact view: signed significance per (stratum, metric) × window
+
+    Cells are +1 / -1 (significant, by effect sign) or 0. Also returns the
+    onset window per (stratum, metric): the first window after which every
+    window stays significant in the same direction.
+    """
+    keys = [c for c in table.columns if c not in
+            ('metric', 'window_start', 'window_end', 'effect', 'z', 'p', 'n1', 'n2', 'q')]
+    signed = np.where(table['q'] < q, np.sign(table['effect']), 0).astype(int)
+    table = table.assign(sig=signed)
+    grid = table.pivot_table(index=keys + ['metric'], columns='window_start',
+                             values='sig', aggfunc='first').fillna(0).astype(int)
+
+    values = grid.to_numpy()
+    last = values[:, -1:]
+    persistent = (values == last) & (last != 0)
+    # first column from which the row is constant and nonzero until the end
+    tail_ok = np.flip(np.logical_and.accumulate(np.flip(persistent, axis=1), axis=1), axis=1)
+    has_onset = tail_ok.any(axis=1)
+    onset_col = np.argmax(tail_ok, axis=1)
+    onset = pd.DataFrame({
+        'onset_iteration': np.where(has_onset, grid.columns.to_numpy()[onset_col], np.nan),
+        'direction': np.where(has_onset, last[:, 0], 0),
+    }, index=grid.index).reset_index()
+    return grid, onset
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Batched rank tests with BH correction")
+    parser.add_argument('--mode', choices=['condition', 'baseline'], default='baseline')
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--baseline', type=int, default=5)
+    parser.add_argument('--q', type=float, default=0.05)
+    parser.add_argument('--metrics', nargs='+',
+                        default=['char_length', 'lz_complexity', 'shannon_entropy',
+                                 'trigram_diversity', 'unique_words_ratio'])
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    group_by = ('model', 'condition')
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=group_by)
+
+    if args.mode == 'condition':
+        table = condition_map(tensor, width=args.window)
+    else:
+        table = baseline_map(tensor, width=args.window, baseline=args.baseline)
+    if table.empty:
+        print("No testable cells.")
+        return
+
+    grid, onset = significance_map(table, q=args.q)
+    n_sig = int((table['q'] < args.q).sum())
+    print(f"{len(table)} tests, {n_sig} significant at BH q < {args.q}\n")
+    print(onset[onset['direction'] != 0].to_string(index=False))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ Full table saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+MinHash Cycles - near-duplicate fixed points and cycles in trajectories
+
+flag_gel only looks at character lengths: it misses a chain that rewords
+the same answer at a different length and fires on unrelated outputs that
+happen to have equal lengths. Here each output gets a MinHash signature
+over word 5-gram shingles; banded LSH finds earlier outputs with estimated
+Jaccard similarity above a threshold in O(bands) per step:
+
+    fixed point   period 1: x_t ≈ x_t-1 for MIN_REPEATS consecutive steps
+    cycle         period p: x_t ≈ x_t-p for MIN_REPEATS consecutive steps
+    onset         first iteration of the repeating segment
+
+The same CycleDetector runs online (CycleMonitor.update(record), cheap
+enough for every step in the runner) and in batch over stored results.
+cross_chain_matches() uses the same bands to find near-identical outputs
+in different chains without comparing all pairs.
+
+Usage:
+    python experiments/minhash_cycles.py                     # per-run cycles from results/*.json
+    python experiments/minhash_cycles.py --cross --out results/cycles.csv
+"""
+
+import argparse
+import re
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from chain_journal import chain_key
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE = 5
+THRESHOLD = 0.8
+MIN_REPEATS = 3
+MAX_PERIOD = 10
+RUN_KEYS = ['file', 'model', 'condition', 'category', 'seed']
+
+_TOKEN = re.compile(r"\w+")
+_rng = np.random.default_rng(20240117)
+_MULT = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_ADD = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+_BAND_MULT = _rng.integers(1, 2 ** 63, size=NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def shingles(text, size=SHINGLE):
+    """32-bit hashes of the word `size`-grams of a text (tokens if shorter)"""
+    tokens = np.array([zlib.crc32(t.encode('utf-8')) for t in _TOKEN.findall(text.lower())],
+                      dtype=np.uint64)
+    if len(tokens) == 0:
+        return tokens
+    size = min(size, len(tokens))
+    window = np.lib.stride_tricks.sliding_window_view(tokens, size)
+    powers = np.uint64(1000003) ** np.arange(size, dtype=np.uint64)
+    return np.unique((window * powers).sum(axis=1) & np.uint64(0xFFFFFFFF))
+
+
+def signature(text):
+    """MinHash signature (NUM_PERM,) uint32 via multiply-shift hashing"""
+    values = shingles(text)
+    if len(values) == 0:
+        return _EMPTY.copy()
+    with np.errstate(over='ignore'):
+        hashed = (values[:, None] * _MULT[None, :] + _ADD[None, :]) >> np.uint64(32)
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity; works row-wise on (n, NUM_PERM) arrays"""
+    return np.mean(np.asarray(sig_a) == np.asarray(sig_b), axis=-1)
+
+
+def band_keys(signatures):
+    """(n, NUM_PERM) -> (n, BANDS) uint64 bucket keys"""
+    rows = np.atleast_2d(signatures).astype(np.uint64).reshape(-1, BANDS, NUM_PERM // BANDS)
+    with np.errstate(over='ignore'):
+        return (rows * _BAND_MULT).sum(axis=-1)
+
+
+class CycleDetector:
+    """
+    Online fixed-point / cycle detection for one chain
+
+    Every step looks up earlier outputs sharing an LSH band, verifies them
+    on the full signature, and extends a streak counter per lag p; the
+    chain is flagged once the smallest lag reaches MIN_REPEATS consecutive
+    matches.
+    """
+
+    def __init__(self, threshold=THRESHOLD, min_repeats=MIN_REPEATS, max_period=MAX_PERIOD):
+        self.threshold = threshold
+        self.min_repeats = min_repeats
+        self.max_period = max_period
+        self.signatures = []
+        self.iterations = []
+        self.buckets = [{} for _ in range(BANDS)]
+        self.streak = np.zeros(max_period + 1, dtype=int)
+        self.detected = None
+
+    def update(self, text, iteration=None):
+        """Add one output; returns {'period', 'onset', 'similarity'} once detected"""
+        sig = signature(text)
+        keys = band_keys(sig)[0]
+        t = len(self.signatures)
+        candidates = set()
+        for band, key in enumerate(keys.tolist()):
+            candidates.update(self.buckets[band].get(key, ()))
+            self.buckets[band].setdefault(key, []).append(t)
+        self.signatures.append(sig)
+        self.iterations.append(t if iteration is None else iteration)
+
+        lags = np.array(sorted(t - c for c in candidates if t - c <= self.max_period), dtype=int)
+        matched = np.zeros(self.max_period + 1, dtype=bool)
+        sims = np.zeros(self.max_period + 1)
+        if len(lags):
+            sims[lags] = similarity(np.stack([self.signatures[t - p] for p in lags]), sig)
+            matched[lags] = sims[lags] >= self.threshold
+        self.streak = np.where(matched, self.streak + 1, 0)
+
+        if self.detected is None:
+            hits = np.flatnonzero(self.streak[1:] >= self.min_repeats) + 1
+            if len(hits):
+                p = int(hits[0])
+                first = t - self.streak[p] + 1 - p
+                self.detected = {'period': p, 'onset': self.iterations[first],
+                                 'detected_at': self.iterations[t], 'similarity': float(sims[p])}
+        return self.detected
+
+
+class CycleMonitor:
+    """One CycleDetector per chain, fed with records as written by run_chain()"""
+
+    def __init__(self, **detector_args):
+        self.detector_args = detector_args
+        self.detectors = {}
+        self._lock = threading.Lock()
+
+    def update(self, record):
+        if not record.get('text'):
+            return None
+        with self._lock:
+            detector = self.detectors.setdefault(chain_key(record),
+                                                 CycleDetector(**self.detector_args))
+            return detector.update(record['text'], record.get('iteration'))
+
+
+# ----------------------------------------------------------------------
+# Batch over stored results
+# ----------------------------------------------------------------------
+
+def _runs(index):
+    keys = [index[c].astype(str) for c in RUN_KEYS[:-1]] + [index['seed']]
+    runs = {}
+    for i in np.lexsort((index['iteration'],) + tuple(reversed(keys))):
+        if index.texts[i]:
+            runs.setdefault(tuple(index[c][i] for c in RUN_KEYS), []).append(i)
+    return runs
+
+
+def detect_cycles(index, **detector_args):
+    """Cycle / fixed-point summary per run"""
+    rows = []
+    for key, members in _runs(index).items():
+        detector = CycleDetector(**detector_args)
+        for i in members:
+            detector.update(index.texts[i], int(index['iteration'][i]))
+        found = detector.detected or {}
+        rows.append({**dict(zip(RUN_KEYS, key)), 'n_outputs': len(members),
+                     'period': found.get('period'), 'onset': found.get('onset'),
+                     'similarity': found.get('similarity')})
+    return pd.DataFrame(rows)
+
+
+def cross_chain_matches(index, threshold=THRESHOLD, rows=None):
+    """
+    Near-identical outputs in different runs, via shared LSH buckets
+
+    Signatures are deduplicated within each run first, so a chain stuck on
+    one text contributes a single bucket entry.
+
+    Returns:
+        DataFrame of matched row pairs with their estimated similarity
+    """
+    run_of = {}
+    for r, members in enumerate(_runs(index).values()):
+        for i in members:
+            run_of[i] = r
+    rows = sorted(run_of) if rows is None else [i for i in rows if i in run_of]
+    sigs = np.stack([signature(index.texts[i]) for i in rows]) if rows else \
+        np.zeros((0, NUM_PERM), dtype=np.uint32)
+    run_ids = np.array([run_of[i] for i in rows], dtype=np.int64)
+    _, keep = np.unique(np.column_stack([run_ids[:, None].astype(np.uint32), sigs]),
+                        axis=0, return_index=True)
+    keep = np.sort(keep)
+    sigs, run_ids, rows = sigs[keep], run_ids[keep], np.asarray(rows)[keep]
+
+    pairs = set()
+    for band, keys in enumerate(band_keys(sigs).T):
+        order = np.argsort(keys, kind='stable')
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for bucket in np.split(order, bounds):
+            if len(bucket) < 2 or len(np.unique(run_ids[bucket])) < 2:
+                continue
+            for a in range(len(bucket)):
+                for b in range(a + 1, len(bucket)):
+                    if run_ids[bucket[a]] != run_ids[bucket[b]]:
+                        pairs.add((min(bucket[a], bucket[b]), max(bucket[a], bucket[b])))
+    if not pairs:
+        return pd.DataFrame()
+
+    pa, pb = np.array(sorted(pairs)).T
+    sims = similarity(sigs[pa], sigs[pb])
+    hit = sims >= threshold
+    left, right = rows[pa[hit]], rows[pb[hit]]
+    table = pd.DataFrame({f"{c}_a": index[c][left] for c in RUN_KEYS + ['iteration']})
+    for c in RUN_KEYS + ['iteration']:
+        table[f"{c}_b"] = index[c][right]
+    table['similarity'] = sims[hit]
+    return table.sort_values('similarity', ascending=False).reset_index(drop=True)
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="MinHash/LSH fixed-point and cycle detection")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--cross', action='store_true', help="Also match outputs across chains")
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    index = load_index()
+    cycles = detect_cycles(index, threshold=args.threshold)
+    if cycles.empty:
+        print("No trajectories with text found.")
+        return
+
+    cycles['kind'] = np.where(cycles['period'] == 1, 'fixed_point',
+                              np.where(cycles['period'].notna(), 'cycle', 'none'))
+    counts = cycles.groupby(['model', 'condition', 'kind']).size().unstack('kind', fill_value=0)
+    onsets = cycles.groupby(['model', 'condition'])['onset'].median().rename('median_onset')
+    print(counts.join(onsets).to_string())
+
+    if args.cross:
+        matches = cross_chain_matches(index, args.threshold)
+        print(f"\n{len(matches)} cross-chain near-duplicate pairs (J ≥ {args.threshold})")
+        if len(matches):
+            print(matches.head(20).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    if args.out:
+        cycles.to_csv(args.out, index=False)
+        print(f"\n✓ {len(cycles)} runs saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+NCD Engine - normalized compression distance between generated outputs
+
+    NCD(x, y) = (C(xy) - min(C(x), C(y))) / max(C(x), C(y))
+
+with C the zlib-compressed size. One engine holds a set of texts, caches
+C(x) once per distinct text and evaluates C(xy) for requested pairs in a
+process pool (chunks of pairs per task; texts are shipped to the workers
+once, at pool start-up).
+
+Pair layouts:
+    - successive:  (t, t+1) within each run
+    - banded:      |i - j| <= k within a run (block-sparse; O(n k) instead
+                   of O(n^2) compressions for long trajectories)
+    - full:        every pair within a run
+    - seeds:       every pair of seeds at the same iteration
+    - models:      every pair of models at the same (condition, category,
+                   iteration)
+
+Usage:
+    python experiments/ncd.py                          # successive + cross-seed summary
+    python experiments/ncd.py --mode models --out results/ncd_models.csv
+"""
+
+import argparse
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+LEVEL = 9
+CHUNK = 512
+INLINE_PAIRS = 2000
+RUN_KEYS = ['file', 'model', 'condition', 'category', 'seed']
+
+_worker_texts = None
+_worker_level = LEVEL
+
+
+def _init_worker(encoded, level):
+    global _worker_texts, _worker_level
+    _worker_texts, _worker_level = encoded, level
+
+
+def _joint_compressed(encoded, level, pairs):
+    return [len(zlib.compress(encoded[i] + encoded[j], level)) for i, j in pairs]
+
+
+def _joint_chunk(pairs):
+    return _joint_compressed(_worker_texts, _worker_level, pairs)
+
+
+class NCDEngine:
+    """
+    Pairwise NCD over a fixed list of texts
+
+    Args:
+        texts: list of str
+        level: zlib level
+        workers: process count for joint compressions (0 = in-process)
+    """
+
+    def __init__(self, texts, level=LEVEL, workers=None):
+        self.encoded = [t.encode('utf-8') for t in texts]
+        self.level = level
+        self.workers = workers
+        self._sizes = None
+        self._pool = None
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    @property
+    def sizes(self):
+        """C(x) for every text; identical texts are compressed once"""
+        if self._sizes is None:
+            cache = {}
+            for e in self.encoded:
+                if e not in cache:
+                    cache[e] = len(zlib.compress(e, self.level))
+            self._sizes = np.array([cache[e] for e in self.encoded], dtype=float)
+        return self._sizes
+
+    def joint_sizes(self, pi, pj):
+        """C(x_i x_j) for index arrays pi, pj"""
+        pairs = list(zip(np.asarray(pi).tolist(), np.asarray(pj).tolist()))
+        if self.workers == 0 or len(pairs) <= INLINE_PAIRS:
+            return np.array(_joint_compressed(self.encoded, self.level, pairs), dtype=float)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.encoded, self.level))
+        chunks = [pairs[k:k + CHUNK] for k in range(0, len(pairs), CHUNK)]
+        return np.array([s for sizes in self._pool.map(_joint_chunk, chunks) for s in sizes],
+                        dtype=float)
+
+    def pairs(self, pi, pj):
+        """NCD for index arrays pi, pj"""
+        pi, pj = np.asarray(pi, dtype=int), np.asarray(pj, dtype=int)
+        if len(pi) == 0:
+            return np.zeros(0)
+        c_i, c_j = self.sizes[pi], self.sizes[pj]
+        c_min, c_max = np.minimum(c_i, c_j), np.maximum(c_i, c_j)
+        return (self.joint_sizes(pi, pj) - c_min) / np.where(c_max == 0, 1.0, c_max)
+
+    def matrix(self, rows=None):
+        """Full symmetric NCD matrix over `rows` (default: all texts)"""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        a, b = np.triu_indices(len(rows), k=1)
+        out = np.zeros((len(rows), len(rows)))
+        out[a, b] = out[b, a] = self.pairs(rows[a], rows[b])
+        return out
+
+    def banded(self, rows=None, k=1):
+        """
+        Block-sparse NCD: band[i, d-1] = NCD(rows[i], rows[i+d]) for d <= k
+
+        Entries past the end of the sequence are NaN.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=int)
+        n = len(rows)
+        band = np.full((n, k), np.nan)
+        i, d = np.meshgrid(np.arange(n), np.arange(1, k + 1), indexing='ij')
+        valid = i + d < n
+        band[valid] = self.pairs(rows[i[valid]], rows[(i + d)[valid]])
+        return band
+
+
+# ----------------------------------------------------------------------
+# Pair layouts over the results index
+# ----------------------------------------------------------------------
+
+def _group_rows(index, keys, order_by):
+    """dict key tuple -> row indices (rows with text only), sorted by order_by"""
+    columns = [index[c].astype(str) if index[c].dtype == object else index[c] for c in keys]
+    groups = {}
+    for i in np.lexsort((index[order_by],) + tuple(reversed(columns))):
+        if index.texts[i]:
+            groups.setdefault(tuple(c[i] for c in columns), []).append(i)
+    return groups
+
+
+def successive_ncd(index, engine, band=1):
+    """NCD(t, t+d) for d <= band within every run, tidy"""
+    frames = []
+    for key, rows in _group_rows(index, RUN_KEYS, 'iteration').items():
+        if len(rows) < 2:
+            continue
+        frame = pd.DataFrame(engine.banded(rows, band)[:-1],
+                             columns=[f"ncd_lag{d}" for d in range(1, band + 1)])
+        frame.insert(0, 'iteration', index['iteration'][rows[:-1]])
+        for position, (name, value) in enumerate(zip(RUN_KEYS, key)):
+            frame.insert(position, name, value)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def cross_ncd(index, engine, across='seed'):
+    """
+    Mean pairwise NCD across seeds (or models) at each iteration
+
+    across='seed' compares seeds within (file, model, condition, category);
+    across='model' compares models within (condition, category).
+    """
+    if across == 'seed':
+        keys = ['file', 'model', 'condition', 'category', 'iteration']
+    else:
+        keys = ['condition', 'category', 'iteration']
+    groups = _group_rows(index, keys, across)
+
+    pi, pj, owner = [], [], []
+    for g, rows in enumerate(groups.values()):
+        for a, b in combinations(range(len(rows)), 2):
+            if index[across][rows[a]] == index[across][rows[b]]:
+                continue
+            pi.append(rows[a])
+            pj.append(rows[b])
+            owner.append(g)
+    values = engine.pairs(pi, pj)
+    owner = np.asarray(owner, dtype=int)
+
+    n_groups = len(groups)
+    counts = np.bincount(owner, minlength=n_groups)
+    sums = np.bincount(owner, weights=values, minlength=n_groups)
+    squares = np.bincount(owner, weights=values ** 2, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean ** 2, 0.0))
+    table = pd.DataFrame(list(groups.keys()), columns=keys)
+    table['n_pairs'] = counts
+    table['ncd_mean'] = mean
+    table['ncd_std'] = std
+    return table[table['n_pairs'] > 0].reset_index(drop=True)
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="Normalized compression distance between outputs")
+    parser.add_argument('--mode', choices=['successive', 'seeds', 'models'], default='successive')
+    parser.add_argument('--band', type=int, default=1, help="Max lag |i-j| for successive mode")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    index = load_index()
+    with NCDEngine(index.texts, workers=args.workers) as engine:
+        if args.mode == 'successive':
+            table = successive_ncd(index, engine, args.band)
+            summary = table.groupby(['model', 'condition'])[[f"ncd_lag{d}" for d in range(1, args.band + 1)]]
+        else:
+            table = cross_ncd(index, engine, across=args.mode[:-1])
+            summary = table.groupby([c for c in ('model', 'condition') if c in table.columns])[['ncd_mean']]
+
+    if table.empty:
+        print("No texts to compare.")
+        return
+    print(summary.mean().to_string(float_format=lambda v: f"{v:.3f}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} rows saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
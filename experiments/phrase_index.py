@@ -0,0 +1,311 @@
+"""
+Phrase Index - positional n-gram inverted index over every generated text
+
+Answers "where and when does phrase X first appear, and how does its
+frequency evolve per chain" without grepping the results JSON:
+
+    documents  one per results row with text, keyed by (file, model,
+               condition, category, seed, iteration)
+    keys       64-bit hashes of word unigrams and trigrams, sorted, so a
+               lookup is a searchsorted on a memory-mapped array
+    postings   per key, three delta + varint streams:
+                   doc-id gaps, occurrences per doc, position gaps per doc
+
+A phrase of m >= 3 words is the intersection of its trigrams' positions
+(shifted by their offset in the phrase); shorter phrases use unigrams. The
+match is exact at the token level (lower-cased \\w+ tokens).
+
+Usage:
+    python experiments/phrase_index.py --build
+    python experiments/phrase_index.py "recursive nature of AI"
+    python experiments/phrase_index.py closed loop
+    python experiments/phrase_index.py "attractor" --per-chain
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from results_index import KEY_COLUMNS, RESULTS_DIR
+
+INDEX_DIR = RESULTS_DIR / "phrase_index"
+GRAMS = (1, 3)
+DOC_KEYS = KEY_COLUMNS + ['seed', 'iteration']
+RUN_KEYS = KEY_COLUMNS + ['seed']
+
+_TOKEN = re.compile(r"\w+")
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+# ----------------------------------------------------------------------
+# Varint coding (LEB128, vectorized)
+# ----------------------------------------------------------------------
+
+def encode_varints(values):
+    """uint64 array -> uint8 array, 7 bits per byte, high bit = continuation"""
+    values = np.asarray(values, dtype=np.uint64)
+    bits = np.zeros(len(values), dtype=np.int64)
+    remaining = values.copy()
+    while np.any(remaining):
+        bits += remaining > 0
+        remaining >>= np.uint64(7)
+    n_bytes = np.maximum(bits, 1)
+    starts = np.cumsum(n_bytes) - n_bytes
+    out = np.zeros(int(n_bytes.sum()), dtype=np.uint8)
+    for k in range(int(n_bytes.max()) if len(values) else 0):
+        sel = n_bytes > k
+        byte = (values[sel] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        out[starts[sel] + k] = byte.astype(np.uint8) | np.where(n_bytes[sel] > k + 1, 0x80, 0).astype(np.uint8)
+    return out
+
+
+def decode_varints(buf):
+    """uint8 array -> uint64 array"""
+    buf = np.asarray(buf, dtype=np.uint8)
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    values = np.zeros(len(ends), dtype=np.uint64)
+    for k in range(int((ends - starts).max()) + 1 if len(ends) else 0):
+        sel = starts + k <= ends
+        values[sel] |= (buf[starts[sel] + k] & np.uint8(0x7F)).astype(np.uint64) << np.uint64(7 * k)
+    return values
+
+
+def _segment_deltas(values, new_segment):
+    """First value of each segment kept, later values as gaps to the previous one"""
+    deltas = np.diff(values, prepend=0)
+    deltas[new_segment] = values[new_segment]
+    return deltas
+
+
+def _token_hashes(tokens, vocab_cache):
+    out = np.empty(len(tokens), dtype=np.uint64)
+    for i, token in enumerate(tokens):
+        h = vocab_cache.get(token)
+        if h is None:
+            h = vocab_cache[token] = int.from_bytes(
+                hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+        out[i] = h
+    return out
+
+
+def gram_keys(token_hashes, n):
+    """64-bit key per n-gram start position"""
+    if len(token_hashes) < n:
+        return np.zeros(0, dtype=np.uint64)
+    key = np.full(len(token_hashes) - n + 1, n, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(n):
+            key = (key ^ token_hashes[j:len(token_hashes) - n + 1 + j]) * _MIX[j]
+            key ^= key >> np.uint64(29)
+    return key
+
+
+class PhraseIndex:
+    """Sorted hashed keys plus varint posting streams"""
+
+    def __init__(self, keys, offsets, streams, docs):
+        self.keys = keys
+        self.offsets = offsets
+        self.streams = streams
+        self.docs = docs
+
+    @classmethod
+    def build(cls, results):
+        rows = [i for i in range(len(results)) if results.texts[i]]
+        docs = {c: results[c][rows] for c in DOC_KEYS}
+
+        cache, key_parts, doc_parts, pos_parts = {}, [], [], []
+        for doc_id, i in enumerate(rows):
+            hashes = _token_hashes(tokenize(results.texts[i]), cache)
+            for n in GRAMS:
+                keys = gram_keys(hashes, n)
+                key_parts.append(keys)
+                doc_parts.append(np.full(len(keys), doc_id, dtype=np.int64))
+                pos_parts.append(np.arange(len(keys), dtype=np.int64))
+        keys = np.concatenate(key_parts) if key_parts else np.zeros(0, dtype=np.uint64)
+        doc = np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int64)
+        pos = np.concatenate(pos_parts) if pos_parts else np.zeros(0, dtype=np.int64)
+
+        order = np.lexsort((pos, doc, keys))
+        keys, doc, pos = keys[order], doc[order], pos[order]
+        new_key = np.concatenate([[True], keys[1:] != keys[:-1]])
+        new_doc = new_key | np.concatenate([[True], doc[1:] != doc[:-1]])
+
+        # Doc-level rows: one per (key, doc)
+        group = np.cumsum(new_doc) - 1
+        g_doc = doc[new_doc]
+        g_new_key = new_key[new_doc]
+        g_count = np.bincount(group).astype(np.uint64)
+
+        streams = {
+            'doc': (_segment_deltas(g_doc, g_new_key).astype(np.uint64), g_new_key),
+            'count': (g_count, g_new_key),
+            'pos': (_segment_deltas(pos, new_doc).astype(np.uint64), new_key),
+        }
+        unique_keys = keys[new_key]
+        offsets, blobs = {}, {}
+        for name, (values, starts) in streams.items():
+            blob = encode_varints(values)
+            bytes_per_value = np.diff(np.concatenate([[0], np.flatnonzero(blob < 0x80) + 1]))
+            ends = np.cumsum(bytes_per_value)
+            first = np.flatnonzero(starts)
+            offsets[name] = np.concatenate([[0], ends[np.append(first[1:], len(values)) - 1]]) \
+                if len(values) else np.zeros(1, dtype=np.int64)
+            blobs[name] = blob
+        return cls(unique_keys, offsets, blobs, docs)
+
+    def postings(self, key):
+        """(doc ids, positions) for one key; empty arrays if absent"""
+        k = np.searchsorted(self.keys, np.uint64(key))
+        if k >= len(self.keys) or self.keys[k] != np.uint64(key):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        part = {name: decode_varints(self.streams[name][self.offsets[name][k]:self.offsets[name][k + 1]])
+                for name in self.streams}
+        doc_ids = np.cumsum(part['doc']).astype(np.int64)
+        counts = part['count'].astype(np.int64)
+        doc_of_pos = np.repeat(doc_ids, counts)
+        new_doc = np.zeros(len(doc_of_pos), dtype=bool)
+        new_doc[np.cumsum(counts) - counts] = True
+        segment = np.cumsum(new_doc) - 1
+        raw = np.cumsum(part['pos'].astype(np.int64))
+        base = np.concatenate([[0], raw[np.cumsum(counts)[:-1] - 1]]) if len(counts) else raw[:0]
+        return doc_of_pos, raw - base[segment]
+
+    def find(self, phrase):
+        """Exact phrase occurrences: (doc ids, start positions)"""
+        tokens = tokenize(phrase)
+        if not tokens:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        n = 3 if len(tokens) >= 3 else 1
+        keys = gram_keys(_token_hashes(tokens, {}), n)
+        stride = np.int64(1 << 32)
+        hits = None
+        for offset, key in enumerate(keys):
+            doc_ids, positions = self.postings(key)
+            code = doc_ids * stride + positions - offset
+            hits = code if hits is None else np.intersect1d(hits, code, assume_unique=True)
+            if not len(hits):
+                break
+        return hits // stride, hits % stride
+
+    def occurrences(self, phrase):
+        """Per-document occurrence counts with document keys"""
+        doc_ids, _ = self.find(phrase)
+        docs, counts = np.unique(doc_ids, return_counts=True)
+        table = pd.DataFrame({c: self.docs[c][docs] for c in DOC_KEYS})
+        table['count'] = counts
+        return table
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, out_dir=INDEX_DIR):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.save(out_dir / "keys.npy", self.keys)
+        for name in self.streams:
+            np.save(out_dir / f"{name}_offsets.npy", self.offsets[name])
+            np.save(out_dir / f"{name}_postings.npy", self.streams[name])
+        schema = {'n_docs': len(self.docs['iteration']), 'grams': list(GRAMS), 'categorical': {}}
+        for c in KEY_COLUMNS:
+            categories, codes = np.unique(self.docs[c].astype(str), return_inverse=True)
+            np.save(out_dir / f"doc_{c}.npy", codes.astype(np.int32))
+            schema['categorical'][c] = categories.tolist()
+        for c in ('seed', 'iteration'):
+            np.save(out_dir / f"doc_{c}.npy", self.docs[c])
+        with open(out_dir / "schema.json", 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    @classmethod
+    def load(cls, in_dir=INDEX_DIR, mmap_mode='r'):
+        in_dir = Path(in_dir)
+        with open(in_dir / "schema.json", 'r') as f:
+            schema = json.load(f)
+        keys = np.load(in_dir / "keys.npy", mmap_mode=mmap_mode)
+        names = ('doc', 'count', 'pos')
+        offsets = {n: np.load(in_dir / f"{n}_offsets.npy", mmap_mode=mmap_mode) for n in names}
+        streams = {n: np.load(in_dir / f"{n}_postings.npy", mmap_mode=mmap_mode) for n in names}
+        docs = {}
+        for c, categories in schema['categorical'].items():
+            codes = np.load(in_dir / f"doc_{c}.npy")
+            docs[c] = np.array(categories, dtype=object)[codes] if len(categories) \
+                else np.array([], dtype=object)
+        for c in ('seed', 'iteration'):
+            docs[c] = np.load(in_dir / f"doc_{c}.npy")
+        return cls(keys, offsets, streams, docs)
+
+
+def phrase_report(index, phrase):
+    """
+    First appearance and per-chain frequency curve of a phrase
+
+    Returns:
+        occurrences: per-document counts
+        chains: one row per chain with first iteration, total count and the
+                number of iterations containing the phrase
+    """
+    occurrences = index.occurrences(phrase)
+    if occurrences.empty:
+        return occurrences, occurrences
+    chains = occurrences.groupby(RUN_KEYS).agg(first_iteration=('iteration', 'min'),
+                                                last_iteration=('iteration', 'max'),
+                                                n_iterations=('iteration', 'size'),
+                                                total=('count', 'sum')).reset_index()
+    return occurrences, chains.sort_values('first_iteration').reset_index(drop=True)
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="Positional phrase index over generated texts")
+    parser.add_argument('phrase', nargs='*', help="Phrase to look up (quoted or as separate words)")
+    parser.add_argument('--build', action='store_true', help="(Re)build the index from results/*.json")
+    parser.add_argument('--dir', default=str(INDEX_DIR))
+    parser.add_argument('--per-chain', action='store_true', help="Print the per-iteration counts of every chain")
+    args = parser.parse_args()
+    args.phrase = " ".join(args.phrase)
+
+    index_dir = Path(args.dir)
+    if args.build or not index_dir.joinpath("schema.json").exists():
+        start = time.perf_counter()
+        index = PhraseIndex.build(load_index())
+        index.save(index_dir)
+        size = sum(s.nbytes for s in index.streams.values()) + index.keys.nbytes
+        print(f"✓ {len(index.docs['iteration'])} documents, {len(index.keys)} keys, "
+              f"{size / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s → {index_dir}")
+    if not args.phrase:
+        return
+
+    index = PhraseIndex.load(index_dir)
+    start = time.perf_counter()
+    occurrences, chains = phrase_report(index, args.phrase)
+    elapsed = (time.perf_counter() - start) * 1000
+    if occurrences.empty:
+        print(f"\"{args.phrase}\": no occurrences ({elapsed:.1f} ms)")
+        return
+
+    first = occurrences.sort_values('iteration').iloc[0]
+    print(f"\"{args.phrase}\": {occurrences['count'].sum()} occurrences in {len(occurrences)} outputs, "
+          f"{len(chains)} chains ({elapsed:.1f} ms)")
+    print(f"  earliest: iteration {first['iteration']} of {first['model']} seed {first['seed']} ({first['file']})")
+    print(chains.to_string(index=False))
+    if args.per_chain:
+        for key, rows in occurrences.groupby(RUN_KEYS):
+            curve = " ".join(f"{it}:{c}" for it, c in zip(rows['iteration'], rows['count']))
+            print(f"\n  {key[1]} seed {key[4]} ({key[0]}): {curve}")
+
+
+if __name__ == '__main__':
+    main()
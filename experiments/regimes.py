@@ -0,0 +1,244 @@
+"""
+Regimes - explosion / attractor / implosion classification of trajectories
+
+Replaces hand-written regime labels and per-script flags (flag_gel,
+flag_explosion) with one vectorized classifier over length and metric
+trajectories. Features, per (group, seed) run:
+
+    log_ratio    log(mean length in the last window / first window)
+    growth       OLS slope of log length per iteration
+    steady_cv    coefficient of variation of length in the last window
+    stillness    median CV over all metrics in the last window
+    fixed_point  stillness below FIXED_POINT_CV (a "gel")
+
+Soft memberships (logistic in the features) are normalized into
+probabilities over REGIMES; the label is the most probable regime and the
+confidence its probability. 'unsettled' collects runs that neither trend
+nor settle (high variance, no net growth).
+
+The same function scores one run online: RegimeMonitor keeps per-chain
+histories and can be passed as run_chain(..., on_step=monitor.update).
+
+Usage:
+    python experiments/regimes.py --out results/regimes.csv
+"""
+
+import argparse
+import threading
+import warnings
+
+import numpy as np
+
+from chain_journal import chain_key
+from trend_fits import batched_ols
+
+REGIMES = ('explosion', 'attractor', 'implosion', 'unsettled')
+WINDOW = 10
+MIN_POINTS = 10
+LOG_RATIO = np.log(2.0)        # ×2 growth / ÷2 shrinkage marks a trend
+LOG_RATIO_SCALE = 0.25
+STEADY_CV = 0.25
+STEADY_CV_SCALE = 0.05
+FIXED_POINT_CV = 0.02
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -50, 50)))
+
+
+def _edge_mask(mask, window, from_end):
+    """Observed points among the first / last `window` observations"""
+    m = mask[..., ::-1] if from_end else mask
+    rank = np.cumsum(m, axis=-1)
+    edge = m & (rank <= window)
+    return edge[..., ::-1] if from_end else edge
+
+
+def _masked_stats(y, mask):
+    n = mask.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(mask, y, 0.0).sum(axis=-1) / n
+        var = np.where(mask, (y - mean[..., None]) ** 2, 0.0).sum(axis=-1) / n
+    return mean, np.sqrt(var)
+
+
+def trajectory_features(lengths, metrics=None, iterations=None, window=WINDOW):
+    """
+    Regime features for a batch of runs
+
+    Args:
+        lengths: (..., T) response lengths, NaN = missing
+        metrics: Optional (..., T, M) metric trajectories for stillness
+        iterations: (T,) iteration numbers (default 0..T-1)
+
+    Returns:
+        dict of (...)-shaped arrays
+    """
+    lengths = np.asarray(lengths, dtype=float)
+    n_steps = lengths.shape[-1]
+    iterations = np.arange(n_steps) if iterations is None else np.asarray(iterations)
+    mask = ~np.isnan(lengths)
+
+    head = _edge_mask(mask, window, from_end=False)
+    tail = _edge_mask(mask, window, from_end=True)
+    head_mean, _ = _masked_stats(lengths, head)
+    tail_mean, tail_std = _masked_stats(lengths, tail)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_ratio = np.log(np.maximum(tail_mean, 1.0) / np.maximum(head_mean, 1.0))
+        steady_cv = tail_std / tail_mean
+        log_len = np.log(np.maximum(lengths, 1.0))
+    growth = batched_ols(iterations, log_len)['slope']
+
+    tail_cvs = [steady_cv]
+    if metrics is not None:
+        metrics = np.moveaxis(np.asarray(metrics, dtype=float), -1, 0)
+        for series in metrics:
+            m_tail = _edge_mask(~np.isnan(series), window, from_end=True)
+            mean, std = _masked_stats(series, m_tail)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                tail_cvs.append(std / np.abs(mean))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        stillness = np.nanmedian(np.stack(tail_cvs), axis=0)
+
+    return {'n': mask.sum(axis=-1), 'head_length': head_mean, 'tail_length': tail_mean,
+            'log_ratio': log_ratio, 'growth': growth, 'steady_cv': steady_cv,
+            'stillness': stillness, 'fixed_point': stillness < FIXED_POINT_CV}
+
+
+def classify(features, min_points=MIN_POINTS):
+    """
+    Regime probabilities, label and confidence from trajectory_features()
+
+    Returns:
+        dict: probs (..., len(REGIMES)), label (...) object array, confidence (...)
+    """
+    log_ratio = np.nan_to_num(features['log_ratio'])
+    steady_cv = np.nan_to_num(features['steady_cv'], nan=np.inf)
+
+    explosion = _sigmoid((log_ratio - LOG_RATIO) / LOG_RATIO_SCALE)
+    implosion = _sigmoid((-log_ratio - LOG_RATIO) / LOG_RATIO_SCALE)
+    flat = (1.0 - explosion) * (1.0 - implosion)
+    settled = np.maximum(_sigmoid((STEADY_CV - steady_cv) / STEADY_CV_SCALE),
+                         features['fixed_point'].astype(float))
+    attractor = flat * settled
+    unsettled = flat * (1.0 - settled)
+
+    probs = np.stack([explosion, attractor, implosion, unsettled], axis=-1)
+    probs /= probs.sum(axis=-1, keepdims=True)
+    best = np.argmax(probs, axis=-1)
+    enough = features['n'] >= min_points
+    label = np.where(enough, np.array(REGIMES, dtype=object)[best], None)
+    confidence = np.where(enough, np.take_along_axis(probs, best[..., None], axis=-1)[..., 0],
+                          np.nan)
+    return {'probs': probs, 'label': label, 'confidence': confidence}
+
+
+def classify_tensor(tensor, length_metric='char_length', window=WINDOW, min_points=MIN_POINTS):
+    """
+    Classify every (group, seed) run of a ResultsTensor in one pass
+
+    Returns:
+        Tidy DataFrame, one row per run with enough points
+    """
+    from trend_fits import _group_frame
+
+    lengths = tensor.metric(length_metric)
+    others = [m for m in range(len(tensor.metrics)) if tensor.metrics[m] != length_metric]
+    metrics = tensor.values[..., others] if others else None
+    feats = trajectory_features(lengths, metrics, tensor.iterations, window)
+    result = classify(feats, min_points)
+
+    n_groups, n_seeds = lengths.shape[:2]
+    g, s = np.meshgrid(np.arange(n_groups), np.arange(n_seeds), indexing='ij')
+    table = _group_frame(tensor, g.ravel(), s.ravel())
+    for key in ('n', 'head_length', 'tail_length', 'log_ratio', 'growth', 'steady_cv',
+                'stillness', 'fixed_point'):
+        table[key] = feats[key].ravel()
+    table['regime'] = result['label'].ravel()
+    table['confidence'] = result['confidence'].ravel()
+    for k, regime in enumerate(REGIMES):
+        table[f"p_{regime}"] = result['probs'][..., k].ravel()
+    return table[table['n'] >= min_points].reset_index(drop=True)
+
+
+def summarize(table, group_by):
+    """Majority regime per group with the share of runs and mean confidence"""
+    keys = list(group_by)
+    counts = table.groupby(keys + ['regime']).agg(
+        n_runs=('seed', 'size'), confidence=('confidence', 'mean')).reset_index()
+    totals = counts.groupby(keys)['n_runs'].transform('sum')
+    counts['share'] = counts['n_runs'] / totals
+    counts = counts.sort_values(keys + ['n_runs', 'confidence'], ascending=[True] * len(keys) + [False, False])
+    return counts.groupby(keys).head(1).reset_index(drop=True)
+
+
+class RegimeMonitor:
+    """
+    Online regime label per chain
+
+    update() takes result records as written by run_chain() (or the
+    experiment scripts) and re-scores the chain from its history; the
+    arrays are tiny, so this is cheap enough to call on every step.
+    """
+
+    def __init__(self, length_key='char_length', metric_keys=(), window=WINDOW,
+                 min_points=MIN_POINTS):
+        self.length_key = length_key
+        self.metric_keys = list(metric_keys)
+        self.window = window
+        self.min_points = min_points
+        self.history = {}
+        self.latest = {}
+        self._lock = threading.Lock()
+
+    def update(self, record):
+        """Add one record; returns (regime, confidence) or None until min_points"""
+        length = record.get(self.length_key)
+        if length is None and record.get('text') is not None:
+            length = len(record['text'])
+        if length is None:
+            return None
+
+        key = chain_key(record)
+        with self._lock:
+            hist = self.history.setdefault(key, {'iteration': [], 'length': [], 'metrics': []})
+            hist['iteration'].append(record.get('iteration', len(hist['iteration'])))
+            hist['length'].append(float(length))
+            hist['metrics'].append([record.get(k, np.nan) for k in self.metric_keys])
+            if len(hist['length']) < self.min_points:
+                return None
+            metrics = np.array(hist['metrics'], dtype=float)[None] if self.metric_keys else None
+            feats = trajectory_features(np.array(hist['length'])[None], metrics,
+                                        np.array(hist['iteration']), self.window)
+            result = classify(feats, self.min_points)
+            self.latest[key] = (result['label'][0], float(result['confidence'][0]))
+            return self.latest[key]
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Classify runs into explosion/attractor/implosion")
+    parser.add_argument('--group-by', nargs='+', default=['model', 'condition'])
+    parser.add_argument('--metrics', nargs='+',
+                        default=['char_length', 'shannon_entropy', 'unique_words_ratio'])
+    parser.add_argument('--window', type=int, default=WINDOW)
+    parser.add_argument('--out', default=None, help="CSV of per-run regimes")
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=args.group_by)
+    table = classify_tensor(tensor, window=args.window)
+
+    print(summarize(table, tensor.group_by).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} runs saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Repeats - exact repeated phrases via suffix array + LCP
+
+Indexes the concatenation of a trajectory's outputs (or a whole model's
+corpus) at the word level, with a distinct sentinel after every output so
+no repeat spans two iterations:
+
+    suffix array   prefix doubling; each round is one lexsort over the
+                   (rank, rank at +2^k) pairs
+    LCP            between SA neighbours, by binary lifting over the rank
+                   tables kept from every doubling round (rank_k equal
+                   <=> the next 2^k tokens are equal), vectorized across all
+                   neighbours instead of Kasai's sequential scan
+
+From SA + LCP:
+    - longest_repeats:    longest phrases that occur at least twice
+    - coverage:           per iteration, fraction of tokens inside a phrase
+                          of >= min_len tokens already emitted in an earlier
+                          iteration (how much of the output is recycled)
+    - recurring_phrases:  min_len-token phrases seen in several iterations,
+                          with their first iteration and count
+
+Usage:
+    python experiments/repeats.py                       # per run, results/*.json
+    python experiments/repeats.py --by model --min-len 12
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+MIN_LEN = 8
+TOP = 5
+RUN_KEYS = ['file', 'model', 'condition', 'category', 'seed']
+
+
+class PhraseIndex:
+    """Suffix array and LCP over the word tokens of an ordered list of texts"""
+
+    def __init__(self, texts, labels=None):
+        docs = [t.split() for t in texts]
+        self.labels = np.asarray(labels if labels is not None else np.arange(len(texts)))
+        self.vocab, token_ids = np.unique(np.array([w for d in docs for w in d] or [''], dtype=object),
+                                          return_inverse=True)
+        lengths = np.array([len(d) for d in docs], dtype=np.int64)
+        n_docs = len(docs)
+
+        # Token codes offset by n_docs; sentinel for document d is d itself
+        total = int(lengths.sum()) + n_docs
+        self.codes = np.empty(total, dtype=np.int64)
+        self.doc = np.empty(total, dtype=np.int64)
+        ends = np.cumsum(lengths + 1) - 1
+        is_token = np.ones(total, dtype=bool)
+        is_token[ends] = False
+        self.codes[is_token] = token_ids[:int(lengths.sum())] + n_docs
+        self.codes[ends] = np.arange(n_docs)
+        self.doc[:] = np.repeat(np.arange(n_docs), lengths + 1)
+        self.is_token = is_token
+        self.doc_lengths = lengths
+
+        self.sa, self.ranks = suffix_array(self.codes)
+        self.lcp = lcp_array(self.sa, self.ranks)
+
+    def phrase(self, start, length):
+        return " ".join(self.vocab[self.codes[start:start + length] - len(self.doc_lengths)])
+
+    def groups(self, min_len):
+        """SA intervals whose suffixes share >= min_len leading tokens"""
+        linked = self.lcp[1:] >= min_len
+        starts = np.flatnonzero(np.diff(np.concatenate([[0], linked.astype(np.int8)])) == 1)
+        stops = np.flatnonzero(np.diff(np.concatenate([linked.astype(np.int8), [0]])) == -1) + 1
+        return starts, stops + 1
+
+
+def suffix_array(s):
+    """
+    Suffix array of an integer sequence by prefix doubling
+
+    Returns:
+        sa: (n,) suffix start positions in lexicographic order
+        ranks: list of rank arrays; ranks[k] orders suffixes by their first 2^k symbols
+    """
+    n = len(s)
+    rank = np.unique(s, return_inverse=True)[1].astype(np.int64)
+    ranks = [rank]
+    order = np.argsort(rank, kind='stable')
+    k = 1
+    while n and rank.max() < n - 1:
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        order = np.lexsort((second, rank))
+        changed = np.concatenate([[0], (np.diff(rank[order]) != 0) | (np.diff(second[order]) != 0)])
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.cumsum(changed)
+        ranks.append(rank)
+        k *= 2
+    return order, ranks
+
+
+def lcp_array(sa, ranks):
+    """lcp[i] = common prefix length of suffixes sa[i-1] and sa[i] (lcp[0] = 0)"""
+    n = len(sa)
+    lcp = np.zeros(n, dtype=np.int64)
+    if n < 2:
+        return lcp
+    a, b = sa[:-1], sa[1:]
+    length = np.zeros(n - 1, dtype=np.int64)
+    for k in reversed(range(len(ranks))):
+        ia, ib = a + length, b + length
+        valid = (ia < n) & (ib < n)
+        equal = np.zeros(n - 1, dtype=bool)
+        equal[valid] = ranks[k][ia[valid]] == ranks[k][ib[valid]]
+        length += equal * (1 << k)
+    lcp[1:] = length
+    return lcp
+
+
+def longest_repeats(index, top=TOP, min_len=MIN_LEN):
+    """Longest phrases occurring at least twice (overlapping shifts removed)"""
+    rows, seen = [], []
+    for i in np.argsort(-index.lcp, kind='stable'):
+        length = int(index.lcp[i])
+        if length < min_len or len(rows) >= top:
+            break
+        phrase = index.phrase(index.sa[i], length)
+        if any(phrase in other for other in seen):
+            continue
+        lo, hi = i, i + 1
+        while lo > 0 and index.lcp[lo] >= length:
+            lo -= 1
+        while hi < len(index.lcp) and index.lcp[hi] >= length:
+            hi += 1
+        docs = index.doc[index.sa[lo:hi]]
+        seen.append(phrase)
+        rows.append({'length': length, 'count': hi - lo, 'first': index.labels[docs.min()],
+                     'n_iterations': len(np.unique(docs)), 'phrase': phrase})
+    return pd.DataFrame(rows)
+
+
+def coverage(index, min_len=MIN_LEN):
+    """Per document: fraction of tokens inside a >= min_len phrase seen in an earlier document"""
+    starts, stops = index.groups(min_len)
+    n = len(index.codes)
+    delta = np.zeros(n + 1, dtype=np.int64)
+    if len(starts):
+        sizes = stops - starts
+        offsets = np.cumsum(sizes) - sizes
+        group = np.repeat(np.arange(len(starts)), sizes)
+        members = index.sa[np.arange(sizes.sum()) - offsets[group] + starts[group]]
+        first_doc = np.minimum.reduceat(index.doc[members], offsets)
+        recycled = members[index.doc[members] > first_doc[group]]
+        np.add.at(delta, recycled, 1)
+        np.add.at(delta, recycled + min_len, -1)
+    covered = (np.cumsum(delta)[:n] > 0) & index.is_token
+    per_doc = np.bincount(index.doc, weights=covered, minlength=len(index.doc_lengths))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return per_doc / index.doc_lengths
+
+
+def recurring_phrases(index, min_len=MIN_LEN, min_iterations=2, top=None):
+    """
+    min_len-token phrases occurring in >= min_iterations documents, by first occurrence
+
+    n_iterations counts distinct labels, so in a model-wide index (one
+    document per seed and iteration) it is the number of iterations the
+    phrase appears at, not the number of outputs.
+    """
+    starts, stops = index.groups(min_len)
+    rows = []
+    for lo, hi in zip(starts, stops):
+        members = index.sa[lo:hi]
+        docs = index.doc[members]
+        n_docs = len(np.unique(docs))
+        if n_docs < min_iterations:
+            continue
+        first = members[np.argmin(docs * len(index.codes) + members)]
+        rows.append({'first': index.labels[index.doc[first]], 'count': hi - lo,
+                     'n_iterations': len(np.unique(index.labels[docs])),
+                     'phrase': index.phrase(first, min_len)})
+    table = pd.DataFrame(rows, columns=['first', 'count', 'n_iterations', 'phrase'])
+    table = table.sort_values(['first', 'count'], ascending=[True, False]).reset_index(drop=True)
+    return table.head(top) if top else table
+
+
+def _collections(results, by):
+    """Key columns and key -> row indices (rows with text, in iteration order)"""
+    keys = RUN_KEYS if by == 'run' else ['file', 'model', 'condition']
+    columns = [results[c].astype(str) if results[c].dtype == object else results[c] for c in keys]
+    order_cols = (results['iteration'], results['seed']) if by != 'run' else (results['iteration'],)
+    groups = {}
+    for i in np.lexsort(order_cols + tuple(reversed(columns))):
+        if results.texts[i]:
+            groups.setdefault(tuple(c[i] for c in columns), []).append(i)
+    return keys, groups
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="Suffix-array repeated phrase analysis")
+    parser.add_argument('--by', choices=['run', 'model'], default='run')
+    parser.add_argument('--min-len', type=int, default=MIN_LEN, help="Phrase length in words")
+    parser.add_argument('--top', type=int, default=TOP)
+    parser.add_argument('--out', default=None, help="CSV of per-iteration coverage")
+    args = parser.parse_args()
+
+    results = load_index()
+    keys, groups = _collections(results, args.by)
+    frames = []
+    for key, rows in groups.items():
+        iterations = results['iteration'][rows]
+        index = PhraseIndex([results.texts[i] for i in rows], iterations)
+        cov = coverage(index, args.min_len)
+        frame = pd.DataFrame({'iteration': iterations, 'coverage': cov})
+        for position, (name, value) in enumerate(zip(keys, key)):
+            frame.insert(position, name, value)
+        frames.append(frame)
+
+        repeats = longest_repeats(index, args.top, args.min_len)
+        label = " | ".join(str(k) for k in key if str(k))
+        scored = cov[np.isfinite(cov)]
+        mean = f"{scored.mean():.2f}" if len(scored) else "n/a"
+        print(f"\n{label}: {len(rows)} outputs, mean coverage {mean}")
+        for rep in repeats.itertuples():
+            text = rep.phrase if len(rep.phrase) <= 90 else rep.phrase[:87] + "..."
+            print(f"  {rep.length:4d} words ×{rep.count:<3d} from iter {rep.first}: {text}")
+        phrases = recurring_phrases(index, args.min_len)
+        if len(phrases):
+            widest = phrases.loc[phrases['n_iterations'].idxmax()]
+            print(f"  most widespread: \"{widest['phrase']}\" in {widest['n_iterations']} iterations "
+                  f"since iter {widest['first']}")
+
+    if args.out and frames:
+        table = pd.concat(frames, ignore_index=True)
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} rows saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
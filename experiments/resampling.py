@@ -0,0 +1,246 @@
+"""
+Resampling - seed-level cluster bootstrap and permutation tests
+
+Iterations of one chain are strongly correlated, so the seed (chain), not
+the individual iteration, is the independent unit. Both procedures here
+resample whole seeds:
+
+    bootstrap:    draw seeds with replacement within each condition and
+                  recompute the pooled mean of every metric
+    permutation:  shuffle condition labels across seeds (unpaired) or flip
+                  the sign of per-seed differences (paired, same seed prompt
+                  in both conditions)
+
+Each procedure builds all resamples as one index (or sign) matrix and
+evaluates every metric with vectorized reductions over per-seed sums and
+counts. Resamples are split into chunks evaluated on a thread pool (NumPy
+releases the GIL in the reductions).
+
+Usage:
+    python experiments/resampling.py --resamples 10000 --window 10 --out results/contrasts.csv
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rng_streams import RunStreams
+
+N_RESAMPLES = 10000
+CHUNK = 1000
+
+
+def cluster_sums(values):
+    """
+    Per-seed sums and counts over the iteration axis
+
+    Args:
+        values: (seed, iteration, metric) with NaN for missing cells
+
+    Returns:
+        sums (seed, metric), counts (seed, metric), restricted to seeds
+        observed for at least one metric
+    """
+    mask = ~np.isnan(values)
+    sums = np.where(mask, values, 0.0).sum(axis=1)
+    counts = mask.sum(axis=1).astype(float)
+    keep = counts.sum(axis=1) > 0
+    return sums[keep], counts[keep]
+
+
+def _chunked(fn, n_resamples, workers):
+    bounds = list(range(0, n_resamples, CHUNK)) + [n_resamples]
+    jobs = list(zip(bounds[:-1], bounds[1:]))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(lambda b: fn(*b), jobs)), axis=0)
+
+
+def _index_matrix(rng, n_resamples, n_seeds):
+    return rng.integers(n_seeds, size=(n_resamples, n_seeds))
+
+
+def cluster_bootstrap(sums_a, counts_a, sums_b, counts_b, n_resamples=N_RESAMPLES,
+                      paired=False, rng=None, workers=None):
+    """
+    Bootstrap distribution of mean_b - mean_a for every metric
+
+    Returns:
+        (n_resamples, metric) array of resampled differences
+    """
+    rng = rng or RunStreams().chain('resampling').generator('sampling')
+    workers = workers or os.cpu_count()
+    idx_a = _index_matrix(rng, n_resamples, len(sums_a))
+    idx_b = idx_a if paired else _index_matrix(rng, n_resamples, len(sums_b))
+
+    def evaluate(lo, hi):
+        ia, ib = idx_a[lo:hi], idx_b[lo:hi]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_a = sums_a[ia].sum(axis=1) / counts_a[ia].sum(axis=1)
+            mean_b = sums_b[ib].sum(axis=1) / counts_b[ib].sum(axis=1)
+        return mean_b - mean_a
+
+    return _chunked(evaluate, n_resamples, workers)
+
+
+def cluster_permutation(sums_a, counts_a, sums_b, counts_b, n_resamples=N_RESAMPLES,
+                        paired=False, rng=None, workers=None):
+    """
+    Permutation null distribution of mean_b - mean_a for every metric
+
+    Unpaired: seed labels are permuted across the pooled set of clusters.
+    Paired: each seed's (a, b) pair is swapped with probability 1/2.
+
+    Returns:
+        (n_resamples, metric) array of permuted differences
+    """
+    rng = rng or RunStreams().chain('resampling').generator('sampling', 1)
+    workers = workers or os.cpu_count()
+
+    if paired:
+        swap = rng.random((n_resamples, len(sums_a))) < 0.5
+
+        def evaluate(lo, hi):
+            s = swap[lo:hi, :, None]
+            pa_s = np.where(s, sums_b, sums_a).sum(axis=1)
+            pa_c = np.where(s, counts_b, counts_a).sum(axis=1)
+            pb_s = np.where(s, sums_a, sums_b).sum(axis=1)
+            pb_c = np.where(s, counts_a, counts_b).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return pb_s / pb_c - pa_s / pa_c
+    else:
+        all_sums = np.concatenate([sums_a, sums_b])
+        all_counts = np.concatenate([counts_a, counts_b])
+        n_a, n_total = len(sums_a), len(all_sums)
+        order = np.argsort(rng.random((n_resamples, n_total)), axis=1)
+        tot_s, tot_c = all_sums.sum(axis=0), all_counts.sum(axis=0)
+
+        def evaluate(lo, hi):
+            ia = order[lo:hi, :n_a]
+            a_s, a_c = all_sums[ia].sum(axis=1), all_counts[ia].sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return (tot_s - a_s) / (tot_c - a_c) - a_s / a_c
+
+    return _chunked(evaluate, n_resamples, workers)
+
+
+def contrast(values_a, values_b, n_resamples=N_RESAMPLES, paired=False, ci=0.95,
+             rng=None, workers=None):
+    """
+    Cluster bootstrap CI and permutation p-value for one window
+
+    Args:
+        values_a, values_b: (seed, iteration, metric) arrays
+        paired: Seeds share prompts across conditions (matched by run slot)
+
+    Returns:
+        dict of (metric,)-shaped arrays: diff, ci_low, ci_high, p_perm
+    """
+    if paired:
+        both = (~np.isnan(values_a)).any(axis=(1, 2)) & (~np.isnan(values_b)).any(axis=(1, 2))
+        values_a, values_b = values_a[both], values_b[both]
+    sums_a, counts_a = cluster_sums(values_a)
+    sums_b, counts_b = cluster_sums(values_b)
+    n_metrics = values_a.shape[-1]
+    if len(sums_a) < 2 or len(sums_b) < 2:
+        nan = np.full(n_metrics, np.nan)
+        return {'diff': nan, 'ci_low': nan, 'ci_high': nan, 'p_perm': nan,
+                'n_seeds_a': len(sums_a), 'n_seeds_b': len(sums_b)}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        observed = sums_b.sum(axis=0) / counts_b.sum(axis=0) - sums_a.sum(axis=0) / counts_a.sum(axis=0)
+
+    boot = cluster_bootstrap(sums_a, counts_a, sums_b, counts_b, n_resamples, paired, rng, workers)
+    perm = cluster_permutation(sums_a, counts_a, sums_b, counts_b, n_resamples, paired, rng, workers)
+
+    tail = (1.0 - ci) / 2 * 100
+    ci_low, ci_high = np.nanpercentile(boot, [tail, 100 - tail], axis=0)
+    extreme = (np.abs(perm) >= np.abs(observed) - 1e-12).sum(axis=0)
+    p_perm = (1 + extreme) / (1 + n_resamples)
+
+    return {'diff': observed, 'ci_low': ci_low, 'ci_high': ci_high, 'p_perm': p_perm,
+            'n_seeds_a': len(sums_a), 'n_seeds_b': len(sums_b)}
+
+
+def iteration_windows(iterations, width):
+    """Consecutive (start, end) iteration windows of `width` (end exclusive)"""
+    lo, hi = int(iterations.min()), int(iterations.max()) + 1
+    return [(s, min(s + width, hi)) for s in range(lo, hi, width)]
+
+
+def condition_contrasts(tensor, group_a='closed_loop', group_b='exogenous', windows=None,
+                        n_resamples=N_RESAMPLES, paired=True, rng=None, workers=None):
+    """
+    Closed-loop vs exogenous contrasts for every model, metric and window
+
+    The tensor's last group_by column must be 'condition'; any preceding
+    columns (e.g. model) define the strata contrasted separately.
+
+    Returns:
+        Tidy DataFrame, one row per (stratum, window, metric)
+    """
+    if tensor.group_by[-1] != 'condition':
+        raise ValueError("condition_contrasts needs group_by ending with 'condition'")
+    if windows is None:
+        windows = [(int(tensor.iterations.min()), int(tensor.iterations.max()) + 1)]
+
+    strata = {}
+    for label in tensor.groups:
+        parts = label.split("|")
+        strata.setdefault(tuple(parts[:-1]), {})[parts[-1]] = tensor.groups.index(label)
+
+    rows = []
+    for stratum, conds in sorted(strata.items()):
+        if group_a not in conds or group_b not in conds:
+            continue
+        for start, end in windows:
+            win = (tensor.iterations >= start) & (tensor.iterations < end)
+            res = contrast(tensor.values[conds[group_a]][:, win],
+                           tensor.values[conds[group_b]][:, win],
+                           n_resamples=n_resamples, paired=paired, rng=rng, workers=workers)
+            if res['n_seeds_a'] == 0 or res['n_seeds_b'] == 0:
+                continue
+            for m, metric in enumerate(tensor.metrics):
+                row = dict(zip(tensor.group_by[:-1], stratum))
+                row.update({'metric': metric, 'window_start': start, 'window_end': end,
+                            'diff': res['diff'][m], 'ci_low': res['ci_low'][m],
+                            'ci_high': res['ci_high'][m], 'p_perm': res['p_perm'][m],
+                            'n_seeds_a': res['n_seeds_a'], 'n_seeds_b': res['n_seeds_b']})
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Seed-level bootstrap/permutation contrasts")
+    parser.add_argument('--group-by', nargs='+', default=['model', 'condition'])
+    parser.add_argument('--metrics', nargs='+',
+                        default=['lz_complexity', 'shannon_entropy', 'trigram_diversity',
+                                 'unique_words_ratio'])
+    parser.add_argument('--resamples', type=int, default=N_RESAMPLES)
+    parser.add_argument('--window', type=int, default=None, help="Iteration window width")
+    parser.add_argument('--unpaired', action='store_true')
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=args.group_by)
+    windows = iteration_windows(tensor.iterations, args.window) if args.window else None
+    table = condition_contrasts(tensor, windows=windows, n_resamples=args.resamples,
+                                paired=not args.unpaired)
+    if table.empty:
+        print("No stratum has both closed_loop and exogenous data.")
+        return
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.5g}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} contrasts saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Results Index - one normalized, columnar table over every results file
+
+The experiment scripts write several JSON layouts:
+
+    - flat records with precomputed metrics      (extended/free validation)
+    - flat records with raw 'text'               (haiku, deepseek, openai, gemini, ...)
+    - one record per run with a 'trajectory'     (robustness grid)
+
+load_index() flattens all of them into one row per (file, model, condition,
+category, seed, iteration), stored column-wise as NumPy arrays. Metric
+columns are float64 with NaN where a file does not provide the value.
+Texts are kept as one UTF-8 blob plus offsets so the index can be saved
+and memory-mapped like the exogenous corpus.
+
+Usage:
+    python experiments/results_index.py                  # build results/index/
+    python experiments/results_index.py --with-metrics   # also compute text metrics
+    python experiments/results_index.py --with-compression   # also compressor ratios
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+RESULTS_DIR = Path("results")
+INDEX_DIR = RESULTS_DIR / "index"
+
+KEY_COLUMNS = ['file', 'model', 'condition', 'category']
+INT_COLUMNS = ['seed', 'iteration']
+ARRAY_COLUMNS = ['token_entropy', 'token_surprisal']
+PARAM_COLUMNS = ['temperature']
+RESERVED = set(KEY_COLUMNS + INT_COLUMNS + ['text', 'trajectory', 'run_id', 'seed_index',
+                                            'iter', 'len', 'finish_reason'])
+
+
+def _normalize_record(record, file_stem):
+    row = {
+        'file': file_stem,
+        'model': record.get('model') or file_stem,
+        'condition': record.get('condition', 'closed_loop'),
+        'category': record.get('category', ''),
+        'seed': int(record.get('seed', record.get('seed_index', 0))),
+        'iteration': int(record.get('iteration', record.get('iter', 0))),
+        'text': record.get('text'),
+    }
+    for key, value in record.items():
+        if key in RESERVED:
+            continue
+        if key in ARRAY_COLUMNS and isinstance(value, list):
+            row[key] = value
+        elif isinstance(value, bool):
+            row[key] = float(value)
+        elif isinstance(value, (int, float)):
+            row[key] = float(value)
+    if 'len' in record:
+        row['char_length'] = float(record['len'])
+    elif row['text'] is not None and 'char_length' not in row:
+        row['char_length'] = float(len(row['text']))
+    return row
+
+
+def iter_file_records(path):
+    """Yield normalized rows from one results JSON file"""
+    path = Path(path)
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('results', [])
+    for record in data:
+        if not isinstance(record, dict):
+            continue
+        if 'trajectory' in record:
+            run_fields = {k: v for k, v in record.items()
+                          if k in ('model', 'category', 'seed_index', 'temperature', 'condition')}
+            for step in record['trajectory']:
+                yield _normalize_record({**run_fields, **step}, path.stem)
+        else:
+            yield _normalize_record(record, path.stem)
+
+
+class ResultsIndex:
+    """
+    Column store: dict of equal-length NumPy arrays plus a text column
+
+    Per-token series (ARRAY_COLUMNS) are ragged float16 columns: one flat
+    value array and row offsets, like the text blob.
+    """
+
+    def __init__(self, columns, texts, arrays=None):
+        self.columns = columns
+        self.texts = texts
+        self.arrays = arrays or {}
+
+    def __len__(self):
+        return len(self.columns['iteration'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def metric_names(self):
+        return [c for c in self.columns if c not in KEY_COLUMNS + INT_COLUMNS + PARAM_COLUMNS]
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        columns = {c: np.array([r[c] for r in rows], dtype=object) for c in KEY_COLUMNS}
+        for c in INT_COLUMNS:
+            columns[c] = np.array([r[c] for r in rows], dtype=np.int64)
+        metric_names = sorted({k for r in rows for k in r}
+                              - set(KEY_COLUMNS + INT_COLUMNS + ARRAY_COLUMNS + ['text']))
+        for c in metric_names:
+            columns[c] = np.array([r.get(c, np.nan) for r in rows], dtype=np.float64)
+        arrays = {}
+        for c in ARRAY_COLUMNS:
+            if any(c in r for r in rows):
+                series = [np.asarray(r.get(c, []), dtype=np.float16) for r in rows]
+                offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(v) for v in series])
+                arrays[c] = (np.concatenate(series), offsets)
+        texts = [r['text'] or "" for r in rows]
+        return cls(columns, texts, arrays)
+
+    def select(self, mask):
+        """Row subset as a new index"""
+        idx = np.flatnonzero(mask)
+        arrays = {}
+        for name, (values, offsets) in self.arrays.items():
+            parts = [values[offsets[i]:offsets[i + 1]] for i in idx]
+            sub_offsets = np.zeros(len(idx) + 1, dtype=np.int64)
+            sub_offsets[1:] = np.cumsum([len(p) for p in parts])
+            arrays[name] = (np.concatenate(parts) if parts else values[:0], sub_offsets)
+        return ResultsIndex({c: v[idx] for c, v in self.columns.items()},
+                            [self.texts[i] for i in idx], arrays)
+
+    def where(self, **equals):
+        """Rows where every given column equals the given value"""
+        mask = np.ones(len(self), dtype=bool)
+        for column, value in equals.items():
+            mask &= self.columns[column] == value
+        return self.select(mask)
+
+    def array(self, name, row):
+        """Per-token series of one row (float16 view)"""
+        values, offsets = self.arrays[name]
+        return values[offsets[row]:offsets[row + 1]]
+
+    def add_column(self, name, values):
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError(f"Column {name} has {len(values)} rows, index has {len(self)}")
+        self.columns[name] = values
+
+    def compute_text_metrics(self, metrics_fn=None, names=None):
+        """Fill missing text-metric cells from the stored texts"""
+        if metrics_fn is None:
+            from text_metrics import METRICS, compute_all_metrics
+            metrics_fn, names = compute_all_metrics, METRICS
+        for name in names:
+            if name not in self.columns:
+                self.columns[name] = np.full(len(self), np.nan)
+        missing = np.zeros(len(self), dtype=bool)
+        for name in names:
+            missing |= np.isnan(self.columns[name])
+        for i in np.flatnonzero(missing):
+            if not self.texts[i]:
+                continue
+            for name, value in metrics_fn(self.texts[i]).items():
+                if np.isnan(self.columns[name][i]):
+                    self.columns[name][i] = value
+
+    def to_records(self):
+        """
+        Back to a list of dicts (metric NaNs dropped)
+
+        Records carry the text and any non-empty per-token series as lists,
+        so ResultsIndex.from_rows(index.to_records()) round-trips.
+        """
+        records = []
+        for i in range(len(self)):
+            rec = {c: (v[i].item() if hasattr(v[i], 'item') else v[i])
+                   for c, v in self.columns.items()}
+            rec = {k: v for k, v in rec.items() if not (isinstance(v, float) and np.isnan(v))}
+            rec['text'] = self.texts[i]
+            for name in self.arrays:
+                series = self.array(name, i)
+                if len(series):
+                    rec[name] = series.astype(np.float64).tolist()
+            records.append(rec)
+        return records
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, out_dir=INDEX_DIR):
+        """
+        Write one .npy file per column (memory-mappable) plus texts.bin
+
+        String columns are dictionary-encoded: codes in <name>.npy and the
+        category list in schema.json. Ragged series are saved as
+        <name>.values.npy (float16) and <name>.offsets.npy.
+        """
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        schema = {'n_rows': len(self), 'categorical': {}, 'numeric': [], 'arrays': []}
+        for name, values in self.columns.items():
+            if values.dtype == object:
+                categories, codes = np.unique(values.astype(str), return_inverse=True)
+                np.save(out_dir / f"{name}.npy", codes.astype(np.int32))
+                schema['categorical'][name] = categories.tolist()
+            else:
+                np.save(out_dir / f"{name}.npy", values)
+                schema['numeric'].append(name)
+
+        encoded = [t.encode('utf-8') for t in self.texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        with open(out_dir / "texts.bin", 'wb') as f:
+            for e in encoded:
+                f.write(e)
+        np.save(out_dir / "text_offsets.npy", offsets)
+        for name, (values, value_offsets) in self.arrays.items():
+            np.save(out_dir / f"{name}.values.npy", values.astype(np.float16))
+            np.save(out_dir / f"{name}.offsets.npy", value_offsets)
+            schema['arrays'].append(name)
+        with open(out_dir / "schema.json", 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    @classmethod
+    def load(cls, in_dir=INDEX_DIR, mmap_mode='r'):
+        in_dir = Path(in_dir)
+        with open(in_dir / "schema.json", 'r') as f:
+            schema = json.load(f)
+        columns = {}
+        for name, categories in schema['categorical'].items():
+            codes = np.load(in_dir / f"{name}.npy")
+            columns[name] = np.array(categories, dtype=object)[codes] if len(categories) \
+                else np.array([], dtype=object)
+        for name in schema['numeric']:
+            columns[name] = np.load(in_dir / f"{name}.npy", mmap_mode=mmap_mode)
+
+        offsets = np.load(in_dir / "text_offsets.npy")
+        blob = (in_dir / "texts.bin").read_bytes()
+        texts = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        arrays = {name: (np.load(in_dir / f"{name}.values.npy", mmap_mode=mmap_mode),
+                         np.load(in_dir / f"{name}.offsets.npy"))
+                  for name in schema.get('arrays', [])}
+        return cls(columns, texts, arrays)
+
+
+def load_index(paths=None, results_dir=RESULTS_DIR):
+    """Build an index from results JSON files (default: every results/*.json)"""
+    if paths is None:
+        paths = sorted(Path(results_dir).glob("*.json"))
+    rows = []
+    for path in paths:
+        rows.extend(iter_file_records(path))
+    return ResultsIndex.from_rows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the normalized results index")
+    parser.add_argument('--results', default=str(RESULTS_DIR))
+    parser.add_argument('--out', default=str(INDEX_DIR))
+    parser.add_argument('--with-metrics', action='store_true',
+                        help="Compute text metrics for rows that only have raw text")
+    parser.add_argument('--with-compression', action='store_true',
+                        help="Add multi-compressor ratio columns (compression_metrics.py)")
+    args = parser.parse_args()
+
+    index = load_index(results_dir=args.results)
+    if args.with_metrics:
+        index.compute_text_metrics()
+    if args.with_compression:
+        from compression_metrics import add_compression_metrics
+        add_compression_metrics(index)
+    index.save(args.out)
+    files = np.unique(index['file'].astype(str))
+    print(f"✓ Indexed {len(index)} rows from {len(files)} files → {args.out}")
+    print(f"  Metrics: {', '.join(index.metric_names)}")
+
+
+if __name__ == '__main__':
+    main()
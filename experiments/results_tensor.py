@@ -0,0 +1,169 @@
+"""
+Results Tensor - dense (group, seed, iteration, metric) array for analysis
+
+Materializes a results index (or a plain list of result dicts) into
+
+    values[g, s, i, m]   float64, NaN where the cell is missing
+    mask[g, s, i, m]     True where a value is present
+
+with one scatter assignment, so descriptive statistics, per-iteration
+means/SDs, trend fits and rank tests are all array reductions instead of
+list comprehensions over records.
+
+The group axis is the 'condition' column by default; any combination of
+index columns can be used, e.g. group_by=('model', 'condition'). The seed
+axis is a run axis: one slot per distinct combination of the RUN_KEYS not
+used for grouping (file, category and seed under the default grouping), so
+runs from different files that reuse a seed number never share a cell.
+Slots are shared across groups, which keeps paired contrasts matched on
+run identity. Two rows landing in the same (group, run, iteration) cell
+raise instead of overwriting each other.
+"""
+
+import warnings
+
+import numpy as np
+from scipy import stats
+
+from results_index import KEY_COLUMNS, ResultsIndex, _normalize_record
+from trend_fits import batched_ols
+
+RUN_KEYS = KEY_COLUMNS + ['seed']
+
+
+def _codes(column):
+    values = column.astype(str) if column.dtype == object else column
+    return np.unique(values, return_inverse=True)[1].ravel()
+
+
+class ResultsTensor:
+    """Dense view over results with a NaN mask for missing cells"""
+
+    def __init__(self, values, groups, seeds, iterations, metrics, group_by, runs=None, run_by=('seed',)):
+        self.values = values
+        self.mask = ~np.isnan(values)
+        self.groups = groups
+        self.seeds = seeds
+        self.iterations = iterations
+        self.metrics = list(metrics)
+        self.group_by = tuple(group_by)
+        self.run_by = tuple(run_by)
+        self.runs = runs if runs is not None else [(s,) for s in np.asarray(seeds).tolist()]
+
+    @classmethod
+    def from_index(cls, index, metrics=None, group_by=('condition',)):
+        if metrics is None:
+            metrics = index.metric_names
+        group_cols = [index[c].astype(str) for c in group_by]
+        labels = group_cols[0] if len(group_cols) == 1 else \
+            np.array(["|".join(parts) for parts in zip(*group_cols)], dtype=object)
+
+        groups, g_idx = np.unique(labels, return_inverse=True)
+        iterations, i_idx = np.unique(index['iteration'], return_inverse=True)
+
+        run_by = [c for c in RUN_KEYS if c not in group_by]
+        codes = np.column_stack([_codes(index[c]) for c in run_by] or [np.zeros(len(index), dtype=int)])
+        _, first, s_idx = np.unique(codes, axis=0, return_index=True, return_inverse=True)
+        s_idx = s_idx.ravel()
+        runs = list(zip(*(index[c][first].tolist() for c in run_by))) if run_by else [()] * len(first)
+
+        cells = (g_idx * len(first) + s_idx) * len(iterations) + i_idx
+        unique_cells, counts = np.unique(cells, return_counts=True)
+        if len(unique_cells) < len(cells):
+            row = np.flatnonzero(cells == unique_cells[np.argmax(counts > 1)])[0]
+            key = {c: index[c][row:row + 1].tolist()[0] for c in list(group_by) + run_by + ['iteration']}
+            raise ValueError(f"{len(cells) - len(unique_cells)} rows share a (group, run, iteration) "
+                             f"cell with another row, e.g. {key}; add the column that tells them "
+                             f"apart to group_by")
+
+        values = np.full((len(groups), len(first), len(iterations), len(metrics)), np.nan)
+        for m, metric in enumerate(metrics):
+            values[g_idx, s_idx, i_idx, m] = index[metric]
+        return cls(values, groups.tolist(), index['seed'][first], iterations, metrics, group_by,
+                   runs, run_by)
+
+    @classmethod
+    def from_records(cls, records, metrics=None, group_by=('condition',)):
+        """Build from a list of result dicts as written by the experiment scripts"""
+        index = ResultsIndex.from_rows(_normalize_record(r, 'records') for r in records)
+        return cls.from_index(index, metrics=metrics, group_by=group_by)
+
+    # ------------------------------------------------------------------
+    # Accessors
+    # ------------------------------------------------------------------
+
+    def group(self, label):
+        """(seed, iteration, metric) slice for one group"""
+        return self.values[self.groups.index(label)]
+
+    def metric(self, name):
+        """(group, seed, iteration) slice for one metric"""
+        return self.values[..., self.metrics.index(name)]
+
+    def pooled(self, label):
+        """
+        (n_points, metric) matrix of all observations of a group
+
+        Rows are (seed, iteration) cells; NaN marks cells where a given
+        metric is missing.
+        """
+        return self.group(label).reshape(-1, len(self.metrics))
+
+    # ------------------------------------------------------------------
+    # Reductions
+    # ------------------------------------------------------------------
+
+    def describe(self):
+        """
+        Pooled descriptive statistics per (group, metric)
+
+        Returns:
+            dict of (group, metric)-shaped arrays: mean, std, n
+        """
+        n = self.mask.sum(axis=(1, 2))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(self.values, axis=(1, 2))
+            std = np.nanstd(self.values, axis=(1, 2))
+        return {'mean': mean, 'std': std, 'n': n}
+
+    def iteration_stats(self):
+        """
+        Mean and SD across seeds for every (group, iteration, metric)
+
+        Returns:
+            dict of (group, iteration, metric)-shaped arrays: mean, std, n
+        """
+        n = self.mask.sum(axis=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(self.values, axis=1)
+            std = np.nanstd(self.values, axis=1)
+        return {'mean': mean, 'std': std, 'n': n}
+
+    def trend(self):
+        """
+        Pooled OLS of metric on iteration per (group, metric)
+
+        Equivalent to stats.linregress over every (iteration, value) point of
+        a group, computed for all groups and metrics at once.
+
+        Returns:
+            dict of (group, metric)-shaped arrays: slope, intercept, r, p, stderr, n
+        """
+        n_groups, n_seeds, _, n_metrics = self.values.shape
+        y = np.moveaxis(self.values, 3, 1).reshape(n_groups, n_metrics, -1)
+        fit = batched_ols(np.tile(self.iterations, n_seeds), y)
+        return {'slope': fit['slope'], 'intercept': fit['intercept'], 'r': fit['r'],
+                'p': fit['p'], 'stderr': fit['se_slope'], 'n': fit['n']}
+
+    def rank_test(self, group_a, group_b, alternative='two-sided'):
+        """
+        Mann-Whitney U of pooled group_a vs group_b for every metric
+
+        Returns:
+            dict of (metric,)-shaped arrays: statistic, p
+        """
+        res = stats.mannwhitneyu(self.pooled(group_a), self.pooled(group_b),
+                                 alternative=alternative, axis=0, nan_policy='omit')
+        return {'statistic': np.atleast_1d(res.statistic), 'p': np.atleast_1d(res.pvalue)}
@@ -0,0 +1,99 @@
+"""
+RNG Streams - reproducible per-chain randomness for parallel runs
+
+Every stochastic decision in a run draws from its own stream:
+
+    run seed ──SeedSequence──► chain k ──► decision ('exogenous', 'mixing', ...)
+                                              └─► Philox(key, counter=iteration)
+
+Streams are addressed by position (spawn_key), not by spawn order, so
+chain k gets the same key whether it is spawned first, last, on another
+machine, or after a resume. The per-iteration generator is counter-based:
+drawing for iteration 73 does not require replaying iterations 0..72, and
+scheduling order between concurrent chains cannot change any draw.
+
+Usage:
+    streams = RunStreams(RUN_SEED).chain(seed_idx)
+    rng = streams.generator('exogenous', iteration)
+    exo_text = EXOGENOUS_TEXTS[rng.integers(len(EXOGENOUS_TEXTS))]
+
+    for seed_idx in RunStreams(RUN_SEED).seed_order(NUM_SEEDS): ...
+    rng = chain_streams(run_id, seed_idx).generator('exogenous', iteration)   # cached per chain
+"""
+
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+RUN_SEED = 20260214
+
+# Fixed decision ids: appending new decisions never shifts existing streams
+DECISIONS = {
+    'exogenous': 0,
+    'mixing': 1,
+    'seed_order': 2,
+    'sampling': 3,
+}
+
+
+def stable_key(value):
+    """Deterministic 32-bit key for str/int identifiers (hash() is salted per process)"""
+    if isinstance(value, (int, np.integer)):
+        return int(value) & 0xFFFFFFFF
+    return zlib.crc32(str(value).encode('utf-8'))
+
+
+class ChainStreams:
+    """All decision streams belonging to one chain"""
+
+    def __init__(self, seed_sequence):
+        self.seed_sequence = seed_sequence
+        self._keys = {}
+
+    def _key(self, decision):
+        if decision not in self._keys:
+            child = np.random.SeedSequence(
+                self.seed_sequence.entropy,
+                spawn_key=self.seed_sequence.spawn_key + (DECISIONS[decision],))
+            self._keys[decision] = child.generate_state(2, dtype=np.uint64)
+        return self._keys[decision]
+
+    def generator(self, decision, iteration=0):
+        """
+        Counter-based generator for one decision at one iteration
+
+        The iteration occupies the third 64-bit counter word, leaving 2^128
+        blocks per iteration before streams could overlap.
+        """
+        counter = np.array([0, 0, int(iteration), 0], dtype=np.uint64)
+        return np.random.Generator(np.random.Philox(key=self._key(decision), counter=counter))
+
+
+class RunStreams:
+    """Root of the stream tree for one run"""
+
+    def __init__(self, run_seed=RUN_SEED):
+        self.run_seed = stable_key(run_seed)
+        self.root = np.random.SeedSequence(self.run_seed)
+
+    def chain(self, *chain_key):
+        """
+        Streams for the chain identified by `chain_key`
+
+        Equivalent to the chain_key-th child of `SeedSequence.spawn`, but
+        addressed directly so it does not depend on spawn order. Keys may
+        be ints or strings, e.g. chain(seed_idx) or chain(seed_idx, 'exogenous').
+        """
+        spawn_key = self.root.spawn_key + tuple(stable_key(k) for k in chain_key)
+        return ChainStreams(np.random.SeedSequence(self.root.entropy, spawn_key=spawn_key))
+
+    def seed_order(self, n_seeds):
+        """Reproducible permutation of seed indices for scheduling"""
+        return [int(s) for s in self.chain('run').generator('seed_order').permutation(n_seeds)]
+
+
+@lru_cache(maxsize=4096)
+def chain_streams(run, seed):
+    """Cached RNG streams for (run, seed)"""
+    return RunStreams(run).chain(int(seed))
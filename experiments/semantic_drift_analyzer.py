@@ -1,26 +1,164 @@
+"""
+Semantic Drift Analyzer - dérive sémantique entre itérations successives
+
+Embeddings locaux, sans réseau : TF-IDF sur des tokens hachés (hashing
+trick, pas de vocabulaire à stocker) puis projection aléatoire gaussienne
+vers un espace dense float32 (Johnson-Lindenstrauss : les cosinus sont
+préservés à ~1/sqrt(dim) près). Tout le corpus est encodé en un seul
+produit matrice creuse x matrice dense.
+
+La matrice TF-IDF est celle de tfidf_corpus.TfidfCorpus (results/tfidf/),
+partagée avec les autres analyses textuelles : la CLI met le corpus à jour
+depuis l'index des résultats puis projette corpus.tfidf(), sans
+re-tokeniser les textes.
+
+Usage:
+    python experiments/semantic_drift_analyzer.py
+    python experiments/semantic_drift_analyzer.py --dim 512 --out results/semantic_drift.csv
+"""
+
+import argparse
+import re
+import zlib
+
 import numpy as np
-from anthropic import Anthropic
-from scipy.spatial.distance import cosine
+from scipy import sparse
+
+HASH_DIM = 2 ** 15
+EMBED_DIM = 256
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _hashed_counts(texts, n_features=HASH_DIM):
+    """Matrice creuse (n_texts, n_features) des comptes de tokens hachés"""
+    indptr, indices = [0], []
+    for text in texts:
+        indices.extend(zlib.crc32(tok.encode('utf-8')) % n_features
+                       for tok in _TOKEN.findall(text.lower()))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    counts = sparse.csr_matrix((data, indices, indptr), shape=(len(texts), n_features))
+    counts.sum_duplicates()
+    return counts
+
+
+class LocalEmbedder:
+    """
+    TF-IDF haché + projection aléatoire
+
+    fit() estime l'IDF sur un corpus ; sans fit, tous les tokens ont le
+    même poids. La projection est tirée une fois (graine fixe), donc deux
+    instances avec les mêmes paramètres produisent les mêmes vecteurs.
+    """
+
+    def __init__(self, dim=EMBED_DIM, n_features=HASH_DIM, seed=0):
+        self.dim = dim
+        self.n_features = n_features
+        rng = np.random.default_rng(seed)
+        self.projection = rng.standard_normal((n_features, dim), dtype=np.float32) / np.sqrt(dim)
+        self.idf = np.ones(n_features, dtype=np.float32)
+
+    def fit(self, texts):
+        counts = _hashed_counts(texts, self.n_features)
+        df = np.bincount(counts.indices, minlength=self.n_features)
+        self.idf = (np.log((1.0 + counts.shape[0]) / (1.0 + df)) + 1.0).astype(np.float32)
+        return self
+
+    def fit_corpus(self, corpus):
+        """Reprend l'IDF d'un TfidfCorpus (mêmes comptes, même formule)"""
+        self.idf = np.asarray(corpus.idf, dtype=np.float32)
+        return self
+
+    def project(self, tfidf):
+        """Projection d'une matrice TF-IDF creuse déjà pondérée -> (n, dim) float32 unitaires"""
+        vectors = np.asarray(tfidf @ self.projection, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def embed_counts(self, counts):
+        """Embeddings de comptes hachés (lignes d'un TfidfCorpus), pondérés par cet IDF"""
+        tfidf = counts.astype(np.float32, copy=True).tocsr()
+        tfidf.data = np.log1p(tfidf.data)
+        return self.project(tfidf.multiply(self.idf[None, :]).tocsr())
+
+    def transform(self, texts):
+        """Embeddings L2-normalisés, (n_texts, dim) float32"""
+        return self.embed_counts(_hashed_counts(texts, self.n_features))
 
-# Configuration
-client = Anthropic() # Utilise ta clé exportée en variable d'environnement
+    def fit_transform(self, texts):
+        return self.fit(texts).transform(texts)
+
+
+_default_embedder = None
+
+
+def get_embedding(text, embedder=None):
+    """Vecteur float32 d'un texte (embedder par défaut si aucun n'est fourni)"""
+    global _default_embedder
+    if embedder is None:
+        if _default_embedder is None:
+            _default_embedder = LocalEmbedder()
+        embedder = _default_embedder
+    return embedder.transform([text])[0]
+
+
+def drift_curve(vectors):
+    """Distance cosinus entre lignes consécutives : (n,) -> (n-1,)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1)
+    dots = np.einsum('ij,ij->i', vectors[:-1], vectors[1:])
+    denom = norms[:-1] * norms[1:]
+    return 1.0 - dots / np.where(denom == 0, 1.0, denom)
 
-def get_embedding(text):
-    # Note : On utilise un modèle d'embedding pour transformer le texte en vecteur
-    # (Par exemple via OpenAI ou un modèle local comme Sentence-Transformers)
-    # Pour rester pur Anthropic, on peut analyser la variation des probabilités
-    pass
 
 def analyze_semantic_drift(generations):
     """
     Calcule la distance sémantique entre l'itération N et N+1.
     Une distance qui rétrécit confirme l'effondrement de l'exploration.
     """
-    distances = []
-    for i in range(len(generations) - 1):
-        vec_a = generations[i]['vector']
-        vec_b = generations[i+1]['vector']
-        # Distance cosinus : 0 = identique, 1 = orthogonal
-        dist = cosine(vec_a, vec_b)
-        distances.append(dist)
-    return distances
\ No newline at end of file
+    # Distance cosinus : 0 = identique, 1 = orthogonal
+    return drift_curve([g['vector'] for g in generations]).tolist()
+
+
+def drift_table(corpus, embedder=None):
+    """
+    Dérive d'une itération à la suivante pour chaque run d'un TfidfCorpus
+
+    L'IDF est celui du corpus entier ; la projection s'applique directement
+    à corpus.tfidf(), puis les distances sont calculées en un seul passage
+    vectorisé sur les lignes triées par run et itération.
+    """
+    from tfidf_corpus import consecutive_drift
+
+    embedder = (embedder or LocalEmbedder()).fit_corpus(corpus)
+    return consecutive_drift(corpus, embedder.project(corpus.tfidf()))
+
+
+def main():
+    from results_index import load_index
+    from tfidf_corpus import CORPUS_DIR, sync_corpus
+
+    parser = argparse.ArgumentParser(description="Dérive sémantique (embeddings locaux)")
+    parser.add_argument('--dim', type=int, default=EMBED_DIM)
+    parser.add_argument('--corpus', default=str(CORPUS_DIR), help="Répertoire du TfidfCorpus")
+    parser.add_argument('--bucket', type=int, default=10, help="Largeur des tranches d'itérations")
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    corpus, _ = sync_corpus(load_index(), args.corpus)
+    table = drift_table(corpus, LocalEmbedder(dim=args.dim))
+    if table.empty:
+        print("Aucun texte à analyser.")
+        return
+
+    table['bucket'] = table['iteration'] // args.bucket * args.bucket
+    summary = table.groupby(['model', 'condition', 'bucket'])['semantic_drift'].mean().unstack('bucket')
+    print(summary.to_string(float_format=lambda v: f"{v:.3f}"))
+    if args.out:
+        table.drop(columns='bucket').to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} distances enregistrées dans {args.out}")
+
+
+if __name__ == '__main__':
+    main()
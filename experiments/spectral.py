@@ -0,0 +1,263 @@
+"""
+Spectral - batched FFT autocorrelation and periodograms of trajectories
+
+MATHEMATICAL_MODEL.md §7.3 proposes autocorrelation analysis of metric
+trajectories; reasoning models also show alternating long/short responses
+in their length trajectories. Everything here works on (..., T) stacks of
+trajectories, typically np.moveaxis(tensor.values, 2, -1), with NaN for
+missing iterations:
+
+    autocorrelation()   masked ACF via FFT (missing points contribute no pairs)
+    periodogram()       power spectrum of the demeaned series
+    oscillation()       dominant period + Fisher's g test for a spectral peak,
+                        on the detrended and prewhitened series
+    decorrelation()     first lag below 1/e and integrated autocorrelation time
+
+Usage:
+    python experiments/spectral.py --metrics char_length shannon_entropy --out results/spectral.csv
+"""
+
+import argparse
+import warnings
+
+import numpy as np
+
+MIN_POINTS = 8
+
+
+def _next_pow2(n):
+    return 1 << (int(n) - 1).bit_length()
+
+
+def _demeaned(y):
+    y = np.asarray(y, dtype=float)
+    mask = ~np.isnan(y)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(y, axis=-1, keepdims=True)
+    return np.where(mask, y - mean, 0.0), mask
+
+
+def _detrended(y):
+    """Residuals of a per-trajectory least-squares line (missing points zero-filled)"""
+    x, mask = _demeaned(y)
+    t = np.where(mask, np.arange(x.shape[-1], dtype=float), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        dt = np.where(mask, t - np.nanmean(t, axis=-1, keepdims=True), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (dt * x).sum(axis=-1, keepdims=True) / (dt ** 2).sum(axis=-1, keepdims=True)
+    return np.where(mask, x - np.nan_to_num(slope) * dt, 0.0), mask
+
+
+def autocorrelation(y, max_lag=None):
+    """
+    Autocorrelation along the last axis for every trajectory at once
+
+    Missing points are zero-filled after demeaning, and each lag is
+    normalized by the number of observed pairs at that lag, so gaps do not
+    bias the estimate towards zero.
+
+    Args:
+        y: (..., T) trajectories, NaN = missing
+        max_lag: Largest lag returned (default T // 2)
+
+    Returns:
+        (..., max_lag + 1) array, acf[..., 0] == 1 where defined
+    """
+    x, mask = _demeaned(y)
+    n_steps = x.shape[-1]
+    max_lag = n_steps // 2 if max_lag is None else min(max_lag, n_steps - 1)
+    size = _next_pow2(2 * n_steps)
+
+    fx = np.fft.rfft(x, n=size, axis=-1)
+    fm = np.fft.rfft(mask.astype(float), n=size, axis=-1)
+    cov = np.fft.irfft(fx * np.conj(fx), n=size, axis=-1)[..., :max_lag + 1]
+    pairs = np.rint(np.fft.irfft(fm * np.conj(fm), n=size, axis=-1)[..., :max_lag + 1])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = np.where(pairs > 0, cov / pairs, np.nan)
+        acf = cov / cov[..., :1]
+    return acf
+
+
+def _prewhitened(y):
+    """
+    Detrended series with red noise removed: e_t = x_t - φ x_t-1
+
+    φ is the lag-1 regression coefficient of the detrended series, clipped
+    to [0, 1] so anti-persistent (alternating) series pass through
+    unchanged. A random walk (φ ≈ 1) is differenced, white noise (φ ≈ 0)
+    is left as is. Returns (..., T - 1), NaN where either point is missing.
+    """
+    x, mask = _detrended(y)
+    both = mask[..., 1:] & mask[..., :-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        phi = (x[..., 1:] * x[..., :-1] * both).sum(axis=-1, keepdims=True) \
+            / (x[..., :-1] ** 2 * both).sum(axis=-1, keepdims=True)
+    phi = np.clip(np.nan_to_num(phi), 0.0, 1.0)
+    return np.where(both, x[..., 1:] - phi * x[..., :-1], np.nan)
+
+
+def periodogram(y):
+    """
+    Periodogram of the demeaned trajectories (missing points zero-filled)
+
+    Returns:
+        freqs (T // 2 + 1,) in cycles per iteration, power (..., T // 2 + 1)
+    """
+    x, mask = _demeaned(y)
+    n_steps = x.shape[-1]
+    n_obs = np.maximum(mask.sum(axis=-1, keepdims=True), 1)
+    power = np.abs(np.fft.rfft(x, axis=-1)) ** 2 / n_obs
+    return np.fft.rfftfreq(n_steps), power
+
+
+def oscillation(y, alpha=0.01):
+    """
+    Dominant periodic component of every trajectory
+
+    Fisher's g statistic (largest periodogram ordinate over the total)
+    tests for a single significant spectral peak against a white-noise
+    null. Trends, random walks and other persistent series concentrate
+    their power in the lowest Fourier frequencies and would otherwise be
+    reported as oscillating with period ~T, so the test runs on the
+    detrended, AR(1)-prewhitened series (_prewhitened), trimmed to an odd
+    length so there is no Nyquist ordinate, and only periods shorter than
+    T/2 are considered. Alternating long/short responses
+    appear as a peak at period 2 together with a negative lag-1
+    autocorrelation.
+
+    Returns:
+        dict of (...)-shaped arrays: period, g, p, oscillating, alternating
+    """
+    residual = _prewhitened(y)
+    # Fisher's null assumes an odd length: with an even one the Nyquist
+    # ordinate has a different distribution. Dropping the oldest step
+    # removes it while a period-2 peak stays next to Nyquist.
+    residual = residual[..., 1 - residual.shape[-1] % 2:]
+    freqs, power = periodogram(residual)
+    keep = freqs > 2.0 / residual.shape[-1]
+    if not keep.any():
+        nan = np.full(residual.shape[:-1], np.nan)
+        none = np.zeros(residual.shape[:-1], dtype=bool)
+        return {'period': nan, 'g': nan, 'p': nan, 'oscillating': none, 'alternating': none}
+    spectrum = power[..., keep]
+    m = spectrum.shape[-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        peak = np.argmax(spectrum, axis=-1)
+        g = np.take_along_axis(spectrum, peak[..., None], axis=-1)[..., 0] / spectrum.sum(axis=-1)
+        # First term of Fisher's exact null distribution (accurate for small p)
+        p = np.minimum(1.0, m * (1.0 - g) ** (m - 1))
+        period = 1.0 / freqs[keep][peak]
+
+    enough = (~np.isnan(np.asarray(y, dtype=float))).sum(axis=-1) >= MIN_POINTS
+    p = np.where(enough & np.isfinite(g), p, np.nan)
+    oscillating = p < alpha
+    lag1 = autocorrelation(y, max_lag=1)[..., 1]
+    alternating = oscillating & (period <= 2.5) & (lag1 < 0)
+    return {'period': np.where(enough, period, np.nan), 'g': g, 'p': p,
+            'oscillating': oscillating, 'alternating': alternating}
+
+
+def decorrelation(acf, threshold=np.exp(-1)):
+    """
+    Decorrelation times from an ACF stack (..., L)
+
+    Returns:
+        dict of (...)-shaped arrays:
+            lag_1e   first lag where acf < threshold (NaN if never within L)
+            tau_int  1 + 2 Σ acf[k] summed until the first non-positive lag
+            lag1     lag-1 autocorrelation
+    """
+    below = acf[..., 1:] < threshold
+    lag_1e = np.where(below.any(axis=-1), np.argmax(below, axis=-1) + 1.0, np.nan)
+
+    positive = np.logical_and.accumulate(np.nan_to_num(acf[..., 1:], nan=-1.0) > 0, axis=-1)
+    tau_int = 1.0 + 2.0 * np.where(positive, acf[..., 1:], 0.0).sum(axis=-1)
+    defined = np.isfinite(acf[..., 0])
+    return {'lag_1e': np.where(defined, lag_1e, np.nan),
+            'tau_int': np.where(defined, tau_int, np.nan),
+            'lag1': acf[..., 1] if acf.shape[-1] > 1 else np.full(acf.shape[:-1], np.nan)}
+
+
+def rolling_autocorrelation(y, width=20, lag=1):
+    """
+    Lag-`lag` autocorrelation in sliding windows (§7.3: does it drop at t*?)
+
+    Returns:
+        (..., T - width + 1) array; entry k covers iterations [k, k + width)
+    """
+    y = np.asarray(y, dtype=float)
+    windows = np.lib.stride_tricks.sliding_window_view(y, width, axis=-1)
+    return autocorrelation(windows, max_lag=lag)[..., lag]
+
+
+def spectral_table(tensor, max_lag=None, alpha=0.01):
+    """
+    Per-trajectory decorrelation and oscillation features
+
+    Returns:
+        Tidy DataFrame, one row per (group, seed, metric) with enough points
+    """
+    from trend_fits import _group_frame
+
+    y = np.moveaxis(tensor.values, 2, -1)
+    acf = autocorrelation(y, max_lag=max_lag)
+    decor = decorrelation(acf)
+    osc = oscillation(y, alpha=alpha)
+    n_points = (~np.isnan(y)).sum(axis=-1)
+
+    n_groups, n_seeds, n_metrics = n_points.shape
+    g, s, m = np.meshgrid(np.arange(n_groups), np.arange(n_seeds), np.arange(n_metrics),
+                          indexing='ij')
+    table = _group_frame(tensor, g.ravel(), s.ravel())
+    table['metric'] = np.array(tensor.metrics)[m.ravel()]
+    table['n'] = n_points.ravel()
+    for key in ('lag1', 'lag_1e', 'tau_int'):
+        table[key] = decor[key].ravel()
+    for key in ('period', 'g', 'p', 'oscillating', 'alternating'):
+        table[key] = osc[key].ravel()
+    return table[table['n'] >= MIN_POINTS].reset_index(drop=True)
+
+
+def summarize(table, group_by):
+    """Decorrelation times and oscillation rates per (group, metric)"""
+    return table.groupby(list(group_by) + ['metric']).agg(
+        n_seeds=('seed', 'size'),
+        lag1_median=('lag1', 'median'),
+        lag_1e_median=('lag_1e', 'median'),
+        tau_int_median=('tau_int', 'median'),
+        oscillating=('oscillating', 'mean'),
+        alternating=('alternating', 'mean'),
+    ).reset_index()
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Batched autocorrelation / spectral analysis")
+    parser.add_argument('--group-by', nargs='+', default=['model', 'condition'])
+    parser.add_argument('--metrics', nargs='+',
+                        default=['char_length', 'lz_complexity', 'shannon_entropy',
+                                 'trigram_diversity', 'unique_words_ratio'])
+    parser.add_argument('--max-lag', type=int, default=None)
+    parser.add_argument('--alpha', type=float, default=0.01)
+    parser.add_argument('--out', default=None, help="CSV of per-trajectory features")
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=args.group_by)
+    table = spectral_table(tensor, max_lag=args.max_lag, alpha=args.alpha)
+    summary = summarize(table, tensor.group_by)
+
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.3g}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} trajectories saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""
+Steady State - one-pass moments, burn-in detection and variance asymmetry
+
+MATHEMATICAL_MODEL.md §6 defines the variance ratio
+
+    VR(M) = Var(M | closed-loop) / Var(M | exogenous)
+
+over the steady-state part of each trajectory. This module provides the
+reduction behind it:
+
+    RunningMoments   count / mean / M2 arrays with Welford updates (one
+                     observation per cell) and Chan merges (batches, seeds,
+                     groups), so offline and streaming results agree
+    mser_burn_in     MSER truncation point from prefix sums of the centered
+                     series (offline over the tensor, or on demand online)
+    steady_state     per-seed and pooled steady moments for every
+                     (group, metric) of a ResultsTensor
+    SteadyStateTracker  the same statistics maintained record by record
+
+Usage:
+    python experiments/steady_state.py --burn-in mser
+"""
+
+import argparse
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from chain_journal import chain_key
+
+BURN_IN = 10
+
+
+class RunningMoments:
+    """Numerically stable count / mean / second central moment per cell"""
+
+    def __init__(self, shape=()):
+        self.n = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    @classmethod
+    def from_values(cls, values, axis=-1):
+        """Moments along `axis` of an array with NaN for missing values"""
+        values = np.asarray(values, dtype=float)
+        mask = ~np.isnan(values)
+        out = cls(np.delete(values.shape, axis % values.ndim))
+        out.n = mask.sum(axis=axis).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(mask, values, 0.0).sum(axis=axis) / out.n
+        out.mean = np.where(out.n > 0, mean, 0.0)
+        dev = np.where(mask, values - np.expand_dims(out.mean, axis), 0.0)
+        out.m2 = (dev * dev).sum(axis=axis)
+        return out
+
+    def update(self, x):
+        """Welford update with one observation per cell (NaN = skip)"""
+        x = np.asarray(x, dtype=float)
+        ok = ~np.isnan(x)
+        self.n = self.n + ok
+        delta = np.where(ok, x - self.mean, 0.0)
+        self.mean = self.mean + np.where(ok, delta / np.maximum(self.n, 1), 0.0)
+        self.m2 = self.m2 + np.where(ok, delta * (x - self.mean), 0.0)
+        return self
+
+    def merge(self, other):
+        """Chan et al. pairwise combination with another accumulator"""
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, self.mean + delta * other.n / n, 0.0)
+            m2 = self.m2 + other.m2 + np.where(n > 0, delta ** 2 * self.n * other.n / n, 0.0)
+        out = RunningMoments(np.shape(n))
+        out.n, out.mean, out.m2 = n, mean, m2
+        return out
+
+    def reduce(self, axis):
+        """Merge all cells along `axis` (e.g. pool seeds into groups)"""
+        n = self.n.sum(axis=axis)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, (self.n * self.mean).sum(axis=axis) / n, 0.0)
+        dev = self.mean - np.expand_dims(mean, axis)
+        out = RunningMoments(np.shape(n))
+        out.n, out.mean = n, mean
+        out.m2 = self.m2.sum(axis=axis) + (self.n * dev ** 2).sum(axis=axis)
+        return out
+
+    def var(self, ddof=0):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.n > ddof, self.m2 / (self.n - ddof), np.nan)
+
+    def std(self, ddof=0):
+        return np.sqrt(self.var(ddof))
+
+
+# ----------------------------------------------------------------------
+# Burn-in
+# ----------------------------------------------------------------------
+
+def _mser_from_prefix(pn, ps1, ps2):
+    """
+    MSER truncation index from (..., T+1) prefix count / sum / sum of squares
+
+    Minimizes SS(x[d:]) / n(d)², keeping at least half of the observations.
+    """
+    n = pn[..., -1:] - pn
+    s1 = ps1[..., -1:] - ps1
+    s2 = ps2[..., -1:] - ps2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stat = (s2 - s1 * s1 / n) / (n * n)
+    valid = (n >= np.maximum(pn[..., -1:] / 2, 2)) & np.isfinite(stat)
+    stat = np.where(valid, stat, np.inf)
+    return np.where(valid.any(axis=-1), np.argmin(stat, axis=-1), 0)
+
+
+def mser_burn_in(values):
+    """
+    MSER burn-in position for every trajectory along the last axis
+
+    Returns:
+        (...) int array: index of the first steady-state position
+    """
+    values = np.asarray(values, dtype=float)
+    mask = ~np.isnan(values)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        center = np.nan_to_num(np.nanmean(values, axis=-1, keepdims=True))
+    x = np.where(mask, values - center, 0.0)
+    pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    pn = np.pad(np.cumsum(mask, axis=-1), pad).astype(float)
+    ps1 = np.pad(np.cumsum(x, axis=-1), pad)
+    ps2 = np.pad(np.cumsum(x * x, axis=-1), pad)
+    return _mser_from_prefix(pn, ps1, ps2)
+
+
+# ----------------------------------------------------------------------
+# Offline reduction over the tensor
+# ----------------------------------------------------------------------
+
+def steady_state(tensor, burn_in=BURN_IN):
+    """
+    Steady-state moments per (group, seed, metric) and pooled per (group, metric)
+
+    Args:
+        burn_in: Leading iterations to drop (int), or 'mser' to detect the
+                 truncation point per trajectory
+
+    Returns:
+        dict: burn_in (group, seed, metric) first steady iteration,
+        per_seed and pooled RunningMoments
+    """
+    y = np.moveaxis(tensor.values, 2, -1)
+    positions = np.arange(y.shape[-1])
+    if burn_in == 'mser':
+        start = mser_burn_in(y)
+    else:
+        start = np.full(y.shape[:-1], np.searchsorted(tensor.iterations,
+                                                      tensor.iterations[0] + burn_in))
+    steady = np.where(positions >= start[..., None], y, np.nan)
+    per_seed = RunningMoments.from_values(steady, axis=-1)
+    pooled = per_seed.reduce(axis=1)
+    first = np.asarray(tensor.iterations)[np.minimum(start, len(positions) - 1)]
+    return {'burn_in': np.where(per_seed.n > 0, first, -1), 'per_seed': per_seed,
+            'pooled': pooled}
+
+
+def steady_table(tensor, result):
+    """Tidy pooled steady-state statistics per (group, metric)"""
+    from trend_fits import _group_frame
+
+    pooled, per_seed = result['pooled'], result['per_seed']
+    n_groups, n_metrics = pooled.n.shape
+    g, m = np.meshgrid(np.arange(n_groups), np.arange(n_metrics), indexing='ij')
+    table = _group_frame(tensor, g.ravel())
+    table['metric'] = np.array(tensor.metrics)[m.ravel()]
+    table['n'] = pooled.n.ravel()
+    table['mean'] = pooled.mean.ravel()
+    table['var'] = pooled.var(ddof=1).ravel()
+    burn = np.where(result['burn_in'] >= 0, result['burn_in'], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        table['within_seed_var'] = np.nanmean(per_seed.var(ddof=1), axis=1).ravel()
+        table['burn_in_median'] = np.nanmedian(burn, axis=1).ravel()
+    return table[table['n'] > 1].reset_index(drop=True)
+
+
+def variance_asymmetry(tensor, result, group_a='closed_loop', group_b='exogenous'):
+    """
+    VR = Var(group_a) / Var(group_b) per stratum and metric
+
+    The tensor's last group_by column must be the condition. Both the
+    pooled steady-state variance and the mean within-seed variance are
+    compared.
+    """
+    pooled, per_seed = result['pooled'], result['per_seed']
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        within = np.nanmean(per_seed.var(ddof=1), axis=1)
+    rows = []
+    for label in tensor.groups:
+        parts = label.split("|")
+        if parts[-1] != group_a:
+            continue
+        other = "|".join(parts[:-1] + [group_b])
+        if other not in tensor.groups:
+            continue
+        a, b = tensor.groups.index(label), tensor.groups.index(other)
+        for m, metric in enumerate(tensor.metrics):
+            if pooled.n[a, m] < 2 or pooled.n[b, m] < 2:
+                continue
+            row = dict(zip(tensor.group_by[:-1], parts[:-1]))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                row.update({'metric': metric,
+                            'var_a': pooled.var(ddof=1)[a, m], 'var_b': pooled.var(ddof=1)[b, m],
+                            'vr_pooled': pooled.var(ddof=1)[a, m] / pooled.var(ddof=1)[b, m],
+                            'vr_within_seed': within[a, m] / within[b, m],
+                            'n_a': pooled.n[a, m], 'n_b': pooled.n[b, m]})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# ----------------------------------------------------------------------
+# Online
+# ----------------------------------------------------------------------
+
+class SteadyStateTracker:
+    """
+    Streaming steady-state statistics per chain
+
+    update() takes result records (e.g. run_chain(on_step=tracker.update)).
+    Moments after a fixed burn-in are kept with Welford updates; prefix sums
+    of the shifted series are kept so the MSER burn-in can be recomputed on
+    demand in O(n) without storing derived state per candidate cut.
+    """
+
+    def __init__(self, metrics, burn_in=BURN_IN):
+        self.metrics = list(metrics)
+        self.burn_in = burn_in
+        self.moments = {}
+        self.prefix = {}
+        self._lock = threading.Lock()
+
+    def update(self, record):
+        key = chain_key(record)
+        x = np.array([record.get(m, np.nan) for m in self.metrics], dtype=float)
+        ok = ~np.isnan(x)
+        with self._lock:
+            if key not in self.prefix:
+                self.moments[key] = RunningMoments(len(self.metrics))
+                self.prefix[key] = {'shift': np.nan_to_num(x), 'n': [np.zeros(len(x))],
+                                    's1': [np.zeros(len(x))], 's2': [np.zeros(len(x))]}
+            prefix = self.prefix[key]
+            d = np.where(ok, x - prefix['shift'], 0.0)
+            prefix['n'].append(prefix['n'][-1] + ok)
+            prefix['s1'].append(prefix['s1'][-1] + d)
+            prefix['s2'].append(prefix['s2'][-1] + d * d)
+            if len(prefix['n']) - 1 > self.burn_in:
+                self.moments[key].update(x)
+
+    def burn_in_mser(self, key):
+        """Current MSER burn-in position per metric for one chain"""
+        with self._lock:
+            sums = [np.array(self.prefix[key][k]).T for k in ('n', 's1', 's2')]
+        return _mser_from_prefix(*sums)
+
+    def pooled(self, keys=None):
+        """Steady moments merged over chains (default: all chains)"""
+        out = RunningMoments(len(self.metrics))
+        with self._lock:
+            keys = list(self.moments) if keys is None else keys
+            for key in keys:
+                out = out.merge(self.moments[key])
+        return out
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Steady-state statistics and variance asymmetry")
+    parser.add_argument('--group-by', nargs='+', default=['model', 'condition'])
+    parser.add_argument('--metrics', nargs='+',
+                        default=['char_length', 'lz_complexity', 'shannon_entropy',
+                                 'trigram_diversity', 'unique_words_ratio'])
+    parser.add_argument('--burn-in', default=str(BURN_IN), help="Iterations, or 'mser'")
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=args.group_by)
+    burn_in = args.burn_in if args.burn_in == 'mser' else int(args.burn_in)
+    result = steady_state(tensor, burn_in)
+    table = steady_table(tensor, result)
+    fmt = lambda v: f"{v:.5g}"
+
+    print(table.to_string(index=False, float_format=fmt))
+    asym = variance_asymmetry(tensor, result)
+    if not asym.empty:
+        print("\nVariance asymmetry (closed_loop / exogenous)")
+        print(asym.to_string(index=False, float_format=fmt))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ Saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
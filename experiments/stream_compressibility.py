@@ -0,0 +1,200 @@
+"""
+Stream Compressibility - conditional compressibility of each output given history
+
+lempel_ziv_complexity() scores every response in isolation, so a chain that
+keeps repeating its earlier outputs looks as complex as one that does not.
+Here each chain owns persistent compressor contexts; every new output is
+fed into them and the stream is sync-flushed, so the bytes emitted for that
+iteration are its marginal compressed size given everything before it:
+
+    marginal_bytes(t)     = |C(x_0 .. x_t)| - |C(x_0 .. x_t-1)|   (streamed)
+    conditional_ratio(t)  = marginal_bytes(t) / raw_bytes(t)
+
+Each step costs O(new bytes). A falling conditional ratio means the chain
+increasingly re-uses its own history (Prediction 2).
+
+Backends: zlib (always; 32 KB window, so history beyond roughly the last
+32 KB is not seen) and zstd when the `zstandard` package is installed
+(configurable long window). lzma and bz2 cannot flush without ending the
+stream, so they cannot give per-step marginals in O(new bytes).
+
+Usage:
+    python experiments/stream_compressibility.py                      # results files
+    python experiments/stream_compressibility.py --journal results/journal
+"""
+
+import argparse
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from chain_journal import chain_key
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+ZSTD_WINDOW_LOG = 24
+SEPARATOR = b"\n"
+
+
+def available_backends():
+    return ['zlib'] + (['zstd'] if zstandard is not None else [])
+
+
+class StreamCompressor:
+    """One persistent compression context; feed() returns marginal bytes"""
+
+    def __init__(self, backend='zlib', level=None):
+        self.backend = backend
+        if backend == 'zlib':
+            self._ctx = zlib.compressobj(ZLIB_LEVEL if level is None else level)
+            self._mode = zlib.Z_SYNC_FLUSH
+        elif backend == 'zstd':
+            if zstandard is None:
+                raise ImportError("zstd backend needs the 'zstandard' package")
+            params = zstandard.ZstdCompressionParameters.from_level(
+                ZSTD_LEVEL if level is None else level, window_log=ZSTD_WINDOW_LOG)
+            self._ctx = zstandard.ZstdCompressor(compression_params=params).compressobj()
+            self._mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            raise ValueError(f"Backend {backend} has no sync flush; use zlib or zstd")
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def feed(self, data):
+        out = len(self._ctx.compress(data)) + len(self._ctx.flush(self._mode))
+        self.raw_bytes += len(data)
+        self.compressed_bytes += out
+        return out
+
+
+class CompressibilityTracker:
+    """
+    Per-chain compressor contexts for live use in the runner
+
+    Pass bind(chain_id, journal) as run_chain's metrics_fn so the marginal
+    sizes are stored with each journaled step; a resumed chain is first
+    replayed from its journal history so the context matches the stream.
+    """
+
+    def __init__(self, backends=None):
+        self.backends = list(backends or available_backends())
+        self.streams = {}
+
+    def update(self, chain_key, text):
+        """Feed one output; returns the per-step compressibility fields"""
+        if chain_key not in self.streams:
+            self.streams[chain_key] = {b: StreamCompressor(b) for b in self.backends}
+        data = text.encode('utf-8') + SEPARATOR
+        fields = {'raw_bytes': len(data)}
+        for backend, stream in self.streams[chain_key].items():
+            marginal = stream.feed(data)
+            fields[f"{backend}_marginal_bytes"] = marginal
+            fields[f"{backend}_conditional_ratio"] = marginal / len(data)
+        return fields
+
+    def bind(self, chain_id, journal=None):
+        """metrics_fn for run_chain: text -> fields, for one chain"""
+        if journal is not None and chain_id not in self.streams and journal.exists(chain_id):
+            for record in journal.history(chain_id):
+                self.update(chain_id, record['text'])
+        return lambda text: self.update(chain_id, text)
+
+    def on_step(self, record):
+        """on_step callback variant keyed by chain_key (fields are returned, not journaled)"""
+        return self.update(chain_key(record), record['text'])
+
+
+def score_runs(runs, backends=None):
+    """
+    Marginal compressibility for ordered text sequences
+
+    Args:
+        runs: dict run_key -> list of texts in iteration order
+
+    Returns:
+        dict run_key -> list of per-step field dicts
+    """
+    tracker = CompressibilityTracker(backends)
+    return {key: [tracker.update(key, t) for t in texts] for key, texts in runs.items()}
+
+
+def journal_compressibility(journal, chain_ids=None, backends=None):
+    """Tidy per-step table for journaled chains (fork prefixes included)"""
+    rows = []
+    for chain_id in chain_ids or journal.chains():
+        history = journal.history(chain_id)
+        scored = score_runs({chain_id: [r['text'] for r in history]}, backends)[chain_id]
+        for record, fields in zip(history, scored):
+            rows.append({'chain_id': chain_id, 'condition': record.get('condition'),
+                         'iteration': record['iteration'], **fields})
+    return pd.DataFrame(rows)
+
+
+def index_compressibility(index, backends=None):
+    """
+    Add per-step stream compressibility columns to a ResultsIndex
+
+    Runs are identified by (file, model, condition, category, seed) and
+    streamed in iteration order; rows without text get NaN.
+    """
+    keys = [index[c].astype(str) for c in ('file', 'model', 'condition', 'category')]
+    order = np.lexsort((index['iteration'], index['seed'], *reversed(keys)))
+    run_ids = np.array(["|".join(k) for k in zip(*keys, index['seed'].astype(str))], dtype=object)
+
+    runs = {}
+    for i in order:
+        if index.texts[i]:
+            runs.setdefault(run_ids[i], []).append(i)
+    scored = score_runs({k: [index.texts[i] for i in rows] for k, rows in runs.items()}, backends)
+
+    columns = {}
+    for key, rows in runs.items():
+        for i, fields in zip(rows, scored[key]):
+            for name, value in fields.items():
+                columns.setdefault(name, np.full(len(index), np.nan))[i] = value
+    for name, values in columns.items():
+        index.add_column(f"stream_{name}" if name == 'raw_bytes' else name, values)
+    return index
+
+
+def main():
+    from chain_journal import ChainJournal
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="Conditional (streamed) compressibility per iteration")
+    parser.add_argument('--journal', default=None, help="Score a chain journal instead of results files")
+    parser.add_argument('--backends', nargs='+', default=None, choices=['zlib', 'zstd'])
+    parser.add_argument('--bucket', type=int, default=10, help="Iteration bucket for the summary")
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+
+    if args.journal:
+        table = journal_compressibility(ChainJournal(args.journal), backends=args.backends)
+        keys = ['condition']
+    else:
+        index = index_compressibility(load_index(), args.backends)
+        table = pd.DataFrame({c: index[c] for c in index.columns
+                              if c in ('model', 'condition', 'iteration')
+                              or c.endswith(('_marginal_bytes', '_conditional_ratio'))})
+        keys = ['model', 'condition']
+    if table.empty:
+        print("Nothing to score.")
+        return
+
+    ratio_cols = [c for c in table.columns if c.endswith('_conditional_ratio')]
+    table['bucket'] = table['iteration'] // args.bucket * args.bucket
+    summary = table.groupby(keys + ['bucket'])[ratio_cols].mean().unstack('bucket')
+    print(summary.to_string(float_format=lambda v: f"{v:.3f}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} steps saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""
+Survival - time-to-gel / time-to-explosion across seeds and models
+
+Each run (group, seed) contributes one duration:
+
+    event observed   iteration of the first gel (or explosion) flag
+    censored         last observed iteration when no event occurred; runs
+                     cut short by an API error (the `break` in the
+                     experiment loops) are censored where they stopped
+
+Flags come from the stored flag_gel / flag_explosion columns when a file
+has them (gemini_3_dual_validation) and are otherwise derived from the
+length trajectory with the same rules experiment_gemini_dual uses:
+
+    gel        std of the last GEL_WINDOW lengths < GEL_TOL chars, from
+               iteration GEL_FROM on (derived from the runner's history
+               threshold GEL_MIN_HISTORY)
+    explosion  length > EXPLOSION_FACTOR × the first observed length
+
+Kaplan-Meier curves, discrete hazards and (stratified) log-rank tests are
+computed for every group and grid cell at once from (…, group, time)
+arrays of events and numbers at risk.
+
+Usage:
+    python experiments/survival.py --event gel --strata category condition --compare model
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+EVENTS = ('gel', 'explosion')
+GEL_WINDOW = 5
+GEL_TOL = 5.0
+GEL_MIN_HISTORY = 10  # experiment_gemini_dual: len(history_len) > GEL_MIN_HISTORY
+# history_len starts with the seed prompt's length, so iteration i has i + 2
+# entries and the first iteration that can gel is GEL_MIN_HISTORY - 1
+GEL_FROM = GEL_MIN_HISTORY - 1
+EXPLOSION_FACTOR = 10.0
+
+
+# ----------------------------------------------------------------------
+# Events
+# ----------------------------------------------------------------------
+
+def derived_flags(lengths, event='gel'):
+    """
+    Per-iteration event flags from (..., T) length trajectories
+
+    Returns:
+        (..., T) float array: 1.0 / 0.0, NaN where the length is missing
+    """
+    lengths = np.asarray(lengths, dtype=float)
+    missing = np.isnan(lengths)
+    if event == 'gel':
+        pad = [(0, 0)] * (lengths.ndim - 1) + [(GEL_WINDOW - 1, 0)]
+        windows = np.lib.stride_tricks.sliding_window_view(
+            np.pad(lengths, pad, constant_values=np.nan), GEL_WINDOW, axis=-1)
+        with np.errstate(invalid='ignore'):
+            flag = windows.std(axis=-1) < GEL_TOL
+        flag &= np.arange(lengths.shape[-1]) >= GEL_FROM
+    elif event == 'explosion':
+        first = np.take_along_axis(lengths, np.argmax(~missing, axis=-1)[..., None], axis=-1)
+        with np.errstate(invalid='ignore'):
+            flag = lengths > EXPLOSION_FACTOR * first
+    else:
+        raise ValueError(f"Unknown event: {event}")
+    return np.where(missing, np.nan, flag.astype(float))
+
+
+def event_times(tensor, event='gel', length_metric='char_length'):
+    """
+    Duration and event indicator for every (group, seed) run
+
+    Returns:
+        dict of (group, seed) arrays: duration (iteration), observed (bool),
+        present (run has any data), truncated (stopped before the last
+        iteration seen in its group)
+    """
+    lengths = tensor.metric(length_metric)
+    flags = derived_flags(lengths, event)
+    stored = f"flag_{event}"
+    if stored in tensor.metrics:
+        recorded = tensor.metric(stored)
+        has_record = (~np.isnan(recorded)).any(axis=-1, keepdims=True)
+        flags = np.where(has_record, recorded, flags)
+
+    iterations = np.asarray(tensor.iterations)
+    observed_mask = ~np.isnan(lengths)
+    present = observed_mask.any(axis=-1)
+    hit = np.nan_to_num(flags) > 0
+    observed = hit.any(axis=-1)
+    first_hit = np.argmax(hit, axis=-1)
+    last_seen = observed_mask.shape[-1] - 1 - np.argmax(observed_mask[..., ::-1], axis=-1)
+    duration = np.where(observed, iterations[first_hit], iterations[last_seen])
+
+    group_last = np.where(present, last_seen, -1).max(axis=1, keepdims=True)
+    truncated = present & ~observed & (last_seen < group_last)
+    return {'duration': duration, 'observed': observed & present, 'present': present,
+            'truncated': truncated}
+
+
+# ----------------------------------------------------------------------
+# Estimators
+# ----------------------------------------------------------------------
+
+def risk_table(duration, observed, present, times):
+    """
+    Events and numbers at risk on a time grid
+
+    Args:
+        duration, observed, present: (..., n) arrays over runs
+        times: (T,) sorted time grid containing every duration
+
+    Returns:
+        events (..., T), censored (..., T), at_risk (..., T)
+    """
+    pos = np.searchsorted(times, duration)
+    grid = np.arange(len(times))
+    at_t = (pos[..., None] == grid) & present[..., None]
+    events = (at_t & observed[..., None]).sum(axis=-2)
+    censored = (at_t & ~observed[..., None]).sum(axis=-2)
+    at_risk = np.flip(np.cumsum(np.flip(events + censored, -1), axis=-1), -1)
+    return events, censored, at_risk
+
+
+def kaplan_meier(events, at_risk):
+    """
+    Kaplan-Meier survival with Greenwood standard errors
+
+    Returns:
+        dict of (..., T) arrays: hazard, survival, se
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hazard = np.where(at_risk > 0, events / at_risk, 0.0)
+        survival = np.cumprod(1.0 - hazard, axis=-1)
+        green = np.where((at_risk > events) & (at_risk > 0),
+                         events / (at_risk * (at_risk - events)), 0.0)
+        se = survival * np.sqrt(np.cumsum(green, axis=-1))
+    return {'hazard': hazard, 'survival': survival, 'se': se}
+
+
+def median_survival(survival, times):
+    """First time at which survival drops to 0.5 or below (NaN if never)"""
+    below = survival <= 0.5
+    return np.where(below.any(axis=-1), np.asarray(times, dtype=float)[np.argmax(below, axis=-1)],
+                    np.nan)
+
+
+def logrank(events, at_risk, stratified_axis=None):
+    """
+    k-sample log-rank test, batched over leading axes
+
+    Args:
+        events, at_risk: (..., k, T) arrays for k compared groups
+        stratified_axis: If given, sum O - E and V over this leading axis
+                         (stratified test) before forming the statistic
+
+    Returns:
+        dict: chi2, df, p (leading shape), observed and expected (..., k)
+    """
+    events = np.asarray(events, dtype=float)
+    at_risk = np.asarray(at_risk, dtype=float)
+    d = events.sum(axis=-2, keepdims=True)
+    n = at_risk.sum(axis=-2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(n > 0, at_risk / n, 0.0)
+        expected = d * share
+        factor = np.where(n > 1, d * (n - d) / (n - 1), 0.0)
+    o_minus_e = (events - expected).sum(axis=-1)
+
+    # V_ij = Σ_t factor · (δ_ij s_i - s_i s_j)
+    v = np.einsum('...it,...t->...i', share, factor[..., 0, :])
+    cov = -np.einsum('...it,...jt,...t->...ij', share, share, factor[..., 0, :])
+    k = events.shape[-2]
+    cov[..., np.arange(k), np.arange(k)] += v
+
+    if stratified_axis is not None:
+        o_minus_e = o_minus_e.sum(axis=stratified_axis)
+        cov = cov.sum(axis=stratified_axis)
+        observed = events.sum(axis=(stratified_axis, -1))
+        expected_tot = expected.sum(axis=(stratified_axis, -1))
+    else:
+        observed, expected_tot = events.sum(axis=-1), expected.sum(axis=-1)
+
+    # Groups without anyone at risk carry no information
+    active = np.einsum('...ii->...i', cov) > 1e-12
+    u = np.where(active, o_minus_e, 0.0)
+    v_inv = np.linalg.pinv(np.where(active[..., :, None] & active[..., None, :], cov, 0.0))
+    chi2 = np.einsum('...i,...ij,...j->...', u, v_inv, u)
+    df = np.maximum(active.sum(axis=-1) - 1, 0)
+    with np.errstate(invalid='ignore'):
+        p = np.where(df > 0, stats.chi2.sf(chi2, np.maximum(df, 1)), np.nan)
+    return {'chi2': chi2, 'df': df, 'p': p, 'observed': observed, 'expected': expected_tot}
+
+
+# ----------------------------------------------------------------------
+# Tensor-level analysis
+# ----------------------------------------------------------------------
+
+def _cells(tensor, strata, compare):
+    """Index array (cell, compared group) into tensor.groups, -1 if absent"""
+    cols = list(tensor.group_by)
+    parts = [label.split("|") if len(cols) > 1 else [label] for label in tensor.groups]
+    s_idx, c_idx = [cols.index(c) for c in strata], cols.index(compare)
+    keys = ["|".join(p[i] for i in s_idx) or 'all' for p in parts]
+    cells = sorted(set(keys))
+    compared = sorted({p[c_idx] for p in parts})
+    table = np.full((len(cells), len(compared)), -1)
+    for g, p in enumerate(parts):
+        table[cells.index(keys[g]), compared.index(p[c_idx])] = g
+    return cells, compared, table
+
+
+def survival_analysis(tensor, event='gel', strata=('category', 'condition'), compare='model'):
+    """
+    KM curves per group and log-rank tests of `compare` within every
+    `strata` cell (plus the stratified test over all cells)
+
+    The tensor must be grouped by exactly the strata and compare columns.
+
+    Returns:
+        dict: curves (tidy DataFrame), tests (per-cell DataFrame),
+        overall (stratified test dict), runs (per-run DataFrame)
+    """
+    from trend_fits import _group_frame
+
+    ev = event_times(tensor, event)
+    times = np.asarray(tensor.iterations)
+    events, _, at_risk = risk_table(ev['duration'], ev['observed'], ev['present'], times)
+    km = kaplan_meier(events, at_risk)
+
+    n_groups, n_times = events.shape
+    g, t = np.meshgrid(np.arange(n_groups), np.arange(n_times), indexing='ij')
+    curves = _group_frame(tensor, g.ravel())
+    curves['iteration'] = times[t.ravel()]
+    curves['at_risk'] = at_risk.ravel()
+    curves['events'] = events.ravel()
+    for key in ('hazard', 'survival', 'se'):
+        curves[key] = km[key].ravel()
+    curves = curves[curves['at_risk'] > 0].reset_index(drop=True)
+
+    cells, compared, table = _cells(tensor, strata, compare)
+    present = table >= 0
+    present[present] = at_risk[table[present], 0] > 0
+    cell_events = np.where(present[..., None], events[table], 0)
+    cell_risk = np.where(present[..., None], at_risk[table], 0)
+    per_cell = logrank(cell_events, cell_risk)
+    overall = logrank(cell_events, cell_risk, stratified_axis=0)
+
+    # One row per (cell, compared group); the cell's test repeats on each row
+    medians = median_survival(km['survival'], times)
+    c, j = np.nonzero(present)
+    tests = pd.DataFrame({"|".join(strata) or 'stratum': np.array(cells, dtype=object)[c],
+                          compare: np.array(compared, dtype=object)[j],
+                          'n_runs': at_risk[table[c, j], 0],
+                          'events': per_cell['observed'][c, j],
+                          'expected': per_cell['expected'][c, j],
+                          'median': medians[table[c, j]],
+                          'chi2': per_cell['chi2'][c], 'df': per_cell['df'][c],
+                          'p': per_cell['p'][c]})
+
+    n_seeds = len(tensor.seeds)
+    g, s = np.meshgrid(np.arange(n_groups), np.arange(n_seeds), indexing='ij')
+    runs = _group_frame(tensor, g.ravel(), s.ravel())
+    for key in ('duration', 'observed', 'truncated', 'present'):
+        runs[key] = ev[key].ravel()
+    runs = runs[runs['present']].drop(columns='present').reset_index(drop=True)
+
+    return {'curves': curves, 'tests': tests, 'overall': overall, 'runs': runs}
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Kaplan-Meier / log-rank time-to-event analysis")
+    parser.add_argument('--event', choices=EVENTS, default='gel')
+    parser.add_argument('--strata', nargs='*', default=['category', 'condition'],
+                        help="Columns defining grid cells (none for a single cell)")
+    parser.add_argument('--compare', default='model')
+    parser.add_argument('--out', default=None, help="CSV of KM curves")
+    args = parser.parse_args()
+
+    index = load_index()
+    metrics = [m for m in ('char_length', f"flag_{args.event}") if m in index.metric_names]
+    group_by = list(args.strata) + [args.compare]
+    tensor = ResultsTensor.from_index(index, metrics=metrics, group_by=group_by)
+    result = survival_analysis(tensor, args.event, args.strata, args.compare)
+
+    runs = result['runs']
+    print(f"{len(runs)} runs: {int(runs['observed'].sum())} {args.event} events, "
+          f"{int(runs['truncated'].sum())} censored early (run stopped)\n")
+    print(result['tests'].to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    overall = result['overall']
+    print(f"\nStratified log-rank: χ²={overall['chi2']:.3f}, df={overall['df']}, p={overall['p']:.4g}")
+    if args.out:
+        result['curves'].to_csv(args.out, index=False)
+        print(f"\n✓ KM curves saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Text Metrics - complexity metrics shared by the runners
+
+The single definition of the per-output metrics used by the validation
+runners (extended, free tier), the chain-based runners and
+results_index.compute_text_metrics(); importable without instantiating an
+API client.
+"""
+
+from collections import Counter
+
+import numpy as np
+
+METRICS = ['lz_complexity', 'shannon_entropy', 'trigram_diversity', 'unique_words_ratio']
+
+
+def lempel_ziv_complexity(s):
+    """Compute normalized Lempel-Ziv complexity"""
+    if not s:
+        return 0
+    i, c = 0, 1
+    u, v, w = 0, 1, 1
+    s_len = len(s)
+    
+    while u + v <= s_len:
+        if s[i + v - 1] == s[u + v - 1]:
+            v += 1
+        else:
+            c += 1
+            i = 0
+            u += w
+            v = 1
+            w = u
+    
+    if v != 1:
+        c += 1
+    
+    return c / (len(s) / np.log2(len(s)))
+
+
+def shannon_entropy(s):
+    """Compute Shannon entropy in bits per character"""
+    if not s:
+        return 0
+    counts = Counter(s)
+    probs = [count / len(s) for count in counts.values()]
+    return -sum(p * np.log2(p) for p in probs)
+
+
+def trigram_diversity(s):
+    """Compute type-token ratio for trigrams"""
+    words = s.lower().split()
+    if len(words) < 3:
+        return 1.0
+    trigrams = [tuple(words[i:i+3]) for i in range(len(words) - 2)]
+    if not trigrams:
+        return 1.0
+    return len(set(trigrams)) / len(trigrams)
+
+
+def unique_words_ratio(s):
+    """Compute ratio of unique words to total words"""
+    words = s.lower().split()
+    if not words:
+        return 0
+    return len(set(words)) / len(words)
+
+
+def compute_all_metrics(text):
+    """Compute all complexity metrics for a text"""
+    return {
+        'lz_complexity': lempel_ziv_complexity(text),
+        'shannon_entropy': shannon_entropy(text),
+        'trigram_diversity': trigram_diversity(text),
+        'unique_words_ratio': unique_words_ratio(text)
+    }
@@ -0,0 +1,253 @@
+"""
+TF-IDF Corpus - one sparse document matrix shared by the text analyses
+
+Semantic drift, topic drift from the seed and cross-seed convergence all
+start from the same representation. The corpus stores, for every generated
+text with a (file, model, condition, category, seed, iteration) key:
+
+    counts   CSR matrix of hashed token counts (float32, HASH_DIM columns)
+    df       document frequency per column
+
+TF-IDF (sublinear tf, smoothed idf, L2-normalized rows) is derived on
+demand, so adding documents only appends rows and updates df; no vocabulary
+has to be re-mapped because tokens are hashed. The matrix arrays and the
+row metadata are saved as .npy files and loaded memory-mapped.
+
+Analyses (all vectorized over the sparse matrix, or over any row-aligned
+dense projection of it, e.g. LocalEmbedder.project(corpus.tfidf())):
+    - consecutive_drift:     1 - cos(x_t, x_t+1) within each run
+    - seed_drift:            1 - cos(x_t, x_first) within each run
+    - cross_seed_similarity: mean pairwise cosine across seeds per iteration
+
+semantic_drift_analyzer and ann_index embed the rows of this corpus instead
+of re-tokenizing the texts; sync_corpus() brings the stored corpus up to
+date with the results index first.
+
+Usage:
+    python experiments/tfidf_corpus.py            # build or update results/tfidf/
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from results_index import KEY_COLUMNS, RESULTS_DIR
+from semantic_drift_analyzer import HASH_DIM, _hashed_counts
+
+CORPUS_DIR = RESULTS_DIR / "tfidf"
+ROW_KEYS = KEY_COLUMNS + ['seed', 'iteration']
+
+
+class TfidfCorpus:
+    """Hashed-count CSR matrix plus per-row metadata columns"""
+
+    def __init__(self, counts, meta, n_features=HASH_DIM):
+        self.counts = counts
+        self.meta = meta
+        self.n_features = n_features
+        self.df = np.bincount(counts.indices, minlength=n_features).astype(np.int64)
+
+    def __len__(self):
+        return self.counts.shape[0]
+
+    @classmethod
+    def empty(cls, n_features=HASH_DIM):
+        meta = {c: np.array([], dtype=object) for c in KEY_COLUMNS}
+        meta.update({c: np.array([], dtype=np.int64) for c in ('seed', 'iteration')})
+        return cls(sparse.csr_matrix((0, n_features), dtype=np.float32), meta, n_features)
+
+    @classmethod
+    def from_index(cls, index, n_features=HASH_DIM):
+        corpus = cls.empty(n_features)
+        corpus.update(index)
+        return corpus
+
+    def keys(self):
+        return set(zip(*(self.meta[c].tolist() for c in ROW_KEYS)))
+
+    def update(self, index):
+        """Append index rows with text whose key is not in the corpus yet"""
+        known = self.keys()
+        rows = [i for i, key in enumerate(zip(*(index[c].tolist() for c in ROW_KEYS)))
+                if index.texts[i] and key not in known]
+        if not rows:
+            return 0
+        new = _hashed_counts([index.texts[i] for i in rows], self.n_features)
+        self.counts = sparse.vstack([self.counts, new], format='csr')
+        self.df += np.bincount(new.indices, minlength=self.n_features)
+        for c in ROW_KEYS:
+            self.meta[c] = np.concatenate([self.meta[c], index[c][rows]])
+        return len(rows)
+
+    @property
+    def idf(self):
+        return np.log((1.0 + len(self)) / (1.0 + self.df)).astype(np.float32) + 1.0
+
+    def tfidf(self):
+        """L2-normalized sublinear TF-IDF matrix (CSR)"""
+        weighted = self.counts.copy()
+        weighted.data = np.log1p(weighted.data)
+        weighted = weighted.multiply(self.idf[None, :]).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        return sparse.diags(1.0 / np.where(norms == 0, 1.0, norms)) @ weighted
+
+    def run_order(self):
+        """Row order sorted by run then iteration, and a same-run flag per step"""
+        keys = [self.meta[c].astype(str) for c in KEY_COLUMNS] + [self.meta['seed']]
+        order = np.lexsort((self.meta['iteration'],) + tuple(reversed(keys)))
+        same_run = np.ones(max(len(order) - 1, 0), dtype=bool)
+        for column in keys:
+            same_run &= column[order[1:]] == column[order[:-1]]
+        return order, same_run
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, out_dir=CORPUS_DIR):
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.save(out_dir / "data.npy", self.counts.data.astype(np.float32))
+        np.save(out_dir / "indices.npy", self.counts.indices.astype(np.int32))
+        np.save(out_dir / "indptr.npy", self.counts.indptr.astype(np.int64))
+        schema = {'n_rows': len(self), 'n_features': self.n_features, 'categorical': {}}
+        for c in KEY_COLUMNS:
+            categories, codes = np.unique(self.meta[c].astype(str), return_inverse=True)
+            np.save(out_dir / f"{c}.npy", codes.astype(np.int32))
+            schema['categorical'][c] = categories.tolist()
+        for c in ('seed', 'iteration'):
+            np.save(out_dir / f"{c}.npy", self.meta[c])
+        with open(out_dir / "schema.json", 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    @classmethod
+    def load(cls, in_dir=CORPUS_DIR, mmap_mode='r'):
+        in_dir = Path(in_dir)
+        with open(in_dir / "schema.json", 'r') as f:
+            schema = json.load(f)
+        arrays = [np.load(in_dir / f"{name}.npy", mmap_mode=mmap_mode)
+                  for name in ('data', 'indices', 'indptr')]
+        counts = sparse.csr_matrix(tuple(arrays), shape=(schema['n_rows'], schema['n_features']),
+                                   copy=False)
+        meta = {}
+        for c, categories in schema['categorical'].items():
+            codes = np.load(in_dir / f"{c}.npy")
+            meta[c] = np.array(categories, dtype=object)[codes] if len(categories) \
+                else np.array([], dtype=object)
+        for c in ('seed', 'iteration'):
+            meta[c] = np.load(in_dir / f"{c}.npy")
+        return cls(counts, meta, schema['n_features'])
+
+
+def sync_corpus(index, corpus_dir=CORPUS_DIR, rebuild=False):
+    """
+    Stored corpus brought up to date with a results index
+
+    Loads corpus_dir (or starts empty), appends the index rows it does not
+    hold yet and saves it back if anything changed.
+
+    Returns:
+        (corpus, number of rows added)
+    """
+    corpus_dir = Path(corpus_dir)
+    if corpus_dir.joinpath("schema.json").exists() and not rebuild:
+        corpus = TfidfCorpus.load(corpus_dir, mmap_mode=None)
+    else:
+        corpus = TfidfCorpus.empty()
+    added = corpus.update(index)
+    if added or rebuild:
+        corpus.save(corpus_dir)
+    return corpus, added
+
+
+# ----------------------------------------------------------------------
+# Shared analyses
+# ----------------------------------------------------------------------
+
+def _rowwise_cosine(x, a, b):
+    """cos(x[a_k], x[b_k]) for L2-normalized rows (sparse or dense)"""
+    if not sparse.issparse(x):
+        return np.einsum('ij,ij->i', x[a], x[b])
+    return np.asarray(x[a].multiply(x[b]).sum(axis=1)).ravel()
+
+
+def _step_table(corpus, rows, values, name):
+    table = pd.DataFrame({c: corpus.meta[c][rows] for c in ROW_KEYS})
+    table[name] = values
+    return table
+
+
+def consecutive_drift(corpus, x=None):
+    """1 - cos between each text and the previous one in its run"""
+    x = corpus.tfidf() if x is None else x
+    order, same_run = corpus.run_order()
+    prev, cur = order[:-1][same_run], order[1:][same_run]
+    return _step_table(corpus, cur, 1.0 - _rowwise_cosine(x, prev, cur), 'semantic_drift')
+
+
+def seed_drift(corpus, x=None):
+    """1 - cos between each text and the first text of its run"""
+    x = corpus.tfidf() if x is None else x
+    order, same_run = corpus.run_order()
+    starts = np.concatenate([[True], ~same_run])
+    first = order[np.flatnonzero(starts)][np.cumsum(starts) - 1]
+    return _step_table(corpus, order, 1.0 - _rowwise_cosine(x, first, order), 'seed_drift')
+
+
+def cross_seed_similarity(corpus, x=None):
+    """
+    Mean pairwise cosine across seeds per (file, model, condition, category, iteration)
+
+    With unit rows, sum_{i<j} x_i . x_j = (|sum_i x_i|^2 - m) / 2, so one
+    sparse group-indicator product gives every group at once. Texts without
+    any token are left out of m.
+    """
+    x = corpus.tfidf() if x is None else x
+    keys = KEY_COLUMNS + ['iteration']
+    labels = pd.MultiIndex.from_arrays([corpus.meta[c].astype(str) if c != 'iteration'
+                                        else corpus.meta[c] for c in keys])
+    codes, groups = pd.factorize(labels)
+    indicator = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))),
+                                  shape=(len(groups), len(codes)))
+    sums = indicator @ x
+    if sparse.issparse(x):
+        sq_norm = np.asarray(sums.multiply(sums).sum(axis=1)).ravel()
+        nonempty = np.diff(x.indptr) > 0
+    else:
+        sq_norm = np.einsum('ij,ij->i', sums, sums)
+        nonempty = np.abs(x).sum(axis=1) > 0
+    m = np.bincount(codes, weights=nonempty, minlength=len(groups))
+    n_pairs = m * (m - 1) / 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_cos = (sq_norm - m) / 2 / n_pairs
+    table = pd.DataFrame(list(groups), columns=keys)
+    table['n_seeds'] = m.astype(int)
+    table['cross_seed_cosine'] = mean_cos
+    return table[table['n_seeds'] > 1].reset_index(drop=True)
+
+
+def main():
+    from results_index import load_index
+
+    parser = argparse.ArgumentParser(description="Build or update the shared TF-IDF corpus")
+    parser.add_argument('--dir', default=str(CORPUS_DIR))
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+
+    corpus, added = sync_corpus(load_index(), args.dir, args.rebuild)
+    print(f"✓ {len(corpus)} documents ({added} new), nnz={corpus.counts.nnz} → {args.dir}")
+
+    x = corpus.tfidf()
+    drift = consecutive_drift(corpus, x).groupby(['model', 'condition'])['semantic_drift'].mean()
+    topic = seed_drift(corpus, x).groupby(['model', 'condition'])['seed_drift'].mean()
+    cross = cross_seed_similarity(corpus, x).groupby(['model', 'condition'])['cross_seed_cosine'].mean()
+    summary = pd.concat([drift, topic, cross], axis=1)
+    print(summary.to_string(float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Trend Fits - batched least squares over every trajectory at once
+
+batched_ols() fits y = intercept + slope · x along the last axis of an
+arbitrary stack of trajectories (NaN = missing point), returning slope,
+intercept, R², standard errors and p-values as arrays. fit_trajectories()
+applies it to a ResultsTensor at three levels and returns a tidy table:
+
+    level='seed'          one fit per (group, seed, metric) trajectory
+    level='pooled'        all (iteration, value) points of a group pooled
+    level='hierarchical'  random-effects summary of the per-seed slopes
+                          (DerSimonian-Laird), i.e. seeds as clusters
+
+Usage:
+    python experiments/trend_fits.py --group-by model category condition --out results/trend_fits.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def batched_ols(x, y):
+    """
+    Simple linear regression along the last axis for a batch of series
+
+    Args:
+        x: Predictor, broadcastable to y (typically the iteration vector)
+        y: (..., T) responses, NaN where missing
+
+    Returns:
+        dict of (...)-shaped arrays: slope, intercept, r_squared, r,
+        se_slope, se_intercept, p, n
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.broadcast_to(np.asarray(x, dtype=float), y.shape)
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(mask, x, 0.0).sum(axis=-1) / n
+        y_mean = np.where(mask, y, 0.0).sum(axis=-1) / n
+        dx = np.where(mask, x - x_mean[..., None], 0.0)
+        dy = np.where(mask, y - y_mean[..., None], 0.0)
+        s_xx = (dx * dx).sum(axis=-1)
+        s_yy = (dy * dy).sum(axis=-1)
+        s_xy = (dx * dy).sum(axis=-1)
+
+        slope = s_xy / s_xx
+        intercept = y_mean - slope * x_mean
+        r = np.clip(s_xy / np.sqrt(s_xx * s_yy), -1.0, 1.0)
+        dof = n - 2
+        residual_var = (s_yy - slope * s_xy) / dof
+        se_slope = np.sqrt(residual_var / s_xx)
+        se_intercept = np.sqrt(residual_var * (1.0 / n + x_mean ** 2 / s_xx))
+        p = 2 * stats.t.sf(np.abs(slope / se_slope), dof)
+
+    return {'slope': slope, 'intercept': intercept, 'r_squared': r ** 2, 'r': r,
+            'se_slope': se_slope, 'se_intercept': se_intercept, 'p': p, 'n': n}
+
+
+def random_effects_slopes(slopes, se, axis=-1):
+    """
+    DerSimonian-Laird pooling of per-seed slopes along `axis`
+
+    Returns:
+        dict: slope (pooled), se_slope, tau2 (between-seed variance), k
+    """
+    slopes = np.moveaxis(np.asarray(slopes, dtype=float), axis, -1)
+    se = np.moveaxis(np.asarray(se, dtype=float), axis, -1)
+    ok = np.isfinite(slopes) & np.isfinite(se) & (se > 0)
+    k = ok.sum(axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = np.where(ok, 1.0 / se ** 2, 0.0)
+        b = np.where(ok, slopes, 0.0)
+        w_sum = w.sum(axis=-1)
+        fixed = (w * b).sum(axis=-1) / w_sum
+        q = (w * (b - fixed[..., None]) ** 2).sum(axis=-1)
+        c = w_sum - (w ** 2).sum(axis=-1) / w_sum
+        tau2 = np.maximum(0.0, (q - (k - 1)) / c)
+        w_re = np.where(ok, 1.0 / (se ** 2 + tau2[..., None]), 0.0)
+        pooled = (w_re * b).sum(axis=-1) / w_re.sum(axis=-1)
+        se_pooled = np.sqrt(1.0 / w_re.sum(axis=-1))
+    return {'slope': pooled, 'se_slope': se_pooled, 'tau2': tau2, 'k': k}
+
+
+def _group_frame(tensor, group_idx, run_idx=None):
+    """Columns identifying each group label (one per group_by column), then the run"""
+    labels = [tensor.groups[g] for g in group_idx]
+    parts = [label.split("|") for label in labels] if len(tensor.group_by) > 1 \
+        else [[label] for label in labels]
+    frame = pd.DataFrame(parts, columns=list(tensor.group_by))
+    if run_idx is not None:
+        runs = pd.DataFrame([tensor.runs[s] for s in run_idx], columns=list(tensor.run_by))
+        frame = pd.concat([frame, runs], axis=1)
+    return frame
+
+
+def fit_trajectories(tensor, min_points=3):
+    """
+    Per-seed, pooled and hierarchical trend fits for every group and metric
+
+    Args:
+        tensor: ResultsTensor
+        min_points: Fits with fewer observed points are dropped
+
+    Returns:
+        Tidy DataFrame, one row per fit
+    """
+    n_groups, n_seeds, _, n_metrics = tensor.values.shape
+    x = tensor.iterations.astype(float)
+
+    # (group, seed, metric, iteration) stack: one fit per trajectory
+    per_seed = batched_ols(x, np.moveaxis(tensor.values, 2, -1))
+
+    # Pool seeds: (group, metric, seed*iteration)
+    pooled_y = np.moveaxis(tensor.values, 3, 1).reshape(n_groups, n_metrics, -1)
+    pooled_x = np.tile(x, n_seeds)
+    pooled = batched_ols(pooled_x, pooled_y)
+
+    se = np.where(per_seed['n'] >= min_points, per_seed['se_slope'], np.nan)
+    hier = random_effects_slopes(per_seed['slope'], se, axis=1)
+
+    frames = []
+    g, s, m = np.meshgrid(np.arange(n_groups), np.arange(n_seeds), np.arange(n_metrics),
+                          indexing='ij')
+    seed_df = _group_frame(tensor, g.ravel(), s.ravel())
+    seed_df['level'] = 'seed'
+    seed_df['metric'] = np.array(tensor.metrics)[m.ravel()]
+    for key in ('slope', 'intercept', 'r_squared', 'se_slope', 'se_intercept', 'p', 'n'):
+        seed_df[key] = per_seed[key].ravel()
+    frames.append(seed_df[seed_df['n'] >= min_points])
+
+    g, m = np.meshgrid(np.arange(n_groups), np.arange(n_metrics), indexing='ij')
+    pooled_df = _group_frame(tensor, g.ravel())
+    pooled_df['level'] = 'pooled'
+    pooled_df['metric'] = np.array(tensor.metrics)[m.ravel()]
+    for key in ('slope', 'intercept', 'r_squared', 'se_slope', 'se_intercept', 'p', 'n'):
+        pooled_df[key] = pooled[key].ravel()
+    frames.append(pooled_df[pooled_df['n'] >= min_points])
+
+    hier_df = _group_frame(tensor, g.ravel())
+    hier_df['level'] = 'hierarchical'
+    hier_df['metric'] = np.array(tensor.metrics)[m.ravel()]
+    hier_df['slope'] = hier['slope'].ravel()
+    hier_df['se_slope'] = hier['se_slope'].ravel()
+    hier_df['tau2'] = hier['tau2'].ravel()
+    hier_df['n'] = hier['k'].ravel()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hier_df['p'] = 2 * stats.norm.sf(np.abs(hier_df['slope'] / hier_df['se_slope']))
+    frames.append(hier_df[hier_df['n'] >= 2])
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    from results_index import load_index
+    from results_tensor import ResultsTensor
+
+    parser = argparse.ArgumentParser(description="Batched trend fits over every results file")
+    parser.add_argument('--group-by', nargs='+', default=['model', 'condition'])
+    parser.add_argument('--metrics', nargs='+', default=None)
+    parser.add_argument('--out', default=None, help="CSV output path")
+    args = parser.parse_args()
+
+    index = load_index()
+    index.compute_text_metrics()
+    tensor = ResultsTensor.from_index(index, metrics=args.metrics, group_by=args.group_by)
+    table = fit_trajectories(tensor)
+
+    summary = table[table['level'] != 'seed']
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.6g}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"\n✓ {len(table)} fits saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""
+Twin-Trajectory Divergence (Lyapunov-style)
+
+Forks N twin chains from the same journaled state (model, seed, iteration),
+advances them concurrently under identical conditions, and measures how
+fast the twins separate (MATHEMATICAL_MODEL.md §6.3, §7):
+
+    d_ij(t)  pairwise divergence between twins i and j at iteration t
+    λ        slope of log mean d(t) during the growth phase
+
+A positive λ means sampling noise is amplified by the loop (expanding
+dynamics); λ ≈ 0 with small d(t) means the twins are held together by an
+attractor.
+
+Divergence measures (all vectorized across twin pairs):
+    - ncd:        normalized compression distance (zlib)
+    - jaccard:    1 - token-set Jaccard similarity
+    - embedding:  cosine distance between hashed bag-of-words vectors
+
+Usage:
+    python experiments/twin_divergence.py            # analyze every twin group in the journal
+    python experiments/twin_divergence.py --chain recovery_s0 --at 49 --twins 5 --iterations 100
+    python experiments/twin_divergence.py --chain dose_s0 --runner experiment_dose_response
+    python experiments/twin_divergence.py --out results/twin_divergence.json
+"""
+
+import argparse
+import importlib
+import json
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+from chain_journal import ChainJournal, run_chain
+from ncd import NCDEngine
+
+METRICS = ('ncd', 'jaccard', 'embedding')
+EMBED_DIM = 1024
+SATURATION = 0.9
+# Model-name prefix -> runner module exposing generate(prompt, config)
+GENERATORS = {'claude': 'experiment_recovery'}
+
+
+# ----------------------------------------------------------------------
+# Twin management
+# ----------------------------------------------------------------------
+
+def spawn_twins(journal, chain_id, iteration, n_twins, **overrides):
+    """Fork `n_twins` identical children from (chain_id, iteration)"""
+    if n_twins < 2:
+        raise ValueError(f"need at least 2 twins to measure divergence, got {n_twins}")
+    group = f"{chain_id}@{iteration}"
+    twin_ids = []
+    for k in range(n_twins):
+        twin_id = f"{chain_id}.twin{iteration}.{k}"
+        if not journal.exists(twin_id):
+            journal.fork(chain_id, iteration, twin_id,
+                         twin_group=group, twin_index=k, **overrides)
+        twin_ids.append(twin_id)
+    return twin_ids
+
+
+def run_twins(journal, twin_ids, generate, iterations, max_workers=None):
+    """Advance all twins concurrently (API calls are I/O bound)"""
+    max_workers = max_workers or len(twin_ids)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_chain, journal, twin_id, generate, iterations)
+                   for twin_id in twin_ids]
+        for future in futures:
+            future.result()
+
+
+def load_generate(model, runner=None):
+    """
+    generate(prompt, config) for twins of a chain running `model`
+
+    Taken from the `runner` module when given, otherwise from the runner
+    registered in GENERATORS for the model's provider.
+    """
+    if runner is None:
+        runner = next((module for prefix, module in GENERATORS.items()
+                       if str(model).startswith(prefix)), None)
+    if runner is None:
+        raise ValueError(f"no generate() registered for model {model!r}; "
+                         f"pass a runner module exposing generate(prompt, config)")
+    generate = getattr(importlib.import_module(runner), 'generate', None)
+    if generate is None:
+        raise ValueError(f"runner module {runner!r} has no generate(prompt, config)")
+    return generate
+
+
+def twin_groups(journal):
+    """Map twin_group -> sorted twin chain ids"""
+    groups = {}
+    for chain_id in journal.chains():
+        config = journal.config(chain_id)
+        if 'twin_group' in config:
+            groups.setdefault(config['twin_group'], []).append(
+                (config['twin_index'], chain_id))
+    return {g: [c for _, c in sorted(members)] for g, members in groups.items()}
+
+
+def twin_texts(journal, twin_ids):
+    """
+    Align twin suffixes into a (n_twins, T) grid of texts
+
+    Only iterations present in every twin are kept (a twin that stopped
+    early truncates the group).
+    """
+    fork_iteration = journal.meta(twin_ids[0])['fork_iteration']
+    suffixes = [[s['text'] for s in journal.own_steps(t)] for t in twin_ids]
+    length = min(len(s) for s in suffixes)
+    iterations = np.arange(fork_iteration + 1, fork_iteration + 1 + length)
+    return [s[:length] for s in suffixes], iterations
+
+
+# ----------------------------------------------------------------------
+# Vectorized pairwise divergence
+# ----------------------------------------------------------------------
+
+def _tokens(text):
+    return text.lower().split()
+
+
+def _hashed_bow(texts, dim=EMBED_DIM):
+    """L2-normalized hashed bag-of-words matrix (n_texts, dim)"""
+    mat = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in _tokens(text):
+            mat[row, zlib.crc32(token.encode('utf-8')) % dim] += 1.0
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.where(norms == 0, 1.0, norms)
+
+
+def pairwise_divergence(texts):
+    """
+    Divergence curves for every twin pair
+
+    Args:
+        texts: (n_twins, T) nested list of texts, n_twins >= 2
+
+    Returns:
+        pairs: list of (i, j) twin index pairs
+        curves: dict metric -> array (n_pairs, T)
+    """
+    n_twins, length = len(texts), len(texts[0])
+    if n_twins < 2:
+        raise ValueError(f"need at least 2 twins to measure divergence, got {n_twins}")
+    pairs = list(combinations(range(n_twins), 2))
+    pi = np.array([p[0] for p in pairs], dtype=int)
+    pj = np.array([p[1] for p in pairs], dtype=int)
+
+    curves = {m: np.zeros((len(pairs), length)) for m in METRICS}
+
+    # NCD: one engine over the whole group (text k*T + t is twin k at
+    # iteration t), so C(x) is cached once and every pair runs in one batch
+    engine = NCDEngine([text for twin in texts for text in twin], workers=0)
+    steps = np.arange(length)
+    ncd = engine.pairs((pi[:, None] * length + steps).ravel(), (pj[:, None] * length + steps).ravel())
+    curves['ncd'][:] = ncd.reshape(len(pairs), length)
+
+    for t in range(length):
+        column = [texts[k][t] for k in range(n_twins)]
+
+        # Token-set Jaccard via a shared binary incidence matrix
+        token_sets = [set(_tokens(c)) for c in column]
+        vocab = {tok: k for k, tok in enumerate(set().union(*token_sets))}
+        incidence = np.zeros((n_twins, max(len(vocab), 1)), dtype=np.float32)
+        for row, toks in enumerate(token_sets):
+            incidence[row, [vocab[tok] for tok in toks]] = 1.0
+        inter = incidence @ incidence.T
+        sizes = incidence.sum(axis=1)
+        union = sizes[pi] + sizes[pj] - inter[pi, pj]
+        curves['jaccard'][:, t] = 1.0 - inter[pi, pj] / np.where(union == 0, 1.0, union)
+
+        # Embedding cosine distance
+        emb = _hashed_bow(column)
+        curves['embedding'][:, t] = 1.0 - np.sum(emb[pi] * emb[pj], axis=1)
+
+    return pairs, curves
+
+
+# ----------------------------------------------------------------------
+# Divergence exponent
+# ----------------------------------------------------------------------
+
+def divergence_exponent(curve, saturation=SATURATION, eps=1e-6):
+    """
+    Estimate λ from a (n_pairs, T) divergence curve
+
+    Fits log mean_pairs d(t) = λ t + c over the growth window, i.e. from the
+    first iteration until the mean curve first reaches `saturation` × its
+    maximum (divergence measures are bounded, so the late plateau would
+    otherwise bias λ toward zero).
+
+    Returns:
+        dict with lambda, r_squared and window length
+    """
+    mean_curve = np.nanmean(curve, axis=0)
+    length = len(mean_curve)
+    if length < 3:
+        return {'lambda': float('nan'), 'r_squared': float('nan'), 'window': length}
+
+    above = np.nonzero(mean_curve >= saturation * np.nanmax(mean_curve))[0]
+    window = max(int(above[0]) + 1 if len(above) else length, 3)
+    t = np.arange(window, dtype=float)
+    y = np.log(np.maximum(mean_curve[:window], eps))
+
+    t_c = t - t.mean()
+    y_c = y - y.mean()
+    slope = np.dot(t_c, y_c) / np.dot(t_c, t_c)
+    ss_res = np.sum((y_c - slope * t_c) ** 2)
+    ss_tot = np.sum(y_c ** 2)
+    r_squared = 1.0 - ss_res / ss_tot if ss_tot > 0 else float('nan')
+
+    return {'lambda': float(slope), 'r_squared': float(r_squared), 'window': window}
+
+
+def analyze_group(journal, twin_ids):
+    """Divergence curves and exponents for one twin group (None if it has < 2 twins)"""
+    if len(twin_ids) < 2:
+        return None
+    texts, iterations = twin_texts(journal, twin_ids)
+    if len(iterations) == 0:
+        return None
+    pairs, curves = pairwise_divergence(texts)
+    config = journal.config(twin_ids[0])
+    return {
+        'twin_group': config['twin_group'],
+        'model': config.get('model'),
+        'condition': config.get('condition'),
+        'n_twins': len(twin_ids),
+        'iterations': iterations.tolist(),
+        'mean_curves': {m: np.mean(c, axis=0).tolist() for m, c in curves.items()},
+        'exponents': {m: divergence_exponent(c) for m, c in curves.items()},
+    }
+
+
+def exponents_by_model(group_results):
+    """Average λ per (model, metric) across twin groups"""
+    table = {}
+    for res in group_results:
+        for metric, fit in res['exponents'].items():
+            table.setdefault((res['model'], metric), []).append(fit['lambda'])
+    return {
+        model: {metric: float(np.nanmean(v)) for (m, metric), v in table.items() if m == model}
+        for model in {m for m, _ in table}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Twin-trajectory divergence analysis")
+    parser.add_argument('--journal', default=None, help="Journal directory (default results/journal)")
+    parser.add_argument('--chain', default=None,
+                        help="Fork twins from this journaled chain and run them before analyzing")
+    parser.add_argument('--at', type=int, default=None, help="Fork iteration (default: last of --chain)")
+    parser.add_argument('--twins', type=int, default=5, help="Number of twins to fork (>= 2)")
+    parser.add_argument('--iterations', type=int, default=100, help="Total trajectory length of each twin")
+    parser.add_argument('--runner', default=None,
+                        help="Module providing generate(prompt, config) (default: chosen from the chain's model)")
+    parser.add_argument('--out', default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    journal = ChainJournal(args.journal) if args.journal else ChainJournal()
+    if args.chain:
+        if not journal.exists(args.chain):
+            parser.error(f"chain {args.chain!r} not found in {journal.root}")
+        if args.twins < 2:
+            parser.error("--twins must be at least 2")
+        # Twins inherit the parent's config (model, temperature, ...), which
+        # generate() reads per call
+        model = journal.config(args.chain).get('model')
+        try:
+            generate = load_generate(model, args.runner)
+        except ValueError as e:
+            parser.error(str(e))
+
+        iteration = journal.last_iteration(args.chain) if args.at is None else args.at
+        twin_ids = spawn_twins(journal, args.chain, iteration, args.twins)
+        print(f"🚀 {len(twin_ids)} twins of {args.chain}@{iteration} → {args.iterations} iterations")
+        run_twins(journal, twin_ids, generate, args.iterations)
+        groups = {f"{args.chain}@{iteration}": twin_ids}
+    else:
+        groups = twin_groups(journal)
+    if not groups:
+        print("No twin groups found in journal.")
+        return
+
+    results = [r for r in (analyze_group(journal, ids) for ids in groups.values()) if r]
+    skipped = sum(len(ids) < 2 for ids in groups.values())
+    if skipped:
+        print(f"  ({skipped} twin group(s) with fewer than 2 twins skipped)")
+    for res in results:
+        lams = ", ".join(f"{m}: λ={f['lambda']:+.4f}" for m, f in res['exponents'].items())
+        print(f"  {res['twin_group']} ({res['n_twins']} twins, {len(res['iterations'])} iters) | {lams}")
+
+    print("\nDivergence exponent per model:")
+    for model, lams in sorted(exponents_by_model(results).items(), key=lambda kv: str(kv[0])):
+        print(f"  {model}: " + ", ".join(f"{m}={v:+.4f}" for m, v in sorted(lams.items())))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()